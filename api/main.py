@@ -2,20 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Union
 
 import geopandas as gpd
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from shapely.geometry import box
 
 from api import models
 from api.auth import get_current_client
-from api.utils import dataset_to_forecast_response, geo_dataframe_to_geojson_features
+from api.utils import (
+    cached_body_response,
+    fast_json_response,
+    forecast_batch_payload,
+    forecast_payload,
+    geojson_feature_collection,
+    stream_forecast_batch,
+    tile_response,
+)
+from ingestion.prefetch import build_scheduler
+from ingestion.sensor_aggregates import AggregatorState, RollingAggregator, WindowSnapshot, state_path
+from ingestion.sensor_batch import BatchTooLarge, SensorBatchIngestor
+from ingestion.sensor_mqtt import SensorMessage
 from ingestion.weather_ingest import WeatherIngestor
 from layers.adaptation import AdaptationEngine, DEFAULT_RULES
-from layers.mapping import RiskLayerConfig, build_risk_map
+from layers.mapping import RiskLayerConfig
+from layers.risk_cache import RiskInputs, RiskProduct, RiskProductCache
+from layers.vector_tiles import MVT_MEDIA_TYPE, RiskTileCache
 from shared.config import get_settings
+from shared.http_client import close_shared_client
 
 app = FastAPI(title="Hyperlocal Climate-Risk API", version="0.1.0")
 
@@ -24,12 +41,30 @@ app = FastAPI(title="Hyperlocal Climate-Risk API", version="0.1.0")
 async def on_startup() -> None:
     app.state.settings = get_settings()
     app.state.weather_ingestor = WeatherIngestor()
+    app.state.prefetch_scheduler = build_scheduler(app.state.weather_ingestor)
+    if app.state.settings.prefetch_enabled:
+        app.state.prefetch_scheduler.start()
     app.state.adaptation_engine = AdaptationEngine(DEFAULT_RULES)
+    app.state.risk_cache = RiskProductCache(
+        [
+            RiskProduct("risk-map", _risk_map_inputs, _render_risk_map),
+            RiskProduct("adaptation", _adaptation_inputs, _render_adaptation),
+        ],
+        max_entries=app.state.settings.risk_cache_entries,
+        recheck_seconds=app.state.settings.risk_cache_recheck_seconds,
+    )
+    app.state.risk_tiles = RiskTileCache(app.state.risk_cache)
+    app.state.sensor_aggregator = RollingAggregator.from_settings()
+    app.state.sensor_ingestor = SensorBatchIngestor(aggregator=app.state.sensor_aggregator)
+    app.state.sensor_ingestor.start()
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
+    await app.state.prefetch_scheduler.stop()
+    app.state.sensor_ingestor.stop()
     await app.state.weather_ingestor.close()
+    await close_shared_client()
 
 
 @app.get("/health", response_model=models.HealthResponse)
@@ -37,14 +72,36 @@ async def health() -> models.HealthResponse:
     return models.HealthResponse(status="ok", time=datetime.utcnow(), services=["weather", "risk", "adaptation"])
 
 
-@app.post("/forecast", response_model=models.ForecastResponse)
-async def forecast(request: models.ForecastRequest, client: str = Depends(get_current_client)) -> models.ForecastResponse:
+@app.get("/metrics", response_model=models.MetricsResponse)
+async def metrics(client: str = Depends(get_current_client)) -> models.MetricsResponse:
+    components = dict(app.state.weather_ingestor.metrics())
+    components["forecast_prefetch"] = app.state.prefetch_scheduler.metrics()
+    components["sensor_ingest"] = app.state.sensor_ingestor.metrics()
+    components["risk_cache"] = app.state.risk_cache.metrics()
+    components["risk_tiles"] = app.state.risk_tiles.metrics()
+    return models.MetricsResponse(time=datetime.utcnow(), components=components)
+
+
+@app.post("/forecast", response_model=Union[models.ForecastResponse, models.ForecastColumnsResponse])
+async def forecast(request: models.ForecastRequest, client: str = Depends(get_current_client)) -> Response:
     dataset = await app.state.weather_ingestor.fetch_forecast(request.latitude, request.longitude)
-    return dataset_to_forecast_response(dataset, request.latitude, request.longitude)
+    payload = forecast_payload(dataset, request.latitude, request.longitude, request.horizon_hours, request.layout)
+    return fast_json_response(payload)
 
 
-@app.post("/risk-map", response_model=models.RiskMapResponse)
-async def risk_map(request: models.RiskMapRequest, client: str = Depends(get_current_client)) -> models.RiskMapResponse:
+@app.post("/forecast/batch", response_model=models.ForecastBatchResponse)
+async def forecast_batch(request: models.ForecastBatchRequest, client: str = Depends(get_current_client)) -> Response:
+    """Many points in one call; points sharing a grid cell are fetched and serialised once."""
+
+    points = [(point.latitude, point.longitude) for point in request.points]
+    ingestor = app.state.weather_ingestor
+    if request.stream:
+        return StreamingResponse(stream_forecast_batch(ingestor, points, request.horizon_hours), media_type="application/x-ndjson")
+    datasets = await ingestor.fetch_points(points)
+    return fast_json_response(forecast_batch_payload(datasets, points, request.horizon_hours))
+
+
+def _risk_map_inputs(basin_id: str) -> RiskInputs:
     hazard = gpd.GeoDataFrame(
         {
             "flood_probability": [0.3, 0.6, 0.8],
@@ -62,13 +119,10 @@ async def risk_map(request: models.RiskMapRequest, client: str = Depends(get_cur
         )
     ]
     config = RiskLayerConfig(hazard_fields=["flood_probability"], vulnerability_fields=["population_density"])
-    risk = build_risk_map(hazard, vulnerability, config)
-    features = list(geo_dataframe_to_geojson_features(risk))
-    return models.RiskMapResponse(features=features, generated_at=datetime.utcnow())
+    return RiskInputs(hazard, vulnerability, config)
 
 
-@app.get("/adaptation", response_model=models.AdaptationResponse)
-async def adaptation(basin_id: str, client: str = Depends(get_current_client)) -> models.AdaptationResponse:
+def _adaptation_inputs(basin_id: str) -> RiskInputs:
     hazard = gpd.GeoDataFrame(
         {
             "flood_probability": [0.2, 0.7, 0.9],
@@ -86,7 +140,15 @@ async def adaptation(basin_id: str, client: str = Depends(get_current_client)) -
         )
     ]
     config = RiskLayerConfig(hazard_fields=["flood_probability"], vulnerability_fields=["population_density"])
-    risk = build_risk_map(hazard, vulnerability, config)
+    return RiskInputs(hazard, vulnerability, config)
+
+
+def _render_risk_map(basin_id: str, risk: gpd.GeoDataFrame) -> bytes:
+    # Cached bodies carry a strong ETag of the input hash, so they hold nothing time-dependent.
+    return b"".join(geojson_feature_collection(risk))
+
+
+def _render_adaptation(basin_id: str, risk: gpd.GeoDataFrame) -> bytes:
     recommendations_df = app.state.adaptation_engine.generate(risk)
     recommendations: List[models.Recommendation] = [
         models.Recommendation(
@@ -96,13 +158,111 @@ async def adaptation(basin_id: str, client: str = Depends(get_current_client)) -
         )
         for idx, row in recommendations_df.iterrows()
     ]
-    return models.AdaptationResponse(recommendations=recommendations, generated_at=datetime.utcnow())
+    return models.AdaptationResponse(recommendations=recommendations).json(separators=(",", ":"), exclude={"generated_at"}).encode()
+
+
+async def _risk_product(request: Request, basin_id: str, kind: str, conditional: bool = True) -> Response:
+    cache: RiskProductCache = app.state.risk_cache
+    entry = cache.peek(basin_id, kind)
+    if entry is None:
+        entry = await asyncio.to_thread(cache.get, basin_id, kind)
+    return cached_body_response(request, entry, conditional=conditional)
+
+
+@app.get("/risk-map", response_model=models.RiskMapResponse)
+async def risk_map_resource(basin_id: str, request: Request, client: str = Depends(get_current_client)) -> Response:
+    """The cached risk map with a strong ETag; revalidate with ``If-None-Match``."""
+
+    return await _risk_product(request, basin_id, "risk-map")
+
+
+@app.post("/risk-map", response_model=models.RiskMapResponse)
+async def risk_map(request: models.RiskMapRequest, http_request: Request, client: str = Depends(get_current_client)) -> Response:
+    """Same body as ``GET /risk-map`` (or streamed), but never answered with 304: POST responses are not cacheable."""
+
+    if request.stream:
+        _, risk = await asyncio.to_thread(app.state.risk_cache.risk_map, request.basin_id, "risk-map")
+        return StreamingResponse(geojson_feature_collection(risk, generated_at=datetime.utcnow().isoformat()), media_type="application/json")
+    return await _risk_product(http_request, request.basin_id, "risk-map", conditional=False)
+
+
+@app.get("/adaptation", response_model=models.AdaptationResponse)
+async def adaptation(basin_id: str, request: Request, client: str = Depends(get_current_client)) -> Response:
+    return await _risk_product(request, basin_id, "adaptation")
+
+
+@app.get("/tiles/risk/{basin_id}/{z}/{x}/{y}.mvt")
+async def risk_tile(basin_id: str, z: int, x: int, y: int, request: Request, client: str = Depends(get_current_client)) -> Response:
+    """Risk map as a Mapbox Vector Tile (layer ``risk``); 204 when the tile holds no features."""
+
+    tiles: RiskTileCache = app.state.risk_tiles
+    if not tiles.in_range(z, x, y):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tile out of range")
+    tile = await asyncio.to_thread(tiles.get, basin_id, z, x, y)
+    return tile_response(request, tile.body, tile.etag, MVT_MEDIA_TYPE)
 
 
 @app.post("/sensor", status_code=202)
 async def sensor_ingest(message: models.SensorMessageIn, client: str = Depends(get_current_client)) -> None:
-    # Placeholder for streaming message queue logic.
+    app.state.sensor_ingestor.submit([SensorMessage(topic=message.topic, payload=message.payload, received_at=datetime.utcnow())])
     return None
 
 
+def _sensor_snapshot(window_seconds: Optional[float]) -> WindowSnapshot:
+    """HTTP-ingested aggregates merged with those the MQTT sensor workers last published."""
+
+    aggregator: RollingAggregator = app.state.sensor_aggregator
+    try:
+        published = AggregatorState.load(state_path())
+    except FileNotFoundError:
+        return aggregator.snapshot(window_seconds)
+    return aggregator.merged([published]).snapshot(window_seconds)
+
+
+@app.get("/sensor/aggregates", response_model=models.SensorAggregatesResponse)
+async def sensor_aggregates(
+    window_seconds: Optional[float] = Query(None, gt=0, description="Trailing window (default and maximum SENSOR_AGGREGATE_WINDOW_SECONDS)"),
+    sensor: Optional[List[str]] = Query(None, description="Only these sensors"),
+    client: str = Depends(get_current_client),
+) -> models.SensorAggregatesResponse:
+    """Rolling-window count/sum/min/max/mean/rate per sensor, e.g. the max water level over the last 15 minutes."""
+
+    snapshot = await asyncio.to_thread(_sensor_snapshot, window_seconds)
+    return models.SensorAggregatesResponse(
+        window_seconds=snapshot.window_seconds,
+        as_of=datetime.utcfromtimestamp(snapshot.as_of),
+        fields=snapshot.fields,
+        sensors=snapshot.as_dict(sensor),
+    )
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    """The request body, refused with 413 as soon as it is known to exceed ``max_bytes``."""
+
+    too_large = HTTPException(status_code=413, detail=f"Body exceeds {max_bytes} bytes")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+
+@app.post("/sensor/batch", status_code=202, response_model=models.SensorBatchResponse)
+async def sensor_batch_ingest(request: Request, client: str = Depends(get_current_client)) -> models.SensorBatchResponse:
+    """Readings as NDJSON or a JSON array; 202 once they are queued for the archive writer."""
+
+    body = await _read_body(request, app.state.settings.sensor_batch_max_bytes)
+    try:
+        result = await asyncio.to_thread(app.state.sensor_ingestor.ingest, body)
+    except BatchTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array or NDJSON of readings") from exc
+    return models.SensorBatchResponse(accepted=result.accepted, rejected=result.rejected, errors=result.errors)
+
+
 __all__ = ["app"]
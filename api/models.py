@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -11,7 +11,38 @@ from pydantic import BaseModel, Field
 class ForecastRequest(BaseModel):
     latitude: float = Field(..., ge=-90, le=90)
     longitude: float = Field(..., ge=-180, le=180)
-    horizon_hours: int = Field(48, ge=1, le=168)
+    horizon_hours: int = Field(48, ge=1, le=384)
+    layout: str = Field("rows", regex="^(rows|columns)$", description="'rows' (one object per hour) or 'columns' (parallel arrays)")
+
+
+class ForecastPoint(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class ForecastBatchRequest(BaseModel):
+    points: List[ForecastPoint] = Field(..., min_items=1, max_items=1000)
+    horizon_hours: int = Field(48, ge=1, le=384)
+    stream: bool = Field(False, description="Stream one NDJSON line per point as its grid cell arrives")
+
+
+class HourlyColumns(BaseModel):
+    time: List[datetime]
+    temperature_c: List[float]
+    precipitation_mm: List[float]
+    windspeed_ms: List[float]
+
+
+class ForecastBatchItem(BaseModel):
+    location: Tuple[float, float]
+    source: str
+    hourly: HourlyColumns
+
+
+class ForecastBatchResponse(BaseModel):
+    count: int
+    cells: int = Field(..., description="Distinct forecasts behind the points (grid-cell dedupe)")
+    forecasts: Dict[str, ForecastBatchItem] = Field(..., description="Keyed by the point's index in the request")
 
 
 class WeatherPoint(BaseModel):
@@ -27,19 +58,27 @@ class ForecastResponse(BaseModel):
     source: str
 
 
+class ForecastColumnsResponse(BaseModel):
+    location: Tuple[float, float]
+    hourly: HourlyColumns
+    source: str
+
+
 class RiskMapRequest(BaseModel):
     basin_id: str
+    stream: bool = Field(False, description="Stream the FeatureCollection in chunks instead of the cached body")
 
 
 class GeoJSONFeature(BaseModel):
     type: str = Field(default="Feature", const=True)
-    geometry: dict
+    geometry: Optional[dict]
     properties: dict
 
 
 class RiskMapResponse(BaseModel):
+    type: str = Field(default="FeatureCollection", const=True)
     features: List[GeoJSONFeature]
-    generated_at: datetime
+    generated_at: Optional[datetime] = Field(None, description="Only on streamed responses; cached bodies are identified by their ETag")
 
 
 class SensorMessageIn(BaseModel):
@@ -47,12 +86,32 @@ class SensorMessageIn(BaseModel):
     payload: dict
 
 
+class SensorBatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[str] = Field(default_factory=list, description="First rejected readings as '<index>: <reason>'")
+
+
+class SensorAggregatesResponse(BaseModel):
+    window_seconds: float
+    as_of: datetime
+    fields: List[str]
+    sensors: Dict[str, Dict[str, Dict[str, Optional[float]]]] = Field(
+        default_factory=dict, description="sensor -> field -> count/sum/min/max/mean/rate over the window (null when empty)"
+    )
+
+
 class HealthResponse(BaseModel):
     status: str
     time: datetime
     services: List[str]
 
 
+class MetricsResponse(BaseModel):
+    time: datetime
+    components: Dict[str, Dict[str, Any]]
+
+
 class Recommendation(BaseModel):
     area_id: str
     recommendation: str
@@ -61,18 +120,26 @@ class Recommendation(BaseModel):
 
 class AdaptationResponse(BaseModel):
     recommendations: List[Recommendation]
-    generated_at: datetime
+    generated_at: Optional[datetime] = Field(None, description="Omitted from cached bodies, which are identified by their ETag")
 
 
 __all__ = [
     "ForecastRequest",
     "ForecastResponse",
+    "ForecastColumnsResponse",
+    "ForecastPoint",
+    "ForecastBatchRequest",
+    "ForecastBatchItem",
+    "ForecastBatchResponse",
+    "HourlyColumns",
     "WeatherPoint",
     "RiskMapRequest",
     "RiskMapResponse",
     "GeoJSONFeature",
     "SensorMessageIn",
+    "SensorBatchResponse",
     "HealthResponse",
+    "MetricsResponse",
     "AdaptationResponse",
     "Recommendation",
 ]
@@ -2,37 +2,243 @@
 
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Iterable
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import geopandas as gpd
 import numpy as np
+import pandas as pd
+import shapely
 import xarray as xr
+from fastapi import Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+from layers.risk_cache import CachedBody
+from shared import jsonio
 
 from . import models
 
 
-def dataset_to_forecast_response(dataset: xr.Dataset, latitude: float, longitude: float) -> models.ForecastResponse:
-    weather_points = []
-    forecast_data = dataset["forecast"].values
-    times = dataset.coords["time"].values
-    variables = list(dataset.coords["variable"].values)
+FORECAST_FIELDS = {
+    "temperature_c": "temperature_2m",
+    "precipitation_mm": "precipitation",
+    "windspeed_ms": "windspeed_10m",
+}
+ROWS = "rows"
+COLUMNS = "columns"
+GEOJSON_CHUNK_FEATURES = 10000
+
+
+def forecast_columns(dataset: xr.Dataset, horizon_hours: Optional[int] = None) -> Dict[str, list]:
+    """Response columns as plain lists: ISO ``time`` plus one list per ``WeatherPoint`` field.
+
+    The dataset is cut to the first ``horizon_hours`` hours before anything is
+    converted, and each variable row is converted with one ``tolist()`` call.
+    Variables the provider did not return are filled with ``0.0``, as before.
+    """
+
+    times = dataset.coords["time"].values.astype("datetime64[s]")
+    end = len(times)
+    if horizon_hours is not None and end:
+        end = int(np.searchsorted(times, times[0] + np.timedelta64(horizon_hours, "h"), side="left"))
+    forecast = dataset["forecast"].values[:, :end]
+    rows = {str(name): index for index, name in enumerate(dataset.coords["variable"].values)}
+    columns: Dict[str, list] = {"time": np.datetime_as_string(times[:end], unit="s").tolist()}
+    for field, variable in FORECAST_FIELDS.items():
+        row = rows.get(variable)
+        columns[field] = forecast[row].astype(np.float64).tolist() if row is not None else [0.0] * end
+    return columns
+
+
+def forecast_payload(
+    dataset: xr.Dataset, latitude: float, longitude: float, horizon_hours: Optional[int] = None, layout: str = ROWS
+) -> dict:
+    """JSON-ready ``/forecast`` body in the ``rows`` (``ForecastResponse``) or ``columns`` layout."""
+
+    columns = forecast_columns(dataset, horizon_hours)
+    body = {"location": [latitude, longitude], "source": str(dataset.attrs.get("source", "unknown"))}
+    if layout == COLUMNS:
+        body["hourly"] = columns
+        return body
+    names = list(columns)
+    body["hourly"] = [dict(zip(names, values)) for values in zip(*columns.values())]
+    return body
+
+
+def fast_json_response(content: Any, status_code: int = 200) -> Response:
+    """``ORJSONResponse`` when orjson is installed (NaN becomes ``null``), else ``JSONResponse``."""
+
+    if jsonio.orjson is not None:
+        return ORJSONResponse(content, status_code=status_code)
+    return JSONResponse(content, status_code=status_code)
+
+
+def forecast_batch_payload(
+    datasets: Sequence[xr.Dataset], points: Sequence[Tuple[float, float]], horizon_hours: Optional[int] = None
+) -> dict:
+    """``ForecastBatchResponse`` body: columnar forecasts keyed by input index.
+
+    Points that resolved to the same grid cell share one dataset object, so its
+    columns are built once and reused.
+    """
+
+    columns_by_dataset: Dict[int, Dict[str, list]] = {}
+    forecasts = {}
+    for index, (dataset, (latitude, longitude)) in enumerate(zip(datasets, points)):
+        columns = columns_by_dataset.get(id(dataset))
+        if columns is None:
+            columns = columns_by_dataset[id(dataset)] = forecast_columns(dataset, horizon_hours)
+        forecasts[str(index)] = {
+            "location": [latitude, longitude],
+            "source": str(dataset.attrs.get("source", "unknown")),
+            "hourly": columns,
+        }
+    return {"count": len(forecasts), "cells": len(columns_by_dataset), "forecasts": forecasts}
+
+
+async def stream_forecast_batch(
+    ingestor, points: Sequence[Tuple[float, float]], horizon_hours: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """NDJSON lines ``{"index", "location", "source", "hourly"}`` in completion order.
+
+    Cached cells are written immediately and each upstream batch as it lands. If
+    the fetch fails part-way a final ``{"error": ...}`` line is written, since the
+    status code has already been sent.
+    """
+
+    ready: "asyncio.Queue[Optional[Tuple[int, xr.Dataset]]]" = asyncio.Queue()
+    task = asyncio.ensure_future(ingestor.fetch_points(points, on_ready=lambda index, dataset: ready.put_nowait((index, dataset))))
+    task.add_done_callback(lambda _task: ready.put_nowait(None))
+    columns_by_dataset: Dict[int, Dict[str, list]] = {}
+    try:
+        while True:
+            item = await ready.get()
+            if item is None:
+                break
+            index, dataset = item
+            columns = columns_by_dataset.get(id(dataset))
+            if columns is None:
+                columns = columns_by_dataset[id(dataset)] = forecast_columns(dataset, horizon_hours)
+            latitude, longitude = points[index]
+            line = {"index": index, "location": [latitude, longitude], "source": str(dataset.attrs.get("source", "unknown")), "hourly": columns}
+            yield jsonio.dumps(line) + b"\n"
+        if task.exception() is not None:
+            yield jsonio.dumps({"error": str(task.exception())}) + b"\n"
+    finally:
+        if not task.done():
+            task.cancel()
+
 
-    for idx, time in enumerate(times):
-        entry = {var: float(forecast_data[variables.index(var)][idx]) for var in variables}
-        weather_points.append(
-            models.WeatherPoint(
-                time=np.datetime64(time).astype("datetime64[s]").tolist(),
-                temperature_c=entry.get("temperature_2m", 0.0),
-                precipitation_mm=entry.get("precipitation", 0.0),
-                windspeed_ms=entry.get("windspeed_10m", 0.0),
-            )
-        )
-    return models.ForecastResponse(location=(latitude, longitude), hourly=weather_points, source=str(dataset.attrs.get("source", "unknown")))
+def cached_body_response(request: Request, entry: CachedBody, max_age: int = 0, conditional: bool = True) -> Response:
+    """Serve a pre-rendered body: 304 on a matching ``If-None-Match``, gzip when accepted.
+
+    Nothing is serialised or compressed per request; both representations and
+    their strong ETags were produced when the entry was built. With
+    ``conditional=False`` (responses to POST) no validator is sent or honoured.
+    """
+
+    use_gzip = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding", "X-Risk-Version": entry.version[:16]}
+    if conditional:
+        headers["ETag"] = entry.gzip_etag if use_gzip else entry.etag
+        headers["Cache-Control"] = f"max-age={max_age}, must-revalidate" if max_age else "no-cache"
+        if _etag_matches(request.headers.get("if-none-match"), (entry.etag, entry.gzip_etag)):
+            return Response(status_code=304, headers=headers)
+    else:
+        headers["Cache-Control"] = "no-store"
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(entry.gzip_body, media_type=entry.media_type, headers=headers)
+    return Response(entry.body, media_type=entry.media_type, headers=headers)
+
+
+def tile_response(request: Request, body: bytes, etag: str, media_type: str) -> Response:
+    """Serve a cached tile with its version ETag: 304 on revalidation, 204 when empty."""
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), (etag,)):
+        return Response(status_code=304, headers=headers)
+    if not body:
+        return Response(status_code=204, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def _etag_matches(header: Optional[str], etags: Sequence[str]) -> bool:
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return any(candidate == "*" or candidate.removeprefix("W/") in etags for candidate in candidates)
+
+
+def _accepts_gzip(header: str) -> bool:
+    for coding in header.lower().split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip() in ("gzip", "*"):
+            quality = params.strip().removeprefix("q=")
+            try:
+                return not params or float(quality) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def dataset_to_forecast_response(
+    dataset: xr.Dataset, latitude: float, longitude: float, horizon_hours: Optional[int] = None
+) -> models.ForecastResponse:
+    return models.ForecastResponse.parse_obj(forecast_payload(dataset, latitude, longitude, horizon_hours))
 
 
 def geo_dataframe_to_geojson_features(gdf) -> Iterable[models.GeoJSONFeature]:
-    for _, row in gdf.iterrows():
-        yield models.GeoJSONFeature(geometry=row.geometry.__geo_interface__, properties=row.drop(labels="geometry").to_dict())
+    """Rows as ``GeoJSONFeature`` models; response bodies should use :func:`geojson_feature_collection`."""
+
+    properties = gdf.drop(columns=gdf.geometry.name).to_dict(orient="records")
+    for geometry, row in zip(gdf.geometry.values, properties):
+        yield models.GeoJSONFeature(geometry=geometry.__geo_interface__, properties=row)
+
+
+def geojson_features(gdf: gpd.GeoDataFrame) -> List[str]:
+    """One GeoJSON ``Feature`` string per row, encoded column-wise.
+
+    Geometries go through ``shapely.to_geojson`` and properties through
+    ``DataFrame.to_json`` (C encoders over whole arrays); the only per-row Python
+    work is joining the two strings. Floats keep 15 significant digits, NaN and
+    missing values become ``null``, timestamps ISO strings.
+    """
+
+    geometries = shapely.to_geojson(np.asarray(gdf.geometry.values, dtype=object))
+    attributes = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    if len(attributes.columns):
+        properties = attributes.to_json(orient="records", lines=True, double_precision=15, date_format="iso").split("\n")
+    else:
+        properties = ["{}"] * len(gdf)
+    return [f'{{"type":"Feature","geometry":{geometry or "null"},"properties":{row}}}' for geometry, row in zip(geometries, properties)]
+
+
+def geojson_feature_collection(gdf: gpd.GeoDataFrame, chunk_features: int = GEOJSON_CHUNK_FEATURES, **members: Any) -> Iterator[bytes]:
+    """A ``FeatureCollection`` body in pieces of ``chunk_features`` features.
+
+    Only one chunk is encoded at a time, so a ``StreamingResponse`` over it holds a
+    chunk rather than the whole layer and sends its first bytes after the first
+    chunk. Extra top-level ``members`` (e.g. ``generated_at``) follow ``features``.
+    """
+
+    yield b'{"type":"FeatureCollection","features":['
+    for start in range(0, len(gdf), chunk_features):
+        chunk = ",".join(geojson_features(gdf.iloc[start:start + chunk_features]))
+        yield (chunk if start == 0 else "," + chunk).encode()
+    yield b"]" + b"".join(b"," + jsonio.dumps(key) + b":" + jsonio.dumps(value) for key, value in members.items()) + b"}"
 
 
-__all__ = ["dataset_to_forecast_response", "geo_dataframe_to_geojson_features"]
+__all__ = [
+    "cached_body_response",
+    "dataset_to_forecast_response",
+    "fast_json_response",
+    "forecast_batch_payload",
+    "forecast_columns",
+    "forecast_payload",
+    "geo_dataframe_to_geojson_features",
+    "geojson_feature_collection",
+    "geojson_features",
+    "stream_forecast_batch",
+    "tile_response",
+]
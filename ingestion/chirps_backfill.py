@@ -0,0 +1,403 @@
+"""Bounded-concurrency CHIRPS backfill with session reuse and a completion manifest."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
+
+import aioftp
+import httpx
+
+from ingestion.chirps_datacube import ChirpsDatacube
+from shared.config import get_settings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ingestion.satellite_ingest import SatelliteIngestor
+
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    sha256: str
+    completed_at: str
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BackfillManifest:
+    """JSON record of completed products (size and SHA-256) keyed by file name.
+
+    Saved atomically, so a crash mid-write leaves the previous manifest intact.
+    Workers record and save from ``asyncio.to_thread`` calls concurrently, so
+    ``entries`` is only touched under a lock and :meth:`save` writes a snapshot.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: Dict[str, ManifestEntry] = {}
+        self._dirty = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path.exists():
+            try:
+                raw = json.loads(path.read_text())
+                self.entries = {name: ManifestEntry(**entry) for name, entry in raw.get("files", {}).items()}
+            except (ValueError, TypeError) as exc:
+                log.warning("Ignoring unreadable backfill manifest %s: %s", path, exc)
+
+    def is_complete(self, path: Path, verify_checksum: bool = False) -> bool:
+        with self._lock:
+            entry = self.entries.get(path.name)
+        if entry is None or not path.exists() or path.stat().st_size != entry.size:
+            return False
+        return not verify_checksum or file_sha256(path) == entry.sha256
+
+    def record(self, path: Path) -> ManifestEntry:
+        entry = ManifestEntry(
+            size=path.stat().st_size,
+            sha256=file_sha256(path),
+            completed_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        )
+        with self._lock:
+            self.entries[path.name] = entry
+            self._dirty += 1
+        return entry
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            if self.entries.pop(name, None) is not None:
+                self._dirty += 1
+
+    @property
+    def dirty(self) -> int:
+        return self._dirty
+
+    def save(self) -> None:
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty and self.path.exists():
+                    return
+                dirty = self._dirty
+                entries = dict(self.entries)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            payload = {"files": {name: asdict(entry) for name, entry in sorted(entries.items())}}
+            tmp.write_text(json.dumps(payload, indent=1))
+            os.replace(tmp, self.path)
+            with self._lock:
+                # Changes recorded while writing stay dirty for the next save.
+                self._dirty -= dirty
+
+
+class FtpSessionPool:
+    """A few logged-in ``aioftp`` clients shared by all backfill workers.
+
+    Sessions are opened lazily up to ``size`` and handed out through a queue; a
+    session that raises is closed and replaced on next use rather than returned.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str, size: int = 2) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = max(1, size)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._opened = 0
+        self.logins = 0
+
+    async def _open(self) -> aioftp.Client:
+        client = aioftp.Client()
+        await client.connect(self.host, self.port)
+        await client.login(self.user, self.password)
+        self.logins += 1
+        return client
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[aioftp.Client]:
+        if self._idle.empty() and self._opened < self.size:
+            self._opened += 1
+            try:
+                client = await self._open()
+            except BaseException:
+                self._opened -= 1
+                raise
+        else:
+            client = await self._idle.get()
+            if client is None:
+                # Placeholder for a session dropped after an error: reconnect.
+                try:
+                    client = await self._open()
+                except BaseException:
+                    self._idle.put_nowait(None)
+                    raise
+        try:
+            yield client
+        except BaseException:
+            client.close()
+            self._idle.put_nowait(None)
+            raise
+        self._idle.put_nowait(client)
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            if client is None:
+                continue
+            try:
+                await client.quit()
+            except (OSError, aioftp.StatusCodeError):
+                client.close()
+        self._opened = 0
+
+
+@dataclass
+class BackfillReport:
+    requested: int = 0
+    downloaded: int = 0
+    skipped: int = 0
+    bytes_downloaded: int = 0
+    cube_appended: int = 0
+    elapsed_seconds: float = 0.0
+    failed: Dict[str, str] = field(default_factory=dict)
+    paths: Dict[date, Path] = field(default_factory=dict)
+
+    @property
+    def completed(self) -> int:
+        return self.downloaded + self.skipped
+
+    @property
+    def throughput_mb_s(self) -> float:
+        return (self.bytes_downloaded / 1e6 / self.elapsed_seconds) if self.elapsed_seconds else 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "requested": self.requested,
+            "downloaded": self.downloaded,
+            "skipped": self.skipped,
+            "failed": len(self.failed),
+            "bytes_downloaded": self.bytes_downloaded,
+            "cube_appended": self.cube_appended,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "throughput_mb_s": round(self.throughput_mb_s, 3),
+        }
+
+
+class ChirpsBackfill:
+    """Fetch a date range of CHIRPS grids with a fixed worker pool.
+
+    Days already recorded in the manifest (matching size, and checksum when
+    ``verify_checksums``) are skipped, so reruns only fetch missing or corrupt
+    files. FTP endpoints share a small :class:`FtpSessionPool`; HTTP endpoints go
+    through the ingestor's pooled keep-alive client. With a ``datacube`` every
+    GeoTIFF obtained (downloaded or already on disk) is also appended to it.
+    """
+
+    def __init__(
+        self,
+        ingestor: "SatelliteIngestor",
+        workers: Optional[int] = None,
+        ftp_sessions: Optional[int] = None,
+        retries: Optional[int] = None,
+        retry_backoff: float = 1.0,
+        verify_checksums: Optional[bool] = None,
+        manifest_path: Optional[Path] = None,
+        progress_interval: float = 30.0,
+        save_every: int = 50,
+        datacube: Optional[ChirpsDatacube] = None,
+    ) -> None:
+        settings = get_settings()
+        self.ingestor = ingestor
+        self.workers = max(1, workers or settings.chirps_backfill_workers)
+        self.ftp_sessions = ftp_sessions or settings.chirps_ftp_sessions
+        self.retries = settings.chirps_backfill_retries if retries is None else retries
+        self.retry_backoff = retry_backoff
+        self.verify_checksums = settings.chirps_verify_checksums if verify_checksums is None else verify_checksums
+        self.manifest = BackfillManifest(manifest_path or ingestor.storage_dir / MANIFEST_NAME)
+        self.progress_interval = progress_interval
+        self.save_every = max(1, save_every)
+        self.datacube = datacube
+        self.report = BackfillReport()
+        self._started = 0.0
+
+    async def run(self, start: date, end: date, fmt: str = "tif") -> BackfillReport:
+        days = (end - start).days
+        if days < 0:
+            raise ValueError("end date must be on or after start date")
+        queue: asyncio.Queue = asyncio.Queue()
+        for offset in range(days + 1):
+            queue.put_nowait(start + timedelta(days=offset))
+        self.report = BackfillReport(requested=days + 1)
+        self._started = time.perf_counter()
+
+        pool: Optional[FtpSessionPool] = None
+        if self.ingestor.uses_ftp:
+            host, port, user, password, _ = self.ingestor.ftp_address()
+            pool = FtpSessionPool(host, port, user, password, size=min(self.ftp_sessions, self.workers))
+        reporter = asyncio.create_task(self._report_progress())
+        try:
+            workers = [asyncio.create_task(self._worker(queue, fmt, pool)) for _ in range(min(self.workers, days + 1))]
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            self.report.elapsed_seconds = time.perf_counter() - self._started
+            await asyncio.to_thread(self.manifest.save)
+            if pool is not None:
+                await pool.close()
+        self._log_progress(final=True)
+        return self.report
+
+    async def _worker(self, queue: asyncio.Queue, fmt: str, pool: Optional[FtpSessionPool]) -> None:
+        while not queue.empty():
+            day = queue.get_nowait()
+            name = self.ingestor._resolve_chirps_filename(day, fmt=fmt)
+            try:
+                path = await self._fetch_day(name, pool)
+            except Exception as exc:  # noqa: BLE001 - record and carry on with the range
+                log.warning("CHIRPS backfill failed for %s: %s", name, exc)
+                self.report.failed[name] = str(exc) or type(exc).__name__
+                continue
+            self.report.paths[day] = path
+            if self.datacube is not None and path.suffix in (".tif", ".tiff"):
+                try:
+                    await asyncio.to_thread(self._append_to_cube, day, path)
+                except (OSError, ValueError) as exc:
+                    log.warning("Could not add %s to the datacube: %s", path.name, exc)
+                    self.report.failed[name] = f"datacube: {exc}"
+            if self.manifest.dirty >= self.save_every:
+                try:
+                    await asyncio.to_thread(self.manifest.save)
+                except OSError as exc:  # the final save in run() tries again
+                    log.warning("Could not save the backfill manifest: %s", exc)
+
+    async def _fetch_day(self, name: str, pool: Optional[FtpSessionPool]) -> Path:
+        final = self.ingestor.final_path(name)
+        if await asyncio.to_thread(self.manifest.is_complete, final, self.verify_checksums):
+            self.report.skipped += 1
+            return final
+        if final.exists():
+            if final.name in self.manifest.entries:
+                log.info("Re-fetching %s: does not match the manifest", final.name)
+                final.unlink()
+                self.manifest.discard(final.name)
+            else:
+                # Files only appear under their final name once complete, so adopt it.
+                await asyncio.to_thread(self.manifest.record, final)
+                self.report.skipped += 1
+                return final
+
+        attempt = 0
+        while True:
+            try:
+                if pool is not None:
+                    async with pool.session() as client:
+                        path = await self.ingestor.download_file(name, ftp_client=client)
+                else:
+                    path = await self.ingestor.download_file(name)
+                break
+            except Exception as exc:
+                if attempt >= self.retries or not _retryable(exc):
+                    raise
+                attempt += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+        entry = await asyncio.to_thread(self.manifest.record, path)
+        self.report.downloaded += 1
+        self.report.bytes_downloaded += entry.size
+        return path
+
+    def _append_to_cube(self, day: date, path: Path) -> None:
+        if not self.datacube.has_day(day):
+            self.datacube.append(path, day)
+            self.report.cube_appended += 1
+
+    async def _report_progress(self) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self._log_progress()
+
+    def _log_progress(self, final: bool = False) -> None:
+        report = self.report
+        elapsed = time.perf_counter() - self._started if not final else report.elapsed_seconds
+        done = report.completed + len(report.failed)
+        rate = report.bytes_downloaded / 1e6 / elapsed if elapsed else 0.0
+        files_per_s = report.downloaded / elapsed if elapsed else 0.0
+        eta = (report.requested - done) / files_per_s if files_per_s else float("nan")
+        log.info(
+            "CHIRPS backfill %s: %d/%d files (%d downloaded, %d skipped, %d failed), %.1f MB at %.2f MB/s, ETA %.0fs",
+            "finished" if final else "progress",
+            done,
+            report.requested,
+            report.downloaded,
+            report.skipped,
+            len(report.failed),
+            report.bytes_downloaded / 1e6,
+            rate,
+            eta if not final else 0.0,
+        )
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status >= 500 or status == 429
+    if isinstance(exc, aioftp.StatusCodeError):
+        # 5xx FTP replies (e.g. 550 file unavailable) are permanent.
+        return not any(str(code).startswith("5") for code in exc.received_codes)
+    return isinstance(exc, (httpx.TransportError, OSError, asyncio.TimeoutError))
+
+
+__all__ = ["BackfillManifest", "BackfillReport", "ChirpsBackfill", "FtpSessionPool", "ManifestEntry", "file_sha256"]
+
+
+async def main() -> None:
+    from ingestion.satellite_ingest import SatelliteIngestor
+
+    parser = argparse.ArgumentParser(description="Backfill CHIRPS daily grids for a date range.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, required=True, help="Last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--format", default="tif", help="Product suffix, e.g. tif or tif.gz")
+    parser.add_argument("--workers", type=int, help="Concurrent downloads")
+    parser.add_argument("--verify", action="store_true", help="Re-hash files listed in the manifest")
+    parser.add_argument("--datacube", action="store_true", help="Also append each day to the precipitation datacube")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ingestor = SatelliteIngestor()
+    try:
+        backfill = ChirpsBackfill(
+            ingestor,
+            workers=args.workers,
+            verify_checksums=args.verify or None,
+            progress_interval=10.0,
+            datacube=ChirpsDatacube() if args.datacube else None,
+        )
+        report = await backfill.run(args.start, args.end, fmt=args.format)
+    finally:
+        await ingestor.close()
+    print(json.dumps(report.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
@@ -0,0 +1,249 @@
+"""Chunked (time, latitude, longitude) CHIRPS precipitation datacube."""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import netCDF4
+import numpy as np
+import rasterio
+import xarray as xr
+from affine import Affine
+
+from shared.config import get_settings
+
+VARIABLE = "precipitation"
+_DATE_PATTERN = re.compile(r"(\d{4})\.(\d{2})\.(\d{2})")
+
+
+def _days_in_year(year: int) -> int:
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def date_from_filename(path: Path) -> date:
+    """Parse the day out of a ``chirps-v2.0.YYYY.MM.DD.tif`` style name."""
+
+    match = _DATE_PATTERN.search(Path(path).name)
+    if match is None:
+        raise ValueError(f"cannot infer a date from {Path(path).name}")
+    return date(*(int(part) for part in match.groups()))
+
+
+class ChirpsDatacube:
+    """One chunked NetCDF4 file per year holding a full ``(day, lat, lon)`` stack.
+
+    Each year file is created with a fixed time axis (every day of the year) and a
+    ``filled`` flag per day, so appending a day is a single in-place hyperslab write
+    at its day-of-year index, in any order. Chunks are ``time_chunk`` days by
+    ``space_chunk`` x ``space_chunk`` cells: a basin-sized window over a season
+    touches a handful of compressed chunks instead of one global raster per day.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        time_chunk: Optional[int] = None,
+        space_chunk: Optional[int] = None,
+        complevel: int = 1,
+    ) -> None:
+        settings = get_settings()
+        self.root = Path(root or settings.data_root / "processed" / "chirps_cube")
+        self.time_chunk = time_chunk or settings.chirps_datacube_time_chunk
+        self.space_chunk = space_chunk or settings.chirps_datacube_space_chunk
+        self.complevel = complevel
+        # HDF5 is not safe for concurrent access from threads, so all file I/O is serialised.
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def year_path(self, year: int) -> Path:
+        return self.root / f"chirps-{year}.nc"
+
+    def append(self, path: Path, day: Optional[date] = None) -> date:
+        """Append one daily GeoTIFF; the day defaults to the one in its file name."""
+
+        day = day or date_from_filename(path)
+        with rasterio.open(path) as src:
+            band = src.read(1, masked=True).astype(np.float32).filled(np.nan)
+            transform = src.transform
+        self.append_array(day, band, transform)
+        return day
+
+    def append_many(self, paths: Iterable[Path]) -> List[date]:
+        return [self.append(path) for path in paths]
+
+    def append_array(self, day: date, data: np.ndarray, transform: Affine) -> None:
+        """Write a north-up ``(lat, lon)`` grid for ``day``; the grid must match the year's."""
+
+        data = np.asarray(data, dtype=np.float32)
+        if data.ndim != 2:
+            raise ValueError("expected a 2-D (lat, lon) grid")
+        path = self.year_path(day.year)
+        with self._lock:
+            if not path.exists():
+                self._create_year(path, day.year, data.shape, transform)
+            with netCDF4.Dataset(path, "a") as handle:
+                self._check_grid(handle, data.shape, transform, path)
+                index = day.timetuple().tm_yday - 1
+                handle.variables[VARIABLE][index, :, :] = data
+                handle.variables["filled"][index] = 1
+
+    def has_day(self, day: date) -> bool:
+        path = self.year_path(day.year)
+        if not path.exists():
+            return False
+        with self._lock, netCDF4.Dataset(path, "r") as handle:
+            return bool(handle.variables["filled"][day.timetuple().tm_yday - 1])
+
+    def days(self) -> List[date]:
+        """Days present in the cube, oldest first."""
+
+        present: List[date] = []
+        for year in self.years():
+            with self._lock, netCDF4.Dataset(self.year_path(year), "r") as handle:
+                filled = np.asarray(handle.variables["filled"][:])
+            start = date(year, 1, 1)
+            present.extend(start + timedelta(days=int(offset)) for offset in np.flatnonzero(filled))
+        return present
+
+    def years(self) -> List[int]:
+        years = []
+        for path in self.root.glob("chirps-*.nc"):
+            try:
+                years.append(int(path.stem.split("-", 1)[1]))
+            except ValueError:
+                continue
+        return sorted(years)
+
+    def read(
+        self,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> Optional[xr.DataArray]:
+        """Read a ``(time, latitude, longitude)`` window.
+
+        ``bbox`` is ``(min_lon, min_lat, max_lon, max_lat)``; cells whose centres fall
+        inside it are returned. Only the requested hyperslab is read from disk. Days in
+        the range that were never appended come back as NaN. Returns ``None`` when the
+        window is empty.
+        """
+
+        years = self.years()
+        if not years:
+            return None
+        start = start or date(years[0], 1, 1)
+        end = end or date(years[-1], 12, 31)
+        if end < start:
+            raise ValueError("end must be on or after start")
+
+        slabs: List[Optional[np.ndarray]] = []
+        times: List[np.ndarray] = []
+        latitudes = longitudes = None
+        for year in range(start.year, end.year + 1):
+            first = max(start, date(year, 1, 1))
+            last = min(end, date(year, 12, 31))
+            count = (last - first).days + 1
+            path = self.year_path(year)
+            day_index = np.arange(np.datetime64(first, "D"), np.datetime64(first, "D") + count)
+            if not path.exists():
+                slabs.append(None)
+                times.append(day_index)
+                continue
+            with self._lock, netCDF4.Dataset(path, "r") as handle:
+                lat = np.asarray(handle.variables["latitude"][:])
+                lon = np.asarray(handle.variables["longitude"][:])
+                rows, cols = self._window(lat, lon, bbox)
+                if rows.stop <= rows.start or cols.stop <= cols.start:
+                    return None
+                if latitudes is None:
+                    latitudes, longitudes = lat[rows], lon[cols]
+                elif latitudes.shape != lat[rows].shape or longitudes.shape != lon[cols].shape:
+                    raise ValueError(f"{path.name} uses a different grid from earlier years")
+                t0 = first.timetuple().tm_yday - 1
+                variable = handle.variables[VARIABLE]
+                variable.set_auto_mask(False)
+                slab = np.asarray(variable[t0 : t0 + count, rows, cols], dtype=np.float32)
+                filled = np.asarray(handle.variables["filled"][t0 : t0 + count]).astype(bool)
+            slab[~filled] = np.nan
+            slabs.append(slab)
+            times.append(day_index)
+
+        if latitudes is None:
+            return None
+        shape = (len(latitudes), len(longitudes))
+        data = np.concatenate(
+            [slab if slab is not None else np.full((len(t),) + shape, np.nan, dtype=np.float32) for slab, t in zip(slabs, times)]
+        )
+        return xr.DataArray(
+            data,
+            dims=("time", "latitude", "longitude"),
+            coords={
+                "time": np.concatenate(times).astype("datetime64[ns]"),
+                "latitude": latitudes,
+                "longitude": longitudes,
+            },
+            name=VARIABLE,
+            attrs={"units": "mm/day", "source": "CHIRPS"},
+        )
+
+    def _create_year(self, path: Path, year: int, shape: Sequence[int], transform: Affine) -> None:
+        rows, cols = shape
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        lat = transform.f + transform.e * (np.arange(rows) + 0.5)
+        lon = transform.c + transform.a * (np.arange(cols) + 0.5)
+        with netCDF4.Dataset(tmp_path, "w", format="NETCDF4") as handle:
+            handle.createDimension("time", _days_in_year(year))
+            handle.createDimension("latitude", rows)
+            handle.createDimension("longitude", cols)
+            time_var = handle.createVariable("time", "i4", ("time",))
+            time_var.units = f"days since {year}-01-01"
+            time_var.calendar = "proleptic_gregorian"
+            time_var[:] = np.arange(_days_in_year(year))
+            handle.createVariable("latitude", "f8", ("latitude",))[:] = lat
+            handle.createVariable("longitude", "f8", ("longitude",))[:] = lon
+            handle.createVariable("filled", "i1", ("time",), fill_value=0)
+            chunks = (
+                min(self.time_chunk, _days_in_year(year)),
+                min(self.space_chunk, rows),
+                min(self.space_chunk, cols),
+            )
+            precip = handle.createVariable(
+                VARIABLE,
+                "f4",
+                ("time", "latitude", "longitude"),
+                zlib=self.complevel > 0,
+                complevel=self.complevel,
+                shuffle=True,
+                chunksizes=chunks,
+                fill_value=np.float32(np.nan),
+            )
+            precip.units = "mm/day"
+            handle.geotransform = list(transform)[:6]
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _check_grid(handle: netCDF4.Dataset, shape: Sequence[int], transform: Affine, path: Path) -> None:
+        expected_shape = (len(handle.dimensions["latitude"]), len(handle.dimensions["longitude"]))
+        if tuple(shape) != expected_shape or not np.allclose(list(transform)[:6], handle.geotransform):
+            raise ValueError(f"grid {tuple(shape)} does not match {path.name} {expected_shape}")
+
+    @staticmethod
+    def _window(
+        lat: np.ndarray, lon: np.ndarray, bbox: Optional[Tuple[float, float, float, float]]
+    ) -> Tuple[slice, slice]:
+        if bbox is None:
+            return slice(0, len(lat)), slice(0, len(lon))
+        min_lon, min_lat, max_lon, max_lat = bbox
+        rows = np.flatnonzero((lat >= min_lat) & (lat <= max_lat))
+        cols = np.flatnonzero((lon >= min_lon) & (lon <= max_lon))
+        if not len(rows) or not len(cols):
+            return slice(0, 0), slice(0, 0)
+        return slice(int(rows[0]), int(rows[-1]) + 1), slice(int(cols[0]), int(cols[-1]) + 1)
+
+
+__all__ = ["ChirpsDatacube", "date_from_filename"]
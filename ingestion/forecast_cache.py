@@ -0,0 +1,149 @@
+"""In-memory forecast cache keyed on provider grid cells and model runs."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import xarray as xr
+
+
+class ForecastCacheKey(NamedTuple):
+    cell: Tuple[int, int]
+    variables: Tuple[str, ...]
+    model_run: int
+    forecast_days: int = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    stale_hits: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class ForecastCache:
+    """Bounded LRU cache for forecast datasets that expires on model updates.
+
+    Coordinates are snapped to the provider grid (``resolution`` degrees), so every
+    request falling in the same model cell shares one entry. Entries belong to the
+    model run that was current when they were stored and expire once the next run
+    is published, i.e. every ``update_interval`` seconds (aligned to UTC epoch).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        resolution: float = 0.01,
+        update_interval: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be positive")
+        if resolution <= 0 or update_interval <= 0:
+            raise ValueError("resolution and update_interval must be positive")
+        self.max_entries = max_entries
+        self.resolution = resolution
+        self.update_interval = update_interval
+        self._clock = clock
+        self._entries: "OrderedDict[ForecastCacheKey, Tuple[float, xr.Dataset]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def snap(self, lat: float, lon: float) -> Tuple[int, int]:
+        """Return the integer grid cell index containing ``(lat, lon)``."""
+
+        return int(round(lat / self.resolution)), int(round(lon / self.resolution))
+
+    def cell_center(self, cell: Tuple[int, int]) -> Tuple[float, float]:
+        return round(cell[0] * self.resolution, 6), round(cell[1] * self.resolution, 6)
+
+    def model_run(self, now: Optional[float] = None) -> int:
+        """Epoch seconds at which the currently published model run started."""
+
+        now = self._clock() if now is None else now
+        return int(now // self.update_interval * self.update_interval)
+
+    def model_run_time(self, model_run: int) -> datetime:
+        return datetime.fromtimestamp(model_run, tz=timezone.utc)
+
+    def key(self, lat: float, lon: float, variables: Sequence[str], forecast_days: int = 0) -> ForecastCacheKey:
+        return ForecastCacheKey(self.snap(lat, lon), tuple(variables), self.model_run(), forecast_days)
+
+    def get(self, key: ForecastCacheKey) -> Optional[xr.Dataset]:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, dataset = entry
+            if now >= expires_at:
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return dataset
+
+    def get_stale(
+        self, lat: float, lon: float, variables: Sequence[str], max_runs_back: int = 24, forecast_days: int = 0
+    ) -> Optional[xr.Dataset]:
+        """Newest entry for the cell from the current or an earlier run, ignoring expiry.
+
+        Used as a degraded-mode fallback when the provider is unavailable; expired
+        entries stay in the LRU until evicted, so recent runs are usually present.
+        """
+
+        cell = self.snap(lat, lon)
+        run = self.model_run()
+        with self._lock:
+            for step in range(max_runs_back + 1):
+                key = ForecastCacheKey(cell, tuple(variables), int(run - step * self.update_interval), forecast_days)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.stats.stale_hits += 1
+                    return entry[1]
+        return None
+
+    def put(self, key: ForecastCacheKey, dataset: xr.Dataset) -> None:
+        expires_at = key.model_run + self.update_interval
+        with self._lock:
+            self._entries[key] = (expires_at, dataset)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Counters plus occupancy, suitable for a metrics endpoint."""
+
+        data: Dict[str, float] = dict(self.stats.as_dict())
+        lookups = self.stats.hits + self.stats.misses
+        data.update(
+            {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_ratio": (self.stats.hits / lookups) if lookups else 0.0,
+            }
+        )
+        return data
+
+
+__all__ = ["ForecastCache", "ForecastCacheKey", "CacheStats"]
@@ -0,0 +1,171 @@
+"""Append-only, chunked on-disk archive of ingested forecasts."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import xarray as xr
+
+RUN_FORMAT = "%Y%m%dT%H%M"
+TimeLike = Union[str, datetime, np.datetime64]
+
+
+class ForecastStore:
+    """Partitioned NetCDF4 forecast store indexed by (cell, model run, valid time).
+
+    Every :meth:`append` writes one new compressed, chunked NetCDF4 partition under
+    ``<root>/run=<model run>/`` and publishes it with an atomic rename, so the cost
+    of an ingest depends only on the new data and readers only ever see complete,
+    immutable files — there is no lock shared between readers and writers. When the
+    same grid cell is appended twice for a run, reads return the latest partition.
+    """
+
+    def __init__(self, root: Path, resolution: float = 0.01, location_chunk: int = 256, time_chunk: int = 96) -> None:
+        self.root = Path(root)
+        self.resolution = resolution
+        self.location_chunk = location_chunk
+        self.time_chunk = time_chunk
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def append(self, dataset: xr.Dataset, model_run: Optional[datetime] = None) -> Path:
+        """Persist a ``(location, variable, time)`` forecast dataset as a new partition."""
+
+        if "location" not in dataset.dims:
+            dataset = dataset.expand_dims("location")
+        run = self._resolve_run(dataset, model_run)
+        lats = self._coordinate(dataset, "latitude", "lat")
+        lons = self._coordinate(dataset, "longitude", "lon")
+        cells = np.array(
+            [f"{int(round(lat / self.resolution))}:{int(round(lon / self.resolution))}" for lat, lon in zip(lats, lons)],
+            dtype=object,
+        )
+        partition = dataset[["forecast"]].transpose("location", "variable", "time")
+        partition = partition.assign_coords(
+            location=np.arange(partition.sizes["location"]),
+            cell=("location", cells),
+            latitude=("location", lats),
+            longitude=("location", lons),
+        )
+        partition.attrs = {key: str(value) for key, value in dataset.attrs.items() if key not in ("lat", "lon")}
+        partition.attrs["model_run"] = run.strftime(RUN_FORMAT)
+
+        run_dir = self.root / f"run={run.strftime(RUN_FORMAT)}"
+        run_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}.nc"
+        tmp_path = run_dir / f".{name}.tmp"
+        chunks = (
+            min(self.location_chunk, partition.sizes["location"]),
+            partition.sizes["variable"],
+            max(1, min(self.time_chunk, partition.sizes["time"])),
+        )
+        encoding = {"forecast": {"zlib": True, "complevel": 4, "chunksizes": chunks}}
+        partition.to_netcdf(tmp_path, engine="netcdf4", format="NETCDF4", encoding=encoding)
+        final_path = run_dir / name
+        os.replace(tmp_path, final_path)
+        return final_path
+
+    def runs(self) -> List[datetime]:
+        """Model runs present in the store, oldest first."""
+
+        runs = []
+        for path in self.root.glob("run=*"):
+            try:
+                runs.append(datetime.strptime(path.name[len("run="):], RUN_FORMAT).replace(tzinfo=timezone.utc))
+            except ValueError:
+                continue
+        return sorted(runs)
+
+    def read(
+        self,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        start: Optional[TimeLike] = None,
+        end: Optional[TimeLike] = None,
+        model_run: Optional[datetime] = None,
+    ) -> Optional[xr.Dataset]:
+        """Read a window of one model run (latest by default).
+
+        ``bbox`` is ``(min_lon, min_lat, max_lon, max_lat)``. Partitions are opened
+        lazily and only the selected locations and time steps are read from disk.
+        Returns ``None`` when nothing matches.
+        """
+
+        if model_run is None:
+            runs = self.runs()
+            if not runs:
+                return None
+            model_run = runs[-1]
+        run_dir = self.root / f"run={model_run.strftime(RUN_FORMAT)}"
+        windows: List[xr.Dataset] = []
+        for path in sorted(run_dir.glob("part-*.nc")):
+            with xr.open_dataset(path, engine="netcdf4") as partition:
+                selected = self._window(partition, bbox, start, end)
+                if selected is not None:
+                    windows.append(selected.load())
+        if not windows:
+            return None
+        combined = windows[0] if len(windows) == 1 else xr.concat(windows, dim="location", join="outer")
+        _, last = np.unique(combined["cell"].values[::-1], return_index=True)
+        keep = np.sort(combined.sizes["location"] - 1 - last)
+        combined = combined.isel(location=keep)
+        combined = combined.assign_coords(location=np.arange(combined.sizes["location"]))
+        combined.attrs["model_run"] = model_run.strftime(RUN_FORMAT)
+        return combined
+
+    def prune(self, keep_runs: int) -> List[datetime]:
+        """Delete all but the newest ``keep_runs`` model runs; returns the removed runs."""
+
+        runs = self.runs()
+        removed = runs[: max(0, len(runs) - keep_runs)]
+        for run in removed:
+            shutil.rmtree(self.root / f"run={run.strftime(RUN_FORMAT)}", ignore_errors=True)
+        return removed
+
+    @staticmethod
+    def _window(
+        partition: xr.Dataset,
+        bbox: Optional[Tuple[float, float, float, float]],
+        start: Optional[TimeLike],
+        end: Optional[TimeLike],
+    ) -> Optional[xr.Dataset]:
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            lats = partition["latitude"].values
+            lons = partition["longitude"].values
+            mask = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+            if not mask.any():
+                return None
+            partition = partition.isel(location=np.flatnonzero(mask))
+        if start is not None or end is not None:
+            start_value = np.datetime64(start) if start is not None else None
+            end_value = np.datetime64(end) if end is not None else None
+            partition = partition.sel(time=slice(start_value, end_value))
+            if partition.sizes["time"] == 0:
+                return None
+        return partition
+
+    @staticmethod
+    def _coordinate(dataset: xr.Dataset, coord: str, attr: str) -> np.ndarray:
+        if coord in dataset.coords:
+            return np.asarray(dataset[coord].values, dtype=float).reshape(-1)
+        if attr in dataset.attrs:
+            return np.full(dataset.sizes["location"], float(dataset.attrs[attr]))
+        raise ValueError(f"dataset has neither a '{coord}' coordinate nor a '{attr}' attribute")
+
+    @staticmethod
+    def _resolve_run(dataset: xr.Dataset, model_run: Optional[datetime]) -> datetime:
+        if model_run is None and dataset.attrs.get("model_run"):
+            model_run = datetime.fromisoformat(str(dataset.attrs["model_run"]))
+        if model_run is None:
+            model_run = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        if model_run.tzinfo is None:
+            model_run = model_run.replace(tzinfo=timezone.utc)
+        return model_run.astimezone(timezone.utc)
+
+
+__all__ = ["ForecastStore"]
@@ -0,0 +1,245 @@
+"""Background forecast prefetching for registered hotspots and basins."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ingestion.weather_ingest import WeatherIngestor
+from shared.config import get_settings
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PrefetchTarget:
+    name: str
+    points: List[Tuple[float, float]]
+    priority: int = 0
+    last_refreshed: Optional[float] = None
+    last_model_run: Optional[int] = None
+    failures: int = 0
+    consecutive_failures: int = 0
+    retry_at: Optional[float] = None
+
+
+@dataclass
+class PrefetchStats:
+    cycles: int = 0
+    refreshes: int = 0
+    failures: int = 0
+    last_cycle_seconds: float = 0.0
+    last_cycle_started: Optional[float] = None
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+class PrefetchScheduler:
+    """Refresh registered forecast targets right after each provider model update.
+
+    Targets are refreshed highest ``priority`` first by at most ``concurrency``
+    workers, through :meth:`WeatherIngestor.fetch_many` so batching, caching and
+    request coalescing all apply. Each cycle starts ``publish_delay`` seconds after
+    a model-run boundary plus up to ``jitter`` seconds so replicas do not stampede
+    the provider together.
+
+    ``fetch_many`` does not raise when the provider is down; it returns stale or
+    synthetic fallbacks. A refresh that got any is therefore a failure too: the
+    target keeps its previous ``last_model_run`` and is retried after ``retry``
+    seconds, doubling per consecutive failure up to the update interval.
+
+    It warms the given ingestor's in-process cache, so it has to run inside the
+    API process that serves ``/forecast`` (``PREFETCH_ENABLED``).
+    """
+
+    def __init__(
+        self,
+        ingestor: WeatherIngestor,
+        concurrency: int = 2,
+        jitter: float = 60.0,
+        publish_delay: float = 300.0,
+        update_interval: Optional[float] = None,
+        retry: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ingestor = ingestor
+        self.concurrency = max(1, concurrency)
+        self.retry = max(0.0, retry)
+        self.jitter = max(0.0, jitter)
+        self.publish_delay = max(0.0, publish_delay)
+        if update_interval is None:
+            update_interval = ingestor.cache.update_interval if ingestor.cache is not None else (
+                ingestor.settings.forecast_update_interval_minutes * 60
+            )
+        self.update_interval = float(update_interval)
+        self._clock = clock
+        self._targets: Dict[str, PrefetchTarget] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = PrefetchStats()
+
+    def register_hotspot(self, name: str, lat: float, lon: float, priority: int = 0) -> PrefetchTarget:
+        return self._register(PrefetchTarget(name=name, points=[(float(lat), float(lon))], priority=priority))
+
+    def register_basin(self, basin_id: str, points: Iterable[Tuple[float, float]], priority: int = 0) -> PrefetchTarget:
+        coords = [(float(lat), float(lon)) for lat, lon in points]
+        if not coords:
+            raise ValueError("a basin needs at least one point")
+        return self._register(PrefetchTarget(name=basin_id, points=coords, priority=priority))
+
+    def unregister(self, name: str) -> None:
+        self._targets.pop(name, None)
+
+    @property
+    def targets(self) -> List[PrefetchTarget]:
+        return sorted(self._targets.values(), key=lambda target: -target.priority)
+
+    def _register(self, target: PrefetchTarget) -> PrefetchTarget:
+        self._targets[target.name] = target
+        return target
+
+    def current_model_run(self, now: Optional[float] = None) -> int:
+        now = self._clock() if now is None else now
+        return int(now // self.update_interval * self.update_interval)
+
+    def next_delay(self, now: Optional[float] = None) -> float:
+        """Seconds until the next refresh window (next model run + publish delay + jitter)."""
+
+        now = self._clock() if now is None else now
+        window = self.current_model_run(now) + self.publish_delay
+        if window <= now:
+            window += self.update_interval
+        return window - now + random.uniform(0.0, self.jitter)
+
+    def retry_delay(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the earliest failed target is due for a retry; ``None`` if none failed."""
+
+        now = self._clock() if now is None else now
+        due = [target.retry_at for target in self._targets.values() if target.retry_at is not None]
+        return max(0.0, min(due) - now) if due else None
+
+    async def refresh_all(self, targets: Optional[Iterable[PrefetchTarget]] = None) -> Dict[str, bool]:
+        """Refresh every registered target (or just ``targets``) once, highest priority first."""
+
+        started = self._clock()
+        self.stats.last_cycle_started = started
+        queue: "asyncio.Queue[PrefetchTarget]" = asyncio.Queue()
+        for target in sorted(targets, key=lambda target: -target.priority) if targets is not None else self.targets:
+            queue.put_nowait(target)
+        outcome: Dict[str, bool] = {}
+
+        async def _worker() -> None:
+            while True:
+                try:
+                    target = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                outcome[target.name] = await self._refresh(target)
+
+        await asyncio.gather(*(_worker() for _ in range(min(self.concurrency, max(1, queue.qsize())))))
+        self.stats.cycles += 1
+        self.stats.last_cycle_seconds = self._clock() - started
+        return outcome
+
+    async def _refresh(self, target: PrefetchTarget) -> bool:
+        model_run = self.current_model_run()
+        try:
+            datasets = await self.ingestor.fetch_many(target.points)
+        except Exception as exc:  # keep refreshing the remaining targets
+            self._failed(target, str(exc))
+            return False
+        fallbacks = sum(1 for dataset in datasets if not WeatherIngestor._cacheable(dataset))
+        if fallbacks:
+            self._failed(target, f"{fallbacks} of {len(target.points)} points served from fallback")
+            return False
+        target.last_refreshed = self._clock()
+        target.last_model_run = model_run
+        target.consecutive_failures = 0
+        target.retry_at = None
+        self.stats.refreshes += 1
+        self.stats.errors.pop(target.name, None)
+        return True
+
+    def _failed(self, target: PrefetchTarget, error: str) -> None:
+        target.failures += 1
+        target.consecutive_failures += 1
+        backoff = min(self.retry * 2 ** (target.consecutive_failures - 1), self.update_interval)
+        target.retry_at = self._clock() + backoff
+        self.stats.failures += 1
+        self.stats.errors[target.name] = error
+        log.warning("Prefetch of %s failed (%s); retrying in %.0fs", target.name, error, backoff)
+
+    async def run_forever(self) -> None:
+        await self.refresh_all()
+        while True:
+            delay = self.next_delay()
+            retry = self.retry_delay()
+            if retry is not None and retry < delay:
+                await asyncio.sleep(retry)
+                now = self._clock()
+                await self.refresh_all([target for target in self._targets.values() if target.retry_at is not None and target.retry_at <= now])
+                continue
+            log.info("Prefetched %s targets; next cycle in %.0fs", len(self._targets), delay)
+            await asyncio.sleep(delay)
+            await self.refresh_all()
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def metrics(self) -> dict:
+        """Cycle counters plus staleness relative to the current model run."""
+
+        now = self._clock()
+        current_run = self.current_model_run(now)
+        ages = [now - target.last_refreshed for target in self._targets.values() if target.last_refreshed is not None]
+        stale = [
+            target.name
+            for target in self._targets.values()
+            if target.last_model_run is None or target.last_model_run < current_run
+        ]
+        return {
+            "targets": len(self._targets),
+            "stale_targets": len(stale),
+            "never_refreshed": sum(1 for target in self._targets.values() if target.last_refreshed is None),
+            "max_staleness_seconds": max(ages) if ages else None,
+            "cycles": self.stats.cycles,
+            "refreshes": self.stats.refreshes,
+            "failures": self.stats.failures,
+            "retrying": sum(1 for target in self._targets.values() if target.retry_at is not None),
+            "last_cycle_seconds": self.stats.last_cycle_seconds,
+            "errors": dict(self.stats.errors),
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+def build_scheduler(ingestor: WeatherIngestor) -> PrefetchScheduler:
+    """Create a scheduler configured from settings with the configured hotspots registered."""
+
+    settings = get_settings()
+    scheduler = PrefetchScheduler(
+        ingestor,
+        concurrency=settings.prefetch_concurrency,
+        jitter=settings.prefetch_jitter_seconds,
+        publish_delay=settings.prefetch_publish_delay_seconds,
+        retry=settings.prefetch_retry_seconds,
+    )
+    for lat, lon in settings.prefetch_hotspots:
+        scheduler.register_hotspot(f"{lat:.4f},{lon:.4f}", lat, lon)
+    return scheduler
+
+
+__all__ = ["PrefetchScheduler", "PrefetchTarget", "PrefetchStats", "build_scheduler"]
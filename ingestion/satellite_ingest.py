@@ -4,19 +4,26 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import date, datetime, timedelta
-from pathlib import Path
-from typing import Iterable, List, Optional
-
+import os
+import zlib
+from datetime import date, datetime
+from pathlib import Path, PurePosixPath
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import aiofiles
 import aioftp
 import httpx
 import rasterio
 from rasterio.io import DatasetReader
 
 from shared.config import get_settings
+from shared.http_client import get_shared_client
 
 log = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1 << 20
+
 
 class SatelliteIngestor:
     """Download satellite precipitation grids (e.g. CHIRPS) and persist to disk."""
@@ -26,62 +33,187 @@ class SatelliteIngestor:
         api_endpoint: Optional[str] = None,
         storage_dir: Optional[Path] = None,
         http_client: Optional[httpx.AsyncClient] = None,
+        gunzip: bool = True,
     ) -> None:
         settings = get_settings()
         self.storage_dir = storage_dir or (settings.data_root / "raw" / "satellite")
         self.api_endpoint = (api_endpoint or settings.chirps_base_url).rstrip("/")
-        self.client = http_client or httpx.AsyncClient(timeout=60)
+        self.client = http_client or get_shared_client()
+        self._owns_client = http_client is not None
+        self.timeout = 60.0
         self.settings = settings
+        self.gunzip = gunzip
         self.storage_dir.mkdir(parents=True, exist_ok=True)
 
     async def download_daily_chirps(self, target_date: date, fmt: str = "tif") -> Path:
         """Download a CHIRPS daily grid for the specified date."""
 
-        file_name = self._resolve_chirps_filename(target_date, fmt=fmt)
-        if self.api_endpoint.startswith("ftp://") or self.api_endpoint.startswith("sftp://"):
+        return await self.download_file(self._resolve_chirps_filename(target_date, fmt=fmt))
+
+    async def download_file(self, file_name: str, ftp_client: Optional[aioftp.Client] = None) -> Path:
+        """Download one product, reusing ``ftp_client`` (an open session) when given."""
+
+        if not self.uses_ftp:
+            return await self._download_via_http(file_name)
+        if ftp_client is None:
             return await self._download_via_ftp(file_name)
-        return await self._download_via_http(file_name)
+        target = self.storage_dir / file_name
+        final = self._final_path(target)
+        if final.exists():
+            return final
+        base_path = self.ftp_address()[4]
+        return await self._ftp_fetch(ftp_client, str(PurePosixPath(base_path) / file_name), target)
 
     async def download_range(self, start: date, end: date, fmt: str = "tif") -> List[Path]:
-        """Download a range of CHIRPS grids (inclusive)."""
+        """Download a range of CHIRPS grids (inclusive) through a bounded backfill."""
+
+        from ingestion.chirps_backfill import ChirpsBackfill
 
-        delta_days = (end - start).days
-        if delta_days < 0:
+        if (end - start).days < 0:
             raise ValueError("end date must be on or after start date")
-        tasks = [self.download_daily_chirps(start + timedelta(days=offset), fmt=fmt) for offset in range(delta_days + 1)]
-        return await asyncio.gather(*tasks)
+        report = await ChirpsBackfill(self).run(start, end, fmt=fmt)
+        if report.failed:
+            raise IOError(f"{len(report.failed)} CHIRPS file(s) failed: {', '.join(sorted(report.failed))}")
+        return [report.paths[day] for day in sorted(report.paths)]
+
+    @property
+    def uses_ftp(self) -> bool:
+        return self.api_endpoint.startswith("ftp://") or self.api_endpoint.startswith("sftp://")
+
+    def final_path(self, file_name: str) -> Path:
+        """Where ``file_name`` ends up on disk (without ``.gz`` when gunzipping)."""
+
+        return self._final_path(self.storage_dir / file_name)
 
     async def _download_via_http(self, file_name: str) -> Path:
+        """Stream ``file_name`` to disk, resuming a previous partial download via HTTP Range.
+
+        Bytes are appended to ``<file>.part`` in ``CHUNK_SIZE`` blocks so memory stays
+        flat, and the file only appears under its final name once complete. They are
+        written as sent (no ``Content-Encoding`` decoding), so the partial file's size
+        is the byte offset the next Range request resumes from.
+        """
+
         url = f"{self.api_endpoint.rstrip('/')}/{file_name}"
         target = self.storage_dir / file_name
-        if target.exists():
-            return target
+        final = self._final_path(target)
+        if final.exists():
+            return final
+        partial = self._partial_path(target)
+        offset = partial.stat().st_size if partial.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
         auth = None
         if self.settings.chirps_username and self.settings.chirps_password:
             auth = (self.settings.chirps_username, self.settings.chirps_password)
         try:
-            response = await self.client.get(url, auth=auth)
-            response.raise_for_status()
+            async with self.client.stream("GET", url, auth=auth, headers=headers, timeout=self.timeout) as response:
+                if response.status_code == 416 and offset:
+                    # The partial file already holds the whole resource.
+                    return await self._finalise(partial, final)
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    log.info("Server ignored range request for %s; restarting download", file_name)
+                    offset = 0
+                expected = self._expected_size(response, offset)
+                async with aiofiles.open(partial, "ab" if offset else "wb") as handle:
+                    async for chunk in response.aiter_raw(CHUNK_SIZE):
+                        await handle.write(chunk)
         except httpx.HTTPError as exc:
             log.error("Failed to download %s: %s", url, exc)
             raise
-        target.write_bytes(response.content)
-        return target
+        self._check_complete(partial, expected)
+        return await self._finalise(partial, final)
 
     async def _download_via_ftp(self, file_name: str) -> Path:
         target = self.storage_dir / file_name
-        if target.exists():
-            return target
-        url = self.api_endpoint
-        parsed = aioftp.parse_address(url)
-        user = self.settings.chirps_username or parsed.user or "anonymous"
-        password = self.settings.chirps_password or parsed.password or "anonymous@"
-        remote_path = str(parsed.path / file_name)
-        async with aioftp.Client.context(parsed.host, parsed.port or 21, user=user, password=password) as client:
-            async with client.download_stream(remote_path) as stream:
-                target.write_bytes(await stream.read())
+        final = self._final_path(target)
+        if final.exists():
+            return final
+        host, port, user, password, base_path = self.ftp_address()
+        async with aioftp.Client.context(host, port, user=user, password=password) as client:
+            return await self._ftp_fetch(client, str(PurePosixPath(base_path) / file_name), target)
+
+    def ftp_address(self) -> Tuple[str, int, str, str, str]:
+        parsed = urlsplit(self.api_endpoint)
+        user = self.settings.chirps_username or unquote(parsed.username or "") or "anonymous"
+        password = self.settings.chirps_password or unquote(parsed.password or "") or "anonymous@"
+        return parsed.hostname or "", parsed.port or 21, user, password, parsed.path or "/"
+
+    async def _ftp_fetch(self, client: aioftp.Client, remote_path: str, target: Path) -> Path:
+        """Stream ``remote_path`` to disk over an open session, resuming with FTP REST."""
+
+        final = self._final_path(target)
+        partial = self._partial_path(target)
+        offset = partial.stat().st_size if partial.exists() else 0
+        expected: Optional[int] = None
+        try:
+            info = await client.stat(remote_path)
+            expected = int(info["size"]) if "size" in info else None
+        except (aioftp.StatusCodeError, KeyError, ValueError):
+            pass
+        if expected is None or offset < expected:
+            async with aiofiles.open(partial, "ab" if offset else "wb") as handle:
+                async with client.download_stream(remote_path, offset=offset) as stream:
+                    async for block in stream.iter_by_block(CHUNK_SIZE):
+                        await handle.write(block)
+        self._check_complete(partial, expected)
+        return await self._finalise(partial, final)
+
+    def _final_path(self, target: Path) -> Path:
+        if self.gunzip and target.suffix == ".gz":
+            return target.with_suffix("")
         return target
 
+    @staticmethod
+    def _partial_path(target: Path) -> Path:
+        return target.with_name(target.name + ".part")
+
+    @staticmethod
+    def _expected_size(response: httpx.Response, offset: int) -> Optional[int]:
+        content_range = response.headers.get("content-range", "")
+        if "/" in content_range and not content_range.endswith("/*"):
+            return int(content_range.rsplit("/", 1)[1])
+        length = response.headers.get("content-length")
+        if length is not None and "content-encoding" not in response.headers:
+            return offset + int(length)
+        return None
+
+    @staticmethod
+    def _check_complete(partial: Path, expected: Optional[int]) -> None:
+        size = partial.stat().st_size if partial.exists() else 0
+        if expected is not None and size != expected:
+            raise IOError(f"Incomplete download {partial.name}: {size} of {expected} bytes; rerun to resume")
+
+    async def _finalise(self, partial: Path, final: Path) -> Path:
+        """Atomically publish a completed ``.part`` file, gunzipping it on the way if needed."""
+
+        if partial.name.endswith(".gz.part") and final.suffix != ".gz":
+            await asyncio.to_thread(self._gunzip_to, partial, final)
+            partial.unlink()
+        else:
+            os.replace(partial, final)
+        return final
+
+    @staticmethod
+    def _gunzip_to(source: Path, final: Path) -> None:
+        tmp = final.with_name(final.name + ".tmp")
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            with source.open("rb") as reader, tmp.open("wb") as writer:
+                while True:
+                    block = reader.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    writer.write(decompressor.decompress(block))
+                writer.write(decompressor.flush())
+            if not decompressor.eof:
+                raise IOError(f"Truncated gzip stream in {source.name}")
+        except (zlib.error, IOError):
+            tmp.unlink(missing_ok=True)
+            source.unlink(missing_ok=True)
+            raise
+        os.replace(tmp, final)
+
     def _resolve_chirps_filename(self, target_date: date, fmt: str = "tif") -> str:
         suffix = fmt.lower()
         return f"chirps-v2.0.{target_date:%Y.%m.%d}.{suffix}"
@@ -90,7 +222,8 @@ class SatelliteIngestor:
         return rasterio.open(path)
 
     async def close(self) -> None:
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
 
 
 async def main() -> None:
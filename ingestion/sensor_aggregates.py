@@ -0,0 +1,419 @@
+"""Per-sensor rolling-window aggregates in preallocated NumPy ring buffers."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ingestion.sensor_mqtt import SensorMessage, sensor_key
+from shared.config import get_settings
+
+log = logging.getLogger(__name__)
+
+STATS = ("count", "sum", "min", "max", "mean", "rate")
+TIMESTAMP_FIELDS = ("timestamp", "observed_at")
+
+
+@dataclass
+class WindowSnapshot:
+    """Window statistics for every sensor: ``values[sensor, field, stat]``."""
+
+    sensors: List[str]
+    fields: List[str]
+    stats: Sequence[str]
+    values: np.ndarray
+    window_seconds: float
+    as_of: float
+
+    def get(self, sensor: str, field: str, stat: str) -> float:
+        return float(self.values[self.sensors.index(sensor), self.fields.index(field), self.stats.index(stat)])
+
+    def as_dict(self, sensors: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+        """``{sensor: {field: {stat: value}}}`` (all sensors or the given ones) with NaN as ``None``."""
+
+        wanted = self.sensors if sensors is None else [sensor for sensor in sensors if sensor in self.sensors]
+        rows = {sensor: row for row, sensor in enumerate(self.sensors)}
+        return {
+            sensor: {
+                field: {stat: (None if value != value else float(value)) for stat, value in zip(self.stats, self.values[rows[sensor], column])}
+                for column, field in enumerate(self.fields)
+            }
+            for sensor in wanted
+        }
+
+
+@dataclass
+class AggregatorState:
+    """The ring buffers of every sensor one aggregator has seen, for merging aggregators across workers."""
+
+    sensors: List[str]
+    fields: List[str]
+    bucket_seconds: float
+    bucket_ids: np.ndarray
+    count: np.ndarray
+    sum: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+
+    def save(self, path: Path) -> None:
+        """Write as ``.npz`` and publish with an atomic rename, so readers never see a partial file."""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as handle:
+            np.savez(
+                handle,
+                sensors=np.asarray(self.sensors, dtype=str),
+                fields=np.asarray(self.fields, dtype=str),
+                bucket_seconds=np.float64(self.bucket_seconds),
+                bucket_ids=self.bucket_ids,
+                count=self.count,
+                sum=self.sum,
+                min=self.min,
+                max=self.max,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "AggregatorState":
+        with np.load(path) as data:
+            return cls(
+                sensors=[str(sensor) for sensor in data["sensors"]],
+                fields=[str(field) for field in data["fields"]],
+                bucket_seconds=float(data["bucket_seconds"]),
+                bucket_ids=data["bucket_ids"],
+                count=data["count"],
+                sum=data["sum"],
+                min=data["min"],
+                max=data["max"],
+            )
+
+
+class RollingAggregator:
+    """Time-bucketed ring buffers of count/sum/min/max per (sensor, field).
+
+    Time is cut into ``bucket_seconds`` buckets and each sensor keeps the last
+    ``ceil(window_seconds / bucket_seconds)`` of them in a ring: an update touches one
+    slot (resetting it first if it still holds an older bucket), so it is O(1), and a
+    window query combines the slots whose bucket falls inside the window. Windows
+    are therefore exact to one bucket. ``rate`` is ``sum / window_seconds``, e.g.
+    rainfall intensity per second.
+
+    Readings timestamped before the window or more than ``future_tolerance``
+    seconds ahead of the clock are rejected (``dropped_out_of_range``): one far
+    future timestamp would otherwise claim its slot and turn every later reading
+    for that slot into a late one.
+
+    Storage is preallocated for ``capacity`` sensors and doubles when exceeded.
+    Per sensor it is fixed at :attr:`bytes_per_sensor`: ``buckets * (8 + fields * 28)``
+    bytes (int64 bucket ids, int32 counts, float64 sums, float64 min and max); with
+    the defaults (60 one-minute buckets, 2 fields) that is 3840 bytes.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str] = ("water_level", "rainfall"),
+        window_seconds: float = 3600.0,
+        bucket_seconds: float = 60.0,
+        capacity: int = 1024,
+        future_tolerance: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.fields = list(fields)
+        self.bucket_seconds = float(bucket_seconds)
+        self.buckets = max(1, int(np.ceil(window_seconds / bucket_seconds)))
+        self.window_seconds = self.buckets * self.bucket_seconds
+        self.future_tolerance = float(future_tolerance)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._names: List[str] = []
+        self.dropped_late = 0
+        self.dropped_out_of_range = 0
+        self._allocate(max(1, capacity))
+
+    @classmethod
+    def from_settings(cls) -> "RollingAggregator":
+        settings = get_settings()
+        return cls(
+            fields=settings.sensor_aggregate_fields,
+            window_seconds=settings.sensor_aggregate_window_seconds,
+            bucket_seconds=settings.sensor_aggregate_bucket_seconds,
+            future_tolerance=settings.sensor_aggregate_future_tolerance_seconds,
+        )
+
+    @property
+    def bytes_per_sensor(self) -> int:
+        return self.buckets * (8 + len(self.fields) * (4 + 8 + 8 + 8))
+
+    @property
+    def capacity(self) -> int:
+        return self._bucket_ids.shape[0]
+
+    def __call__(self, message: SensorMessage) -> None:
+        self.observe(message)
+
+    def observe(self, message: SensorMessage) -> None:
+        """Fold one message in; usable directly as ``SensorMQTTIngestor(on_message=...)``."""
+
+        payload = message.payload if isinstance(message.payload, dict) else {}
+        values = [payload.get(field) for field in self.fields]
+        if all(not _is_number(value) for value in values):
+            return
+        self.update(sensor_key(message.topic, payload), _message_time(message, payload), values)
+
+    def observe_many(self, messages: Sequence[SensorMessage]) -> None:
+        """Fold a batch in with one vectorised update (HTTP batch ingest)."""
+
+        sensors: List[str] = []
+        times: List[float] = []
+        rows: List[List[float]] = []
+        for message in messages:
+            payload = message.payload if isinstance(message.payload, dict) else {}
+            values = [payload.get(field) for field in self.fields]
+            values = [float(value) if _is_number(value) else np.nan for value in values]
+            if all(value != value for value in values):
+                continue
+            sensors.append(sensor_key(message.topic, payload))
+            times.append(_message_time(message, payload))
+            rows.append(values)
+        if sensors:
+            self.update_many(sensors, np.asarray(times), np.asarray(rows, dtype=np.float64))
+
+    def update_many(self, sensors: Sequence[str], timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Batch form of :meth:`update`; ``values`` is ``(n, fields)`` with NaN for missing.
+
+        Each touched slot is advanced once to the newest bucket in the batch, so the
+        resulting window stats equal applying the readings one at a time.
+        """
+
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        in_range = self._in_range(timestamps)
+        if not in_range.all():
+            with self._lock:
+                self.dropped_out_of_range += int((~in_range).sum())
+            sensors = [sensor for sensor, keep in zip(sensors, in_range) if keep]
+            timestamps, values = timestamps[in_range], np.asarray(values)[in_range]
+            if not sensors:
+                return
+        buckets = (timestamps // self.bucket_seconds).astype(np.int64)
+        slots = buckets % self.buckets
+        with self._lock:
+            rows = np.fromiter((self._row(sensor) for sensor in sensors), dtype=np.int64, count=len(sensors))
+            keys, inverse = np.unique(rows * self.buckets + slots, return_inverse=True)
+            newest = np.full(len(keys), np.iinfo(np.int64).min, dtype=np.int64)
+            np.maximum.at(newest, inverse, buckets)
+            key_rows, key_slots = np.divmod(keys, self.buckets)
+            current = self._bucket_ids[key_rows, key_slots]
+            target = np.maximum(current, newest)
+            reset = target != current
+            if reset.any():
+                reset_rows, reset_slots = key_rows[reset], key_slots[reset]
+                self._bucket_ids[reset_rows, reset_slots] = target[reset]
+                self._count[reset_rows, :, reset_slots] = 0
+                self._sum[reset_rows, :, reset_slots] = 0.0
+                self._min[reset_rows, :, reset_slots] = np.inf
+                self._max[reset_rows, :, reset_slots] = -np.inf
+            current_reading = buckets == target[inverse]
+            self.dropped_late += int((buckets < current[inverse]).sum())
+            for column in range(len(self.fields)):
+                present = current_reading & ~np.isnan(values[:, column])
+                index = (rows[present], column, slots[present])
+                column_values = values[present, column]
+                np.add.at(self._count, index, 1)
+                np.add.at(self._sum, index, column_values)
+                np.minimum.at(self._min, index, column_values)
+                np.maximum.at(self._max, index, column_values)
+
+    def update(self, sensor: str, timestamp: float, values: Sequence[Optional[float]]) -> None:
+        if not self._in_range(np.float64(timestamp)):
+            with self._lock:
+                self.dropped_out_of_range += 1
+            return
+        bucket = int(timestamp // self.bucket_seconds)
+        slot = bucket % self.buckets
+        with self._lock:
+            row = self._row(sensor)
+            current = self._bucket_ids[row, slot]
+            if current > bucket:
+                self.dropped_late += 1
+                return
+            if current != bucket:
+                self._bucket_ids[row, slot] = bucket
+                self._count[row, :, slot] = 0
+                self._sum[row, :, slot] = 0.0
+                self._min[row, :, slot] = np.inf
+                self._max[row, :, slot] = -np.inf
+            for column, value in enumerate(values):
+                if not _is_number(value):
+                    continue
+                value = float(value)
+                self._count[row, column, slot] += 1
+                self._sum[row, column, slot] += value
+                if value < self._min[row, column, slot]:
+                    self._min[row, column, slot] = value
+                if value > self._max[row, column, slot]:
+                    self._max[row, column, slot] = value
+
+    def snapshot(self, window_seconds: Optional[float] = None, now: Optional[float] = None) -> WindowSnapshot:
+        """Statistics of every sensor over the trailing window, as one array."""
+
+        now = self._clock() if now is None else now
+        window = min(window_seconds or self.window_seconds, self.window_seconds)
+        span = max(1, int(np.ceil(window / self.bucket_seconds)))
+        newest = int(now // self.bucket_seconds)
+        with self._lock:
+            size = len(self._names)
+            ids = self._bucket_ids[:size]
+            valid = ((ids > newest - span) & (ids <= newest))[:, None, :]
+            count = np.where(valid, self._count[:size], 0).sum(axis=-1)
+            total = np.where(valid, self._sum[:size], 0.0).sum(axis=-1)
+            low = np.where(valid, self._min[:size], np.inf).min(axis=-1)
+            high = np.where(valid, self._max[:size], -np.inf).max(axis=-1)
+            names = list(self._names)
+        empty = count == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(empty, np.nan, total / count)
+        low = np.where(empty, np.nan, low)
+        high = np.where(empty, np.nan, high)
+        rate = total / (span * self.bucket_seconds)
+        values = np.stack([count.astype(np.float64), total, low, high, mean, rate], axis=-1)
+        return WindowSnapshot(names, list(self.fields), STATS, values, span * self.bucket_seconds, now)
+
+    def state(self) -> AggregatorState:
+        """A copy of the ring buffers of every sensor seen so far."""
+
+        with self._lock:
+            size = len(self._names)
+            return AggregatorState(
+                sensors=list(self._names),
+                fields=list(self.fields),
+                bucket_seconds=self.bucket_seconds,
+                bucket_ids=self._bucket_ids[:size].copy(),
+                count=self._count[:size].copy(),
+                sum=self._sum[:size].copy(),
+                min=self._min[:size].copy(),
+                max=self._max[:size].copy(),
+            )
+
+    def merged(self, states: Sequence[AggregatorState]) -> "RollingAggregator":
+        """A new aggregator holding this one's buckets with ``states`` absorbed."""
+
+        merged = RollingAggregator(
+            fields=self.fields,
+            window_seconds=self.window_seconds,
+            bucket_seconds=self.bucket_seconds,
+            capacity=self.capacity,
+            future_tolerance=self.future_tolerance,
+            clock=self._clock,
+        )
+        merged.absorb(self.state())
+        for state in states:
+            merged.absorb(state)
+        return merged
+
+    def absorb(self, state: AggregatorState) -> None:
+        """Merge another aggregator's buckets in, e.g. those of the other sensor workers.
+
+        Per slot the newer bucket wins and equal buckets are combined, so absorbing
+        aggregators that each saw part of a sensor's readings gives the same window
+        stats as one aggregator that saw all of them.
+        """
+
+        if list(state.fields) != self.fields or state.bucket_seconds != self.bucket_seconds or state.bucket_ids.shape[1:] != (self.buckets,):
+            raise ValueError("aggregator state has different fields or buckets")
+        if not state.sensors:
+            return
+        with self._lock:
+            rows = np.fromiter((self._row(sensor) for sensor in state.sensors), dtype=np.int64, count=len(state.sensors))
+            current = self._bucket_ids[rows]
+            newer = (state.bucket_ids > current)[:, None, :]
+            same = (state.bucket_ids == current)[:, None, :]
+            self._bucket_ids[rows] = np.maximum(current, state.bucket_ids)
+            count, total, low, high = self._count[rows], self._sum[rows], self._min[rows], self._max[rows]
+            self._count[rows] = np.where(newer, state.count, np.where(same, count + state.count, count))
+            self._sum[rows] = np.where(newer, state.sum, np.where(same, total + state.sum, total))
+            self._min[rows] = np.where(newer, state.min, np.where(same, np.minimum(low, state.min), low))
+            self._max[rows] = np.where(newer, state.max, np.where(same, np.maximum(high, state.max), high))
+
+    def metrics(self) -> dict:
+        return {
+            "sensors": len(self._names),
+            "capacity": self.capacity,
+            "bytes_per_sensor": self.bytes_per_sensor,
+            "allocated_bytes": self.capacity * self.bytes_per_sensor,
+            "dropped_late": self.dropped_late,
+            "dropped_out_of_range": self.dropped_out_of_range,
+        }
+
+    def _in_range(self, timestamps: np.ndarray) -> np.ndarray:
+        """Timestamps within ``[now - window, now + future_tolerance]`` (NaN is out of range)."""
+
+        now = self._clock()
+        return (timestamps >= now - self.window_seconds) & (timestamps <= now + self.future_tolerance)
+
+    def _row(self, sensor: str) -> int:
+        row = self._index.get(sensor)
+        if row is None:
+            row = len(self._names)
+            if row >= self.capacity:
+                self._allocate(self.capacity * 2)
+                log.info("Rolling aggregator grown to %d sensors", self.capacity)
+            self._index[sensor] = row
+            self._names.append(sensor)
+        return row
+
+    def _allocate(self, capacity: int) -> None:
+        shape = (capacity, len(self.fields), self.buckets)
+        bucket_ids = np.full((capacity, self.buckets), np.iinfo(np.int64).min, dtype=np.int64)
+        count = np.zeros(shape, dtype=np.int32)
+        total = np.zeros(shape, dtype=np.float64)
+        low = np.full(shape, np.inf, dtype=np.float64)
+        high = np.full(shape, -np.inf, dtype=np.float64)
+        used = len(self._names)
+        if used:
+            bucket_ids[:used] = self._bucket_ids[:used]
+            count[:used] = self._count[:used]
+            total[:used] = self._sum[:used]
+            low[:used] = self._min[:used]
+            high[:used] = self._max[:used]
+        self._bucket_ids, self._count, self._sum, self._min, self._max = bucket_ids, count, total, low, high
+
+
+def state_path() -> Path:
+    """Where the sensor worker supervisor publishes its merged aggregates for the API to read."""
+
+    settings = get_settings()
+    return Path(settings.sensor_aggregate_state_path or settings.data_root / "processed" / "sensor_aggregates.npz")
+
+
+def _is_number(value: object) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def _message_time(message: SensorMessage, payload: dict) -> float:
+    for field in TIMESTAMP_FIELDS:
+        value = payload.get(field)
+        if _is_number(value):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                continue
+            return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+    received = message.received_at
+    return (received if received.tzinfo else received.replace(tzinfo=timezone.utc)).timestamp()
+
+
+__all__ = ["AggregatorState", "RollingAggregator", "WindowSnapshot", "STATS", "state_path"]
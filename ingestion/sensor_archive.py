@@ -0,0 +1,275 @@
+"""Group-commit NDJSON archive for sensor messages."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, List, Optional
+
+from shared import jsonio
+from shared.config import get_settings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ingestion.sensor_mqtt import SensorMessage
+
+log = logging.getLogger(__name__)
+
+ACTIVE_NAME = "sensor_messages.ndjson"
+SEGMENT_GLOB = "sensor_messages.*.ndjson*"
+
+
+def archive_files(root: Path, pattern: str = SEGMENT_GLOB) -> List[Path]:
+    """Files matching ``pattern`` in ``root`` and in its writer directories (``worker-<n>/``, ``http/``).
+
+    Sorted by name (segment names carry their rotation time) so the result is oldest first.
+    """
+
+    root = Path(root)
+    return sorted([*root.glob(pattern), *root.glob(f"*/{pattern}")], key=lambda path: (path.name, str(path)))
+
+
+def encode_record(message: "SensorMessage") -> bytes:
+    """One NDJSON line; values JSON cannot represent natively are written as strings."""
+
+    record = {
+        "topic": message.topic,
+        "received_at": message.received_at.isoformat(),
+        "payload": message.payload,
+    }
+    return jsonio.dumps(record, default=str) + b"\n"
+
+
+@dataclass
+class ArchiveStats:
+    messages: int = 0
+    batches: int = 0
+    bytes_written: int = 0
+    segments_rotated: int = 0
+    max_batch: int = 0
+    last_commit_seconds: float = 0.0
+    errors: int = 0
+
+
+class SensorArchiveWriter:
+    """Buffer sensor messages and commit them to disk in batches from one thread.
+
+    Producers (e.g. the paho network thread) only append to an in-memory buffer.
+    The writer thread wakes when ``batch_size`` messages are pending or
+    ``flush_interval`` seconds have passed, encodes the whole batch and appends it to
+    the open ``sensor_messages.ndjson`` with a single write. Once that file exceeds
+    ``segment_max_bytes`` it is renamed to ``sensor_messages.<timestamp>.ndjson``
+    (gzip-compressed when ``compress``) and a fresh active file is started, so
+    closed segments are immutable. Per-message JSON files are only written when
+    ``per_message_files`` is set.
+
+    While the thread is not running, :meth:`write` commits inline.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        batch_size: int = 1000,
+        flush_interval: float = 0.5,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        compress: bool = False,
+        per_message_files: bool = False,
+        fsync: bool = False,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.active_path = self.directory / ACTIVE_NAME
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.compress = compress
+        self.per_message_files = per_message_files
+        self.fsync = fsync
+        self.stats = ArchiveStats()
+        self._buffer: List["SensorMessage"] = []
+        self._cond = threading.Condition()
+        self._commit_lock = threading.Lock()
+        self._handle: Optional[IO[bytes]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @classmethod
+    def from_settings(cls, directory: Path) -> "SensorArchiveWriter":
+        settings = get_settings()
+        return cls(
+            directory,
+            batch_size=settings.sensor_archive_batch_size,
+            flush_interval=settings.sensor_archive_flush_seconds,
+            segment_max_bytes=int(settings.sensor_archive_segment_mb * 1024 * 1024),
+            compress=settings.sensor_archive_compress,
+            per_message_files=settings.sensor_per_message_files,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="sensor-archive-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Stop the writer thread after committing everything still buffered."""
+
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def write(self, message: "SensorMessage") -> None:
+        with self._cond:
+            self._buffer.append(message)
+            if self._running:
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify()
+                return
+        self.flush()
+
+    def write_many(self, messages: List["SensorMessage"]) -> None:
+        """Buffer a whole batch under one lock acquisition (HTTP batch ingest)."""
+
+        with self._cond:
+            self._buffer.extend(messages)
+            if self._running:
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify()
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """Commit all buffered messages now, from the calling thread."""
+
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+            running = self._running
+        if batch:
+            self._commit(batch)
+        if not running:
+            self._close_handle()
+
+    def rotate(self) -> Optional[Path]:
+        """Commit buffered messages and close the active file as a segment."""
+
+        self.flush()
+        with self._commit_lock:
+            if not self.active_path.exists() or self.active_path.stat().st_size == 0:
+                return None
+            self._open_handle()
+            return self._rotate()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def segments(self) -> List[Path]:
+        """Closed (rotated) segments, oldest first."""
+
+        return sorted(self.directory.glob(SEGMENT_GLOB))
+
+    def metrics(self) -> dict:
+        data = asdict(self.stats)
+        data["pending"] = self.pending
+        data["running"] = self.running
+        return data
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while self._running and len(self._buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._buffer = self._buffer, []
+                running = self._running
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception:
+                    # Keep the thread alive: a lost batch is counted, later batches still land.
+                    self.stats.errors += 1
+                    log.exception("Failed to commit %d sensor messages", len(batch))
+            if not running:
+                return
+
+    def _commit(self, batch: List["SensorMessage"]) -> None:
+        started = time.perf_counter()
+        lines = []
+        for message in batch:
+            try:
+                lines.append(encode_record(message))
+            except (TypeError, ValueError):
+                self.stats.errors += 1
+                log.warning("Dropping unencodable sensor message on %s", message.topic, exc_info=True)
+        blob = b"".join(lines)
+        with self._commit_lock:
+            handle = self._open_handle()
+            handle.write(blob)
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+            if self.per_message_files:
+                self._write_message_files(batch)
+            if handle.tell() >= self.segment_max_bytes:
+                self._rotate()
+        stats = self.stats
+        stats.messages += len(lines)
+        stats.batches += 1
+        stats.bytes_written += len(blob)
+        stats.max_batch = max(stats.max_batch, len(batch))
+        stats.last_commit_seconds = time.perf_counter() - started
+
+    def _write_message_files(self, batch: List["SensorMessage"]) -> None:
+        for message in batch:
+            timestamp = message.received_at.strftime("%Y%m%dT%H%M%S%f")
+            path = self.directory / f"{timestamp}.json"
+            path.write_text(json.dumps({"topic": message.topic, "payload": message.payload}, default=str))
+
+    def _open_handle(self) -> IO[bytes]:
+        if self._handle is None or self._handle.closed:
+            self._handle = self.active_path.open("ab")
+        return self._handle
+
+    def _close_handle(self) -> None:
+        with self._commit_lock:
+            if self._handle is not None and not self._handle.closed:
+                self._handle.close()
+            self._handle = None
+
+    def _rotate(self) -> Path:
+        self._handle.close()
+        self._handle = None
+        segment = self.directory / f"sensor_messages.{datetime.utcnow():%Y%m%dT%H%M%S%f}.ndjson"
+        os.replace(self.active_path, segment)
+        if self.compress:
+            compressed = segment.with_name(segment.name + ".gz")
+            tmp = compressed.with_name(f".{compressed.name}.tmp")
+            with segment.open("rb") as reader, gzip.open(tmp, "wb", compresslevel=1) as writer:
+                shutil.copyfileobj(reader, writer, 1 << 20)
+            os.replace(tmp, compressed)
+            segment.unlink()
+            segment = compressed
+        self.stats.segments_rotated += 1
+        return segment
+
+
+__all__ = ["ArchiveStats", "SensorArchiveWriter", "archive_files", "encode_record"]
@@ -0,0 +1,165 @@
+"""Batch sensor ingest for gateways posting readings over HTTP instead of MQTT."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from ingestion.sensor_aggregates import RollingAggregator
+from ingestion.sensor_archive import SensorArchiveWriter
+from ingestion.sensor_mqtt import SensorMessage
+from shared import jsonio
+from shared.config import get_settings
+
+log = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 20
+
+
+class BatchTooLarge(ValueError):
+    """The request carries more readings than ``sensor_batch_max_readings``."""
+
+
+@dataclass
+class BatchResult:
+    accepted: int = 0
+    rejected: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BatchStats:
+    batches: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    oversized: int = 0
+
+
+def parse_readings(body: bytes, max_readings: Optional[int] = None) -> Tuple[List[SensorMessage], BatchResult]:
+    """Decode a JSON array or NDJSON body of ``{"topic": ..., "payload": {...}}`` readings.
+
+    Validation is a shape check per reading rather than a pydantic model each, so
+    thousands of readings cost little more than the JSON decode. Bad readings are
+    counted and reported (first few only) without failing the rest; a body that is
+    not JSON at all raises ``ValueError``.
+    """
+
+    stripped = body.lstrip()
+    if stripped[:1] == b"[":
+        items = jsonio.loads(stripped)
+        if not isinstance(items, list):
+            raise ValueError("Expected a JSON array of readings")
+        lines = None
+    else:
+        lines = [line for line in stripped.splitlines() if line.strip()]
+        items = lines
+    if max_readings is not None and len(items) > max_readings:
+        raise BatchTooLarge(f"{len(items)} readings exceeds the limit of {max_readings}")
+
+    result = BatchResult()
+    messages: List[SensorMessage] = []
+    received_at = datetime.utcnow()
+    for index, item in enumerate(items):
+        if lines is not None:
+            try:
+                item = jsonio.loads(item)
+            except ValueError:
+                _reject(result, index, "invalid JSON")
+                continue
+        if not isinstance(item, dict):
+            _reject(result, index, "reading must be an object")
+            continue
+        topic = item.get("topic")
+        payload = item.get("payload")
+        if not isinstance(topic, str) or not topic:
+            _reject(result, index, "missing topic")
+            continue
+        if not isinstance(payload, dict):
+            _reject(result, index, "payload must be an object")
+            continue
+        messages.append(SensorMessage(topic=topic, payload=payload, received_at=received_at))
+    result.accepted = len(messages)
+    return messages, result
+
+
+def _reject(result: BatchResult, index: int, reason: str) -> None:
+    result.rejected += 1
+    if len(result.errors) < MAX_REPORTED_ERRORS:
+        result.errors.append(f"{index}: {reason}")
+
+
+class SensorBatchIngestor:
+    """Feeds HTTP-posted readings through the same archive writer and aggregator as MQTT.
+
+    :meth:`ingest` parses a body and hands the accepted readings to the archive
+    writer's buffer (one lock acquisition per batch) and to ``on_message``
+    consumers such as :class:`RollingAggregator`; committing to disk happens on the
+    archive thread, so callers can acknowledge as soon as it returns. The archive
+    lands in ``processed/sensors/http/``, which ``SensorHistory`` compacts along
+    with the MQTT workers' directories. ``ingest`` runs concurrently from worker
+    threads, so ``stats`` is only updated under a lock.
+    """
+
+    def __init__(
+        self,
+        persist_dir: Optional[Path] = None,
+        archive: Optional[SensorArchiveWriter] = None,
+        aggregator: Optional[RollingAggregator] = None,
+        on_message: Optional[Callable[[SensorMessage], None]] = None,
+        max_readings: Optional[int] = None,
+    ) -> None:
+        settings = get_settings()
+        self.persist_dir = Path(persist_dir or settings.data_root / "processed" / "sensors" / "http")
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self.archive = archive or SensorArchiveWriter.from_settings(self.persist_dir)
+        self.aggregator = aggregator
+        self.on_message = on_message
+        self.max_readings = max_readings or settings.sensor_batch_max_readings
+        self.stats = BatchStats()
+        self._stats_lock = threading.Lock()
+
+    def start(self) -> None:
+        self.archive.start()
+
+    def stop(self) -> None:
+        self.archive.stop()
+
+    def ingest(self, body: bytes) -> BatchResult:
+        try:
+            messages, result = parse_readings(body, self.max_readings)
+        except BatchTooLarge:
+            with self._stats_lock:
+                self.stats.oversized += 1
+            raise
+        self.submit(messages)
+        with self._stats_lock:
+            self.stats.batches += 1
+            self.stats.rejected += result.rejected
+        return result
+
+    def submit(self, messages: List[SensorMessage]) -> None:
+        if not messages:
+            return
+        self.archive.write_many(messages)
+        if self.aggregator is not None:
+            self.aggregator.observe_many(messages)
+        if self.on_message is not None:
+            for message in messages:
+                self.on_message(message)
+        with self._stats_lock:
+            self.stats.accepted += len(messages)
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            data = asdict(self.stats)
+        data["archive"] = self.archive.metrics()
+        if self.aggregator is not None:
+            data["aggregates"] = self.aggregator.metrics()
+        return data
+
+
+__all__ = ["SensorBatchIngestor", "BatchResult", "BatchTooLarge", "parse_readings"]
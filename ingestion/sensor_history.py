@@ -0,0 +1,375 @@
+"""Columnar sensor history: NDJSON archive segments compacted into partitioned Parquet."""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ingestion.sensor_archive import archive_files
+from ingestion.sensor_mqtt import sensor_key
+from shared import jsonio
+from shared.config import get_settings
+
+log = logging.getLogger(__name__)
+
+STATE_NAME = "_compacted.json"
+SCHEMA_NAME = "_common_metadata"
+BASE_FIELDS = [
+    pa.field("topic", pa.string()),
+    pa.field("sensor_id", pa.string()),
+    pa.field("received_at", pa.timestamp("us", tz="UTC")),
+    pa.field("payload", pa.string()),
+]
+PARTITION_FIELDS = [pa.field("date", pa.string()), pa.field("sensor", pa.string())]
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+TimeLike = Union[str, date, datetime, pd.Timestamp]
+
+
+def _partition_value(value: str) -> str:
+    return _UNSAFE.sub("_", value) or "_"
+
+
+class SensorHistory:
+    """Hive-partitioned Parquet history (``date=YYYY-MM-DD/sensor=<id>/``) of sensor readings.
+
+    :meth:`compact` rolls closed NDJSON archive segments into Parquet. Top-level
+    scalar payload fields become typed columns (numbers as ``float64``, booleans,
+    everything else as strings), while the raw payload is kept as JSON. Each segment
+    becomes one file per partition, named after the segment, so re-running after a
+    crash overwrites rather than duplicates; the union schema is saved before a
+    segment is recorded as compacted. Once a partition holds ``merge_files`` files
+    smaller than ``small_file_bytes`` they are rewritten as one, so months of
+    history stay a few files per partition. :meth:`query` prunes partitions by
+    sensor and date and reads only the requested columns.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        archive_dir: Optional[Path] = None,
+        merge_files: int = 8,
+        small_file_bytes: int = 32 * 2**20,
+    ) -> None:
+        settings = get_settings()
+        self.root = Path(root or settings.data_root / "processed" / "sensor_history")
+        self.archive_dir = Path(archive_dir or settings.data_root / "processed" / "sensors")
+        self.merge_files = max(2, merge_files)
+        self.small_file_bytes = small_file_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.root / STATE_NAME
+
+    def compacted_segments(self) -> List[str]:
+        return list(self._state().get("segments", []))
+
+    def pending_segments(self) -> List[Path]:
+        """Closed archive segments not compacted yet, oldest first.
+
+        Segments of the per-writer directories (``worker-<n>/``, ``http/``) are
+        included; compaction state is keyed by the path relative to ``archive_dir``,
+        since writers name their segments independently.
+        """
+
+        done = set(self.compacted_segments())
+        return [path for path in archive_files(self.archive_dir) if self._segment_key(path) not in done]
+
+    def compact(self, delete_segments: bool = False) -> int:
+        """Compact all not-yet-compacted segments; returns the number of rows written.
+
+        Only closed segments are read: the active ``sensor_messages.ndjson`` is still
+        being appended to (use ``SensorArchiveWriter.rotate`` to close it first).
+        """
+
+        self._finish_merges()
+        rows = 0
+        schema = self.schema()
+        touched: Set[Path] = set()
+        for segment in self.pending_segments():
+            table = self._segment_table(segment, schema)
+            if table is None:
+                self._mark_compacted(segment)
+                continue
+            merged = self._merge_schema(schema, table.schema)
+            if merged != schema:
+                pq.write_metadata(merged, self.root / SCHEMA_NAME)
+                schema = merged
+            touched.update(self._write_partitions(table, segment))
+            rows += table.num_rows
+            self._mark_compacted(segment)
+            if delete_segments:
+                segment.unlink()
+        for directory in sorted(touched):
+            self._merge_small_files(directory)
+        return rows
+
+    def schema(self) -> Optional[pa.Schema]:
+        """Union schema of every compacted column (without partition fields)."""
+
+        path = self.root / SCHEMA_NAME
+        return pq.read_schema(path) if path.exists() else None
+
+    def query(
+        self,
+        sensors: Optional[Iterable[str]] = None,
+        start: Optional[TimeLike] = None,
+        end: Optional[TimeLike] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """Readings for ``sensors`` with ``start <= received_at <= end``.
+
+        ``date`` and ``sensor`` partitions outside the request are never opened and
+        only ``columns`` (plus ``sensor_id`` and ``received_at``) are read. Columns no
+        segment has carried yet come back as NaN.
+        """
+
+        schema = self.schema()
+        order = list(dict.fromkeys(["sensor_id", "received_at", *(columns or [])]))
+        empty = pd.DataFrame(columns=order)
+        if schema is None:
+            return empty
+        start_ts = _timestamp(start) if start is not None else None
+        end_ts = _timestamp(end) if end is not None else None
+        keys = sorted({_partition_value(str(sensor)) for sensor in sensors}) if sensors is not None else None
+        files = self._partition_files(keys, start_ts, end_ts)
+        if not files:
+            return empty
+        dataset = ds.dataset(
+            files,
+            format="parquet",
+            schema=pa.schema(list(schema) + PARTITION_FIELDS),
+            partitioning=ds.partitioning(pa.schema(PARTITION_FIELDS), flavor="hive"),
+            partition_base_dir=str(self.root),
+        )
+        expression = None
+        if keys is not None:
+            expression = _and(expression, ds.field("sensor").isin(keys))
+        if start_ts is not None:
+            expression = _and(expression, ds.field("received_at") >= pa.scalar(start_ts.to_pydatetime(), pa.timestamp("us", tz="UTC")))
+        if end_ts is not None:
+            expression = _and(expression, ds.field("received_at") <= pa.scalar(end_ts.to_pydatetime(), pa.timestamp("us", tz="UTC")))
+        wanted = None
+        if columns is not None:
+            wanted = [column for column in order if column in dataset.schema.names]
+        table = dataset.to_table(columns=wanted, filter=expression)
+        frame = table.to_pandas()
+        if columns is not None:
+            frame = frame.reindex(columns=order, fill_value=np.nan)
+        if not frame.empty:
+            frame = frame.sort_values(["sensor_id", "received_at"], kind="stable").reset_index(drop=True)
+        return frame
+
+    def _partition_files(
+        self, keys: Optional[List[str]], start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]
+    ) -> List[str]:
+        """Parquet files of the matching partitions, found without listing the others."""
+
+        first = start.strftime("%Y-%m-%d") if start is not None else None
+        last = end.strftime("%Y-%m-%d") if end is not None else None
+        files: List[str] = []
+        for day_dir in sorted(self.root.glob("date=*")):
+            day = day_dir.name[len("date="):]
+            if (first is not None and day < first) or (last is not None and day > last):
+                continue
+            sensor_dirs = [day_dir / f"sensor={key}" for key in keys] if keys is not None else sorted(day_dir.glob("sensor=*"))
+            for sensor_dir in sensor_dirs:
+                if sensor_dir.is_dir():
+                    files.extend(str(path) for path in sorted(sensor_dir.glob("*.parquet")))
+        return files
+
+    def _segment_table(self, segment: Path, schema: Optional[pa.Schema]) -> Optional[pa.Table]:
+        topics: List[str] = []
+        sensors: List[str] = []
+        received: List[datetime] = []
+        payloads: List[str] = []
+        values: Dict[str, List[object]] = {}
+        for index, record in enumerate(self._records(segment)):
+            payload = record.get("payload") or {}
+            topic = str(record.get("topic", ""))
+            topics.append(topic)
+            sensors.append(sensor_key(topic, payload))
+            received.append(_parse_time(record.get("received_at")))
+            payloads.append(jsonio.dumps(payload).decode())
+            if isinstance(payload, dict):
+                for key, value in payload.items():
+                    if key == "sensor_id" or isinstance(value, (dict, list)):
+                        continue
+                    column = values.get(key)
+                    if column is None:
+                        column = values[key] = [None] * index
+                    column.append(value)
+            for column in values.values():
+                if len(column) <= index:
+                    column.append(None)
+        if not topics:
+            return None
+
+        arrays = [pa.array(topics, pa.string()), pa.array(sensors, pa.string()), pa.array(received, pa.timestamp("us", tz="UTC")), pa.array(payloads, pa.string())]
+        fields = list(BASE_FIELDS)
+        reserved = {field.name for field in BASE_FIELDS + PARTITION_FIELDS}
+        for key in sorted(values):
+            name = key if key not in reserved else f"payload_{key}"
+            existing = schema.field(name).type if schema is not None and name in schema.names else None
+            array = _typed_column(values[key], existing)
+            fields.append(pa.field(name, array.type))
+            arrays.append(array)
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    @staticmethod
+    def _records(segment: Path) -> Iterator[dict]:
+        opener = gzip.open if segment.suffix == ".gz" else open
+        with opener(segment, "rb") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield jsonio.loads(line)
+                except ValueError:
+                    log.warning("Skipping malformed record in %s", segment.name)
+
+    def _write_partitions(self, table: pa.Table, segment: Path) -> List[Path]:
+        dates = pc.strftime(table["received_at"], format="%Y-%m-%d").to_numpy(zero_copy_only=False)
+        sensors = table["sensor_id"].to_numpy(zero_copy_only=False)
+        frame = pd.DataFrame({"date": dates, "sensor": sensors})
+        stem = self._segment_key(segment).split(".ndjson")[0].replace("/", "-")
+        name = f"part-{stem}.parquet"
+        directories: List[Path] = []
+        for (day, sensor), rows in frame.groupby(["date", "sensor"], sort=False).indices.items():
+            directory = self.root / f"date={day}" / f"sensor={_partition_value(sensor)}"
+            directory.mkdir(parents=True, exist_ok=True)
+            part = table.take(pa.array(rows)).sort_by("received_at")
+            tmp_path = directory / f".{name}.tmp"
+            pq.write_table(part, tmp_path, compression="zstd")
+            os.replace(tmp_path, directory / name)
+            directories.append(directory)
+        return directories
+
+    def _merge_small_files(self, directory: Path) -> None:
+        """Rewrite the partition's small files as one once there are ``merge_files`` of them.
+
+        The merge is recorded in the state file before the merged file is published
+        and cleared once its sources are removed, so :meth:`_finish_merges` can
+        complete or roll back a merge interrupted by a crash.
+        """
+
+        small = [path for path in sorted(directory.glob("*.parquet")) if path.stat().st_size < self.small_file_bytes]
+        if len(small) < self.merge_files:
+            return
+        # ParquetFile rather than read_table: the latter would add the hive partition columns.
+        table = pa.concat_tables([pq.ParquetFile(path).read() for path in small], promote_options="default").sort_by("received_at")
+        target = directory / f"part-merged-{uuid.uuid4().hex[:12]}.parquet"
+        key = target.relative_to(self.root).as_posix()
+        state = self._state()
+        state.setdefault("merges", {})[key] = [path.name for path in small]
+        self._write_state(state)
+        tmp_path = directory / f".{target.name}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, target)
+        self._finish_merges()
+        log.info("Merged %d files of %s into %s", len(small), directory.relative_to(self.root), target.name)
+
+    def _finish_merges(self) -> None:
+        """Remove the sources of published merges; forget merges whose file never got published."""
+
+        state = self._state()
+        merges = state.get("merges", {})
+        if not merges:
+            return
+        for key, sources in merges.items():
+            target = self.root / key
+            if target.exists():
+                for name in sources:
+                    (target.parent / name).unlink(missing_ok=True)
+            else:
+                (target.parent / f".{target.name}.tmp").unlink(missing_ok=True)
+        state["merges"] = {}
+        self._write_state(state)
+
+    def _mark_compacted(self, segment: Path) -> None:
+        state = self._state()
+        state["segments"] = sorted(set(state.get("segments", [])) | {self._segment_key(segment)})
+        self._write_state(state)
+
+    def _segment_key(self, segment: Path) -> str:
+        return segment.relative_to(self.archive_dir).as_posix()
+
+    def _state(self) -> dict:
+        if not self.state_path.exists():
+            return {}
+        return json.loads(self.state_path.read_text())
+
+    def _write_state(self, state: dict) -> None:
+        tmp_path = self.state_path.with_name(f".{self.state_path.name}.tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _merge_schema(schema: Optional[pa.Schema], other: pa.Schema) -> pa.Schema:
+        if schema is None:
+            return other
+        extra = [field for field in other if field.name not in schema.names]
+        return pa.schema(list(schema) + extra)
+
+
+def _typed_column(values: List[object], existing: Optional[pa.DataType]) -> pa.Array:
+    present = [value for value in values if value is not None]
+    if existing is None:
+        if present and all(isinstance(value, bool) for value in present):
+            existing = pa.bool_()
+        elif all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+            existing = pa.float64()
+        else:
+            existing = pa.string()
+    if pa.types.is_floating(existing):
+        cleaned = [float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None for value in values]
+    elif pa.types.is_boolean(existing):
+        cleaned = [value if isinstance(value, bool) else None for value in values]
+    else:
+        cleaned = [None if value is None else str(value) for value in values]
+    return pa.array(cleaned, type=existing)
+
+
+def _parse_time(value: object) -> datetime:
+    parsed = datetime.fromisoformat(str(value)) if value else datetime.now(timezone.utc)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def _timestamp(value: TimeLike) -> pd.Timestamp:
+    stamp = pd.Timestamp(value)
+    return stamp.tz_localize("UTC") if stamp.tzinfo is None else stamp.tz_convert("UTC")
+
+
+def _and(left: Optional[ds.Expression], right: ds.Expression) -> ds.Expression:
+    return right if left is None else left & right
+
+
+__all__ = ["SensorHistory", "sensor_key"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact sensor NDJSON archive segments into partitioned Parquet.")
+    parser.add_argument("--delete-segments", action="store_true", help="Remove segments once compacted")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    history = SensorHistory()
+    rows = history.compact(delete_segments=args.delete_segments)
+    log.info("Compacted %d sensor readings into %s", rows, history.root)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,15 @@ from __future__ import annotations
 
 import json
 import logging
-import queue
 import threading
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Callable, Optional
+from typing import AsyncIterator, Callable, List, Optional
 
 import paho.mqtt.client as mqtt
+from ingestion.sensor_archive import SensorArchiveWriter
+from ingestion.sensor_queue import BoundedMessageQueue
 from shared.config import get_settings
 
 log = logging.getLogger(__name__)
@@ -24,6 +25,16 @@ class SensorMessage:
     received_at: datetime
 
 
+def sensor_key(topic: str, payload: dict) -> str:
+    """Sensor identifier: ``payload['sensor_id']`` or the topic's second level."""
+
+    sensor = payload.get("sensor_id") if isinstance(payload, dict) else None
+    if sensor is None:
+        parts = topic.split("/")
+        sensor = parts[1] if len(parts) > 1 else topic
+    return str(sensor)
+
+
 class SensorMQTTIngestor:
     """Threaded MQTT client that buffers sensor messages for downstream processing."""
 
@@ -33,6 +44,9 @@ class SensorMQTTIngestor:
         on_message: Optional[Callable[[SensorMessage], None]] = None,
         persist_dir: Optional[Path] = None,
         qos: int = 1,
+        archive: Optional[SensorArchiveWriter] = None,
+        client_id: Optional[str] = None,
+        client_factory: Optional[Callable[..., mqtt.Client]] = None,
     ) -> None:
         settings = get_settings()
         self.broker_url = settings.mqtt_broker_url
@@ -45,10 +59,18 @@ class SensorMQTTIngestor:
         self.on_message = on_message
         self.persist_dir = persist_dir or (settings.data_root / "processed" / "sensors")
         self.persist_dir.mkdir(parents=True, exist_ok=True)
-        self.log_path = self.persist_dir / "sensor_messages.ndjson"
+        self.archive = archive or SensorArchiveWriter.from_settings(self.persist_dir)
+        self.log_path = self.archive.active_path
         self.qos = min(max(qos, 0), 2)
-        self._queue: "queue.Queue[SensorMessage]" = queue.Queue()
-        self._client = mqtt.Client(client_id=f"hyperlocal-{datetime.utcnow().timestamp()}", clean_session=True)
+        self._queue: "BoundedMessageQueue[SensorMessage]" = BoundedMessageQueue(
+            maxsize=settings.sensor_queue_maxsize,
+            policy=settings.sensor_queue_policy,
+            block_timeout=settings.sensor_queue_block_timeout,
+        )
+        self.received = 0
+        self.invalid = 0
+        factory = client_factory or mqtt.Client
+        self._client = factory(client_id=client_id or f"hyperlocal-{datetime.utcnow().timestamp()}", clean_session=True)
         if self.username and self.password:
             self._client.username_pw_set(self.username, self.password)
         self._client.on_message = self._handle_message
@@ -61,6 +83,7 @@ class SensorMQTTIngestor:
 
     def start(self) -> None:
         host, port = self._parse_broker(self.broker_url)
+        self.archive.start()
         self._client.connect(host, port)
         self._running.set()
         self._thread = threading.Thread(target=self._loop, daemon=True)
@@ -71,13 +94,20 @@ class SensorMQTTIngestor:
         self._client.disconnect()
         if self._thread:
             self._thread.join()
+        self.archive.stop()
 
     def poll(self) -> Optional[SensorMessage]:
-        try:
-            item = self._queue.get_nowait()
-        except queue.Empty:
-            return None
-        return item
+        return self._queue.get_nowait()
+
+    def poll_batch(self, max_items: int = 500, timeout: float = 0.0) -> List[SensorMessage]:
+        """Up to ``max_items`` buffered messages, waiting at most ``timeout`` seconds for the first."""
+
+        return self._queue.poll_batch(max_items, timeout)
+
+    def batches(self, max_items: int = 500, timeout: float = 0.5) -> AsyncIterator[List[SensorMessage]]:
+        """Async iterator of message batches, e.g. ``async for batch in ingestor.batches(): ...``."""
+
+        return self._queue.batches(max_items, timeout)
 
     def _loop(self) -> None:
         while self._running.is_set():
@@ -93,9 +123,11 @@ class SensorMQTTIngestor:
     def _handle_message(self, _client: mqtt.Client, _userdata, message: mqtt.MQTTMessage) -> None:
         try:
             payload = json.loads(message.payload.decode("utf-8"))
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.invalid += 1
             log.warning("Invalid payload on %s", message.topic)
             return
+        self.received += 1
         sensor_message = SensorMessage(
             topic=message.topic,
             payload=payload,
@@ -121,19 +153,16 @@ class SensorMQTTIngestor:
         self._client.tls_insecure_set(False)
 
     def _persist(self, message: SensorMessage) -> None:
-        timestamp = message.received_at.strftime("%Y%m%dT%H%M%S%f")
-        path = self.persist_dir / f"{timestamp}.json"
-        path.write_text(json.dumps({"topic": message.topic, "payload": message.payload}))
-        self._append_to_log(message)
-
-    def _append_to_log(self, message: SensorMessage) -> None:
-        record = {
-            "topic": message.topic,
-            "received_at": message.received_at.isoformat(),
-            "payload": message.payload,
+        # Buffered for the archive writer thread; committed inline when it is not running.
+        self.archive.write(message)
+
+    def metrics(self) -> dict:
+        return {
+            "received": self.received,
+            "invalid": self.invalid,
+            "archive": self.archive.metrics(),
+            "queue": self._queue.metrics(),
         }
-        with self.log_path.open("a", encoding="utf-8") as handle:
-            handle.write(json.dumps(record) + "\n")
 
     @staticmethod
     def _parse_broker(url: str) -> tuple[str, int]:
@@ -147,4 +176,4 @@ class SensorMQTTIngestor:
         return without_scheme, 1883
 
 
-__all__ = ["SensorMQTTIngestor", "SensorMessage"]
+__all__ = ["SensorMQTTIngestor", "SensorMessage", "sensor_key"]
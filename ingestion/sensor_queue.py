@@ -0,0 +1,135 @@
+"""Bounded, thread-safe message queue with overflow policies and batch polling."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Deque, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+
+@dataclass
+class QueueStats:
+    enqueued: int = 0
+    dequeued: int = 0
+    dropped_oldest: int = 0
+    dropped_newest: int = 0
+    block_timeouts: int = 0
+    blocked_seconds: float = 0.0
+    max_depth: int = 0
+
+
+class BoundedMessageQueue(Generic[T]):
+    """FIFO capped at ``maxsize`` items with an explicit overflow ``policy``.
+
+    - ``block``: the producer waits for space, up to ``block_timeout`` seconds, then
+      the new item is dropped (counted in ``block_timeouts``) so a stalled consumer
+      cannot wedge the MQTT network thread indefinitely.
+    - ``drop_oldest``: the oldest queued item is discarded to make room.
+    - ``drop_newest``: the incoming item is discarded.
+
+    Consumers take items one at a time (:meth:`get_nowait`), in batches
+    (:meth:`poll_batch`) or from asyncio via :meth:`batches`.
+    """
+
+    def __init__(self, maxsize: int = 10000, policy: str = DROP_OLDEST, block_timeout: float = 1.0) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.stats = QueueStats()
+        self._items: Deque[T] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def put(self, item: T) -> bool:
+        """Enqueue ``item``; returns ``False`` if it was dropped."""
+
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.stats.dropped_newest += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.stats.dropped_oldest += 1
+                else:
+                    started = time.monotonic()
+                    has_space = self._not_full.wait_for(lambda: len(self._items) < self.maxsize, self.block_timeout)
+                    self.stats.blocked_seconds += time.monotonic() - started
+                    if not has_space:
+                        self.stats.block_timeouts += 1
+                        return False
+            self._items.append(item)
+            self.stats.enqueued += 1
+            self.stats.max_depth = max(self.stats.max_depth, len(self._items))
+            self._not_empty.notify()
+            return True
+
+    def get_nowait(self) -> Optional[T]:
+        with self._lock:
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self.stats.dequeued += 1
+            self._not_full.notify()
+            return item
+
+    def poll_batch(self, max_items: int = 500, timeout: float = 0.0) -> List[T]:
+        """Up to ``max_items`` queued items, waiting at most ``timeout`` seconds for the first."""
+
+        with self._lock:
+            if not self._items and timeout > 0:
+                self._not_empty.wait_for(lambda: bool(self._items), timeout)
+            count = min(max_items, len(self._items))
+            batch = [self._items.popleft() for _ in range(count)]
+            if batch:
+                self.stats.dequeued += count
+                self._not_full.notify(count)
+            return batch
+
+    def wait(self, timeout: float) -> bool:
+        """Block until an item is queued (without taking it) or ``timeout`` passes."""
+
+        with self._lock:
+            return self._not_empty.wait_for(lambda: bool(self._items), timeout)
+
+    async def batches(self, max_items: int = 500, timeout: float = 0.5) -> AsyncIterator[List[T]]:
+        """Yield non-empty batches forever; waiting happens off the event loop.
+
+        Items are only taken on the event loop, so cancelling the consumer while it
+        waits leaves everything queued.
+        """
+
+        while True:
+            batch = self.poll_batch(max_items)
+            if batch:
+                yield batch
+            else:
+                await asyncio.to_thread(self.wait, timeout)
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            data = asdict(self.stats)
+            data["depth"] = len(self._items)
+        data["maxsize"] = self.maxsize
+        data["policy"] = self.policy
+        data["dropped"] = data["dropped_oldest"] + data["dropped_newest"] + data["block_timeouts"]
+        return data
+
+
+__all__ = ["BoundedMessageQueue", "QueueStats", "BLOCK", "DROP_OLDEST", "DROP_NEWEST", "POLICIES"]
@@ -0,0 +1,374 @@
+"""Replay recorded sensor traffic into the ingestion path for load and regression testing."""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+import httpx
+import paho.mqtt.client as mqtt
+
+from ingestion.sensor_archive import ACTIVE_NAME, archive_files
+from ingestion.sensor_mqtt import SensorMessage, SensorMQTTIngestor
+from shared import jsonio
+
+log = logging.getLogger(__name__)
+
+STAMP_FIELD = "_replay_sent_at"
+DIRECT = "direct"
+MQTT = "mqtt"
+HTTP = "http"
+
+
+def _epoch(value: object) -> float:
+    parsed = datetime.fromisoformat(str(value))
+    return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+
+@dataclass
+class ReplayRecord:
+    topic: str
+    payload: dict
+    recorded_at: float
+
+    def stamped(self) -> bytes:
+        """Payload with the send time added, so receivers can measure end-to-end latency."""
+
+        return jsonio.dumps({**self.payload, STAMP_FIELD: time.time()})
+
+
+def read_records(source: Path, limit: Optional[int] = None) -> List[ReplayRecord]:
+    """Records from an NDJSON archive (file or segment directory) or a compacted history.
+
+    A directory holding ``date=*`` partitions is read through ``SensorHistory``;
+    otherwise closed segments (including those of ``worker-<n>/`` and ``http/``
+    writer directories) are read oldest first, then the active files. Records are
+    returned in recording order.
+    """
+
+    source = Path(source)
+    if source.is_dir() and any(source.glob("date=*")):
+        records = list(_history_records(source))
+    elif source.is_dir():
+        paths = archive_files(source) + archive_files(source, ACTIVE_NAME)
+        records = [record for path in paths for record in _ndjson_records(path)]
+    else:
+        records = list(_ndjson_records(source))
+    records.sort(key=lambda record: record.recorded_at)
+    return records[:limit] if limit is not None else records
+
+
+def _ndjson_records(path: Path) -> Iterator[ReplayRecord]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                data = jsonio.loads(line)
+            except ValueError:
+                log.warning("Skipping malformed record in %s", path.name)
+                continue
+            yield ReplayRecord(data.get("topic", ""), data.get("payload") or {}, _epoch(data["received_at"]))
+
+
+def _history_records(root: Path) -> Iterator[ReplayRecord]:
+    from ingestion.sensor_history import SensorHistory
+
+    frame = SensorHistory(root=root, archive_dir=root).query(columns=["topic", "payload"])
+    for topic, payload, received in zip(frame["topic"], frame["payload"], frame["received_at"]):
+        yield ReplayRecord(topic, jsonio.loads(payload), received.timestamp())
+
+
+class LatencyRecorder:
+    """Collects per-message latencies (seconds) from whichever thread receives them."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latencies: List[float] = []
+        self._received = threading.Condition(self._lock)
+
+    def observe(self, message: SensorMessage) -> None:
+        """``on_message`` hook: latency from the payload's send stamp to now."""
+
+        sent_at = message.payload.get(STAMP_FIELD) if isinstance(message.payload, dict) else None
+        if isinstance(sent_at, (int, float)):
+            self.record([time.time() - sent_at])
+
+    def record(self, latencies: Sequence[float]) -> None:
+        with self._lock:
+            self._latencies.extend(latencies)
+            self._received.notify_all()
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        with self._lock:
+            return self._received.wait_for(lambda: len(self._latencies) >= count, timeout)
+
+    @property
+    def count(self) -> int:
+        return len(self._latencies)
+
+    def percentiles(self) -> Dict[str, float]:
+        with self._lock:
+            values = np.asarray(self._latencies) * 1000.0
+        if not values.size:
+            return {}
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        return {"p50": float(p50), "p90": float(p90), "p99": float(p99), "max": float(values.max()), "mean": float(values.mean())}
+
+
+class DirectTarget:
+    """Calls ``SensorMQTTIngestor._handle_message`` in-process, as paho's network thread would.
+
+    Measures the ingestor's own cost (decode, queue, archive buffering) with no
+    broker in between. The queue is drained after each batch like a consumer would.
+    """
+
+    name = DIRECT
+
+    def __init__(self, recorder: LatencyRecorder, ingestor: Optional[SensorMQTTIngestor] = None, persist_dir: Optional[Path] = None) -> None:
+        self.ingestor = ingestor or SensorMQTTIngestor(persist_dir=persist_dir, on_message=recorder.observe)
+        if ingestor is not None:
+            self.ingestor.on_message = _chain(ingestor.on_message, recorder.observe)
+
+    def start(self) -> None:
+        self.ingestor.archive.start()
+
+    def send(self, records: Sequence[ReplayRecord]) -> None:
+        for record in records:
+            message = mqtt.MQTTMessage(topic=record.topic.encode())
+            message.payload = record.stamped()
+            self.ingestor._handle_message(None, None, message)
+        self.ingestor.poll_batch(len(records))
+
+    def close(self, sent: int, timeout: float) -> None:
+        self.ingestor.archive.stop()
+
+    def metrics(self) -> dict:
+        return self.ingestor.metrics()
+
+
+class MqttTarget:
+    """Publishes to a broker and measures until a subscribed ``SensorMQTTIngestor`` sees each message.
+
+    Topics are republished unchanged, so point ``MQTT_BROKER_URL`` at a local or
+    staging broker rather than production.
+    """
+
+    name = MQTT
+
+    def __init__(self, recorder: LatencyRecorder, persist_dir: Optional[Path] = None, topic: str = "sensors/#", qos: int = 1) -> None:
+        self.recorder = recorder
+        self.qos = qos
+        self.receiver = SensorMQTTIngestor(topic=topic, persist_dir=persist_dir, on_message=recorder.observe, qos=qos)
+        self.publisher = mqtt.Client(client_id=f"hyperlocal-replay-{time.time()}", clean_session=True)
+        if self.receiver.username and self.receiver.password:
+            self.publisher.username_pw_set(self.receiver.username, self.receiver.password)
+        if self.receiver.ca_cert:
+            self.publisher.tls_set(ca_certs=str(self.receiver.ca_cert))
+
+    def start(self) -> None:
+        self.receiver.start()
+        host, port = self.receiver._parse_broker(self.receiver.broker_url)
+        self.publisher.connect(host, port)
+        self.publisher.loop_start()
+        time.sleep(0.5)  # let the receiver's subscription settle before publishing
+
+    def send(self, records: Sequence[ReplayRecord]) -> None:
+        for record in records:
+            self.publisher.publish(record.topic, record.stamped(), qos=self.qos)
+        self.receiver.poll_batch(len(records))
+
+    def close(self, sent: int, timeout: float) -> None:
+        if not self.recorder.wait_for(sent, timeout):
+            log.warning("Replay drain timed out: %d of %d messages received", self.recorder.count, sent)
+        self.publisher.loop_stop()
+        self.publisher.disconnect()
+        self.receiver.stop()
+
+    def metrics(self) -> dict:
+        return self.receiver.metrics()
+
+
+class HttpTarget:
+    """Posts NDJSON batches to ``POST /sensor/batch``; latency is each batch's round trip."""
+
+    name = HTTP
+
+    def __init__(self, recorder: LatencyRecorder, url: str, api_key: Optional[str] = None, client: Optional[httpx.Client] = None) -> None:
+        self.recorder = recorder
+        self.url = url
+        headers = {"content-type": "application/x-ndjson"}
+        if api_key:
+            headers["x-api-key"] = api_key
+        self.client = client or httpx.Client(timeout=30.0)
+        self.headers = headers
+        self.rejected = 0
+
+    def start(self) -> None:
+        pass
+
+    def send(self, records: Sequence[ReplayRecord]) -> None:
+        body = b"\n".join(jsonio.dumps({"topic": record.topic, "payload": record.payload}) for record in records)
+        started = time.time()
+        response = self.client.post(self.url, content=body, headers=self.headers)
+        response.raise_for_status()
+        elapsed = time.time() - started
+        accepted = response.json().get("accepted", len(records))
+        self.rejected += len(records) - accepted
+        self.recorder.record([elapsed] * accepted)
+
+    def close(self, sent: int, timeout: float) -> None:
+        self.client.close()
+
+    def metrics(self) -> dict:
+        return {"rejected": self.rejected}
+
+
+@dataclass
+class ReplayReport:
+    target: str
+    speed: float
+    sent: int = 0
+    received: int = 0
+    errors: int = 0
+    elapsed_seconds: float = 0.0
+    throughput: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    target_metrics: dict = field(default_factory=dict)
+
+    def snapshot(self) -> dict:
+        return asdict(self)
+
+
+class SensorReplay:
+    """Re-send ``records`` through ``target`` at ``speed`` times their recorded pace.
+
+    ``speed=1`` is real time, ``speed=10`` ten times faster and ``speed=0`` as fast
+    as possible. Records that are due together (or up to ``batch_size`` of them when
+    unpaced) are handed to the target as one batch; when the target cannot keep up
+    the schedule slips rather than dropping records, so ``throughput`` at
+    ``speed=0`` is the ingestion ceiling.
+    """
+
+    def __init__(self, records: Sequence[ReplayRecord], target, speed: float = 1.0, batch_size: int = 500, drain_timeout: float = 30.0) -> None:
+        self.records = list(records)
+        self.target = target
+        self.speed = max(0.0, speed)
+        self.batch_size = max(1, batch_size)
+        self.drain_timeout = drain_timeout
+
+    def run(self, recorder: LatencyRecorder) -> ReplayReport:
+        report = ReplayReport(target=self.target.name, speed=self.speed)
+        records = self.records
+        self.target.start()
+        started = time.monotonic()
+        index = 0
+        try:
+            while index < len(records):
+                end = self._batch_end(index, started)
+                batch = records[index:end]
+                try:
+                    self.target.send(batch)
+                except Exception as exc:  # keep replaying; a load test should report failures, not stop
+                    report.errors += len(batch)
+                    log.warning("Replay batch of %d failed: %s", len(batch), exc)
+                report.sent += len(batch)
+                index = end
+        finally:
+            self.target.close(report.sent - report.errors, self.drain_timeout)
+        report.elapsed_seconds = time.monotonic() - started
+        report.received = recorder.count
+        report.throughput = report.received / report.elapsed_seconds if report.elapsed_seconds else 0.0
+        report.latency_ms = recorder.percentiles()
+        report.target_metrics = self.target.metrics()
+        return report
+
+    def _batch_end(self, index: int, started: float) -> int:
+        records = self.records
+        limit = min(len(records), index + self.batch_size)
+        if self.speed == 0:
+            return limit
+        first = records[0].recorded_at
+        due = started + (records[index].recorded_at - first) / self.speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic()
+        end = index + 1
+        while end < limit and started + (records[end].recorded_at - first) / self.speed <= now:
+            end += 1
+        return end
+
+
+def _chain(first: Optional[Callable[[SensorMessage], None]], second: Callable[[SensorMessage], None]) -> Callable[[SensorMessage], None]:
+    if first is None:
+        return second
+
+    def both(message: SensorMessage) -> None:
+        first(message)
+        second(message)
+
+    return both
+
+
+def build_target(kind: str, recorder: LatencyRecorder, persist_dir: Optional[Path] = None, url: Optional[str] = None, api_key: Optional[str] = None):
+    if kind == DIRECT:
+        return DirectTarget(recorder, persist_dir=persist_dir)
+    if kind == MQTT:
+        return MqttTarget(recorder, persist_dir=persist_dir)
+    if kind == HTTP:
+        if not url:
+            raise ValueError("The http target needs --url, e.g. http://localhost:8000/sensor/batch")
+        return HttpTarget(recorder, url, api_key=api_key)
+    raise ValueError(f"Unknown replay target {kind!r}; expected {DIRECT}, {MQTT} or {HTTP}")
+
+
+__all__ = [
+    "DirectTarget",
+    "HttpTarget",
+    "LatencyRecorder",
+    "MqttTarget",
+    "ReplayRecord",
+    "ReplayReport",
+    "SensorReplay",
+    "build_target",
+    "read_records",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay archived sensor traffic and report latency and throughput.")
+    parser.add_argument("source", type=Path, help="sensor_messages*.ndjson[.gz], an archive directory or a compacted history root")
+    parser.add_argument("--target", choices=[DIRECT, MQTT, HTTP], default=DIRECT)
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, N = N x faster, 0 = as fast as possible")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, help="Replay only the first N records")
+    parser.add_argument("--url", help="Batch ingest URL for the http target")
+    parser.add_argument("--api-key", help="x-api-key for the http target")
+    parser.add_argument("--persist-dir", type=Path, help="Archive directory for replayed messages (default: a temporary directory)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    records = read_records(args.source, args.limit)
+    log.info("Replaying %d records from %s", len(records), args.source)
+    persist_dir = args.persist_dir or Path(tempfile.mkdtemp(prefix="sensor-replay-"))
+    recorder = LatencyRecorder()
+    target = build_target(args.target, recorder, persist_dir=persist_dir, url=args.url, api_key=args.api_key)
+    report = SensorReplay(records, target, speed=args.speed, batch_size=args.batch_size).run(recorder)
+    print(json.dumps(report.snapshot(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Scale sensor ingestion across worker processes with MQTT shared subscriptions."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ingestion.sensor_aggregates import AggregatorState, RollingAggregator, WindowSnapshot, state_path
+from ingestion.sensor_mqtt import SensorMessage, SensorMQTTIngestor
+from shared.config import get_settings
+
+log = logging.getLogger(__name__)
+
+PROCESS = "process"
+THREAD = "thread"
+GAUGES = ("depth", "maxsize", "pending")
+
+
+def shared_topic(group: str, topic: str) -> str:
+    """``$share/<group>/<topic>``: the broker delivers each message to one group member."""
+
+    return f"$share/{group}/{topic}"
+
+
+@dataclass
+class WorkerSpec:
+    index: int
+    group: str
+    topic: str
+    persist_dir: Path
+    metrics_interval: float = 1.0
+    client_factory: Optional[Callable[..., Any]] = None
+    on_batch: Optional[Callable[[List[SensorMessage]], None]] = None
+    aggregate: bool = True
+
+    @property
+    def subscription(self) -> str:
+        return shared_topic(self.group, self.topic)
+
+
+def run_worker(spec: WorkerSpec, stop_event, metrics_queue) -> None:
+    """Body of one worker: its own MQTT session, archive segment directory and consumer loop.
+
+    Every message is folded into the worker's :class:`RollingAggregator` (unless
+    ``spec.aggregate`` is off) as it arrives. Messages drained from the ingestor's
+    queue are handed to ``spec.on_batch`` (or discarded once archived). A metrics
+    snapshot and the aggregator's state are pushed every ``metrics_interval``
+    seconds and once more on exit.
+    """
+
+    aggregator = RollingAggregator.from_settings() if spec.aggregate else None
+    ingestor = SensorMQTTIngestor(
+        topic=spec.subscription,
+        on_message=aggregator,
+        persist_dir=spec.persist_dir,
+        client_id=f"hyperlocal-{spec.group}-{spec.index}-{os.getpid()}",
+        client_factory=spec.client_factory,
+    )
+    ingestor.start()
+    last_report = 0.0
+    try:
+        while not stop_event.is_set():
+            batch = ingestor.poll_batch(1000, timeout=0.2)
+            if batch and spec.on_batch is not None:
+                spec.on_batch(batch)
+            now = time.monotonic()
+            if now - last_report >= spec.metrics_interval:
+                metrics_queue.put(_report(spec, ingestor, aggregator))
+                last_report = now
+    finally:
+        ingestor.stop()
+        metrics_queue.put(_report(spec, ingestor, aggregator))
+
+
+def _report(spec: WorkerSpec, ingestor: SensorMQTTIngestor, aggregator: Optional[RollingAggregator]) -> tuple:
+    metrics = ingestor.metrics()
+    if aggregator is None:
+        return spec.index, os.getpid(), metrics, None
+    metrics["aggregates"] = aggregator.metrics()
+    return spec.index, os.getpid(), metrics, aggregator.state()
+
+
+def merge_metrics(snapshots: Dict[int, dict]) -> dict:
+    """Sum numeric counters across worker snapshots (``max_depth`` takes the max)."""
+
+    totals: Dict[str, Any] = {"received": 0, "invalid": 0, "archive": {}, "queue": {}}
+    for snapshot in snapshots.values():
+        totals["received"] += snapshot.get("received", 0)
+        totals["invalid"] += snapshot.get("invalid", 0)
+        for section in ("archive", "queue"):
+            merged = totals[section]
+            for key, value in snapshot.get(section, {}).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if key.startswith("max_") or key.startswith("last_"):
+                    merged[key] = max(merged.get(key, value), value)
+                else:
+                    merged[key] = merged.get(key, 0) + value
+    return totals
+
+
+class SensorWorkerSupervisor:
+    """Run ``workers`` sensor ingestors that share one MQTT subscription group.
+
+    Each worker subscribes to ``$share/<group>/<topic>`` so the broker spreads
+    messages across them, and archives into ``<persist_root>/worker-<n>/``. With
+    ``mode="process"`` workers are separate processes (one core each); ``"thread"``
+    runs the same worker body in threads, which is what tests use with an
+    in-process fake broker. Dead process workers are restarted by :meth:`supervise`;
+    their last counters are kept so merged totals never go backwards.
+
+    Each worker also keeps rolling aggregates of the messages it received; the
+    broker spreads a sensor's readings over all workers, so :meth:`aggregator`
+    merges the states they report and :meth:`publish_aggregates` writes the result
+    for the API's ``/sensor/aggregates``.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        group: Optional[str] = None,
+        topic: str = "sensors/#",
+        persist_root: Optional[Path] = None,
+        mode: str = PROCESS,
+        client_factory: Optional[Callable[..., Any]] = None,
+        on_batch: Optional[Callable[[List[SensorMessage]], None]] = None,
+        metrics_interval: float = 1.0,
+        start_method: str = "spawn",
+        aggregate: bool = True,
+    ) -> None:
+        if mode not in (PROCESS, THREAD):
+            raise ValueError(f"mode must be '{PROCESS}' or '{THREAD}'")
+        settings = get_settings()
+        self.workers = max(1, workers or settings.sensor_workers)
+        self.group = group or settings.sensor_share_group
+        self.topic = topic
+        self.persist_root = Path(persist_root or settings.data_root / "processed" / "sensors")
+        self.mode = mode
+        self.client_factory = client_factory
+        self.on_batch = on_batch
+        self.metrics_interval = metrics_interval
+        self.aggregate = aggregate
+        if mode == PROCESS:
+            context = multiprocessing.get_context(start_method)
+            self._stop_event = context.Event()
+            self._metrics_queue = context.Queue()
+            self._context = context
+        else:
+            self._stop_event = threading.Event()
+            self._metrics_queue = queue.Queue()
+            self._context = None
+        self._handles: Dict[int, Any] = {}
+        self._snapshots: Dict[int, dict] = {}
+        self._retired: List[dict] = []
+        self._states: Dict[int, AggregatorState] = {}
+        self._retired_states: Dict[int, AggregatorState] = {}
+        self._pids: Dict[int, int] = {}
+        self.restarts = 0
+
+    def spec(self, index: int) -> WorkerSpec:
+        return WorkerSpec(
+            index=index,
+            group=self.group,
+            topic=self.topic,
+            persist_dir=self.persist_root / f"worker-{index}",
+            metrics_interval=self.metrics_interval,
+            client_factory=self.client_factory,
+            on_batch=self.on_batch,
+            aggregate=self.aggregate,
+        )
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        args = (self.spec(index), self._stop_event, self._metrics_queue)
+        name = f"sensor-worker-{index}"
+        if self.mode == PROCESS:
+            handle = self._context.Process(target=run_worker, args=args, name=name, daemon=True)
+        else:
+            handle = threading.Thread(target=run_worker, args=args, name=name, daemon=True)
+        handle.start()
+        self._handles[index] = handle
+
+    def supervise(self) -> List[int]:
+        """Restart workers that exited while the supervisor is running; returns their indices."""
+
+        restarted = []
+        if self._stop_event.is_set():
+            return restarted
+        for index, handle in list(self._handles.items()):
+            if not handle.is_alive():
+                log.warning("Sensor worker %d exited; restarting", index)
+                self._retire(index)
+                self._spawn(index)
+                self.restarts += 1
+                restarted.append(index)
+        return restarted
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Signal workers to exit and wait up to ``timeout``, then terminate stragglers.
+
+        Metrics are drained while waiting: a process blocked flushing its last
+        snapshot into a full queue pipe cannot exit until the pipe is read.
+        """
+
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for handle in self._handles.values():
+            while handle.is_alive() and time.monotonic() < deadline:
+                self._drain_metrics()
+                handle.join(min(0.05, max(0.0, deadline - time.monotonic())))
+            if self.mode == PROCESS and handle.is_alive():
+                handle.terminate()
+        self._drain_metrics()
+
+    def _retire(self, index: int) -> None:
+        """Set aside a dead worker's last snapshot (counters only) and aggregates before its index is reused."""
+
+        self._drain_metrics()
+        state = self._states.pop(index, None)
+        if state is not None:
+            self._retired_states[index] = state
+        snapshot = self._snapshots.pop(index, None)
+        if snapshot is not None:
+            self._retired.append(
+                {key: {k: v for k, v in value.items() if k not in GAUGES} if isinstance(value, dict) else value for key, value in snapshot.items()}
+            )
+
+    def _drain_metrics(self) -> None:
+        while True:
+            try:
+                index, pid, snapshot, state = self._metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._snapshots[index] = snapshot
+            self._pids[index] = pid
+            if state is not None:
+                self._states[index] = state
+
+    def aggregator(self) -> RollingAggregator:
+        """One aggregator holding the buckets last reported by every worker (and the last of each restarted one)."""
+
+        self._drain_metrics()
+        merged = RollingAggregator.from_settings()
+        for state in [*self._retired_states.values(), *self._states.values()]:
+            merged.absorb(state)
+        return merged
+
+    def snapshot(self, window_seconds: Optional[float] = None) -> WindowSnapshot:
+        """Window statistics over all workers, e.g. the max water level of every sensor over 15 minutes."""
+
+        return self.aggregator().snapshot(window_seconds)
+
+    def publish_aggregates(self, path: Optional[Path] = None) -> Path:
+        """Write the merged aggregates where the API reads them (``SENSOR_AGGREGATE_STATE_PATH``)."""
+
+        path = Path(path or state_path())
+        self.aggregator().state().save(path)
+        return path
+
+    def metrics(self) -> dict:
+        """Merged counters plus the latest snapshot from each worker."""
+
+        self._drain_metrics()
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for handle in self._handles.values() if handle.is_alive()),
+            "restarts": self.restarts,
+            "group": self.group,
+            "subscription": shared_topic(self.group, self.topic),
+            "totals": merge_metrics(dict(enumerate([*self._retired, *self._snapshots.values()]))),
+            "per_worker": {index: {"pid": self._pids.get(index), **snapshot} for index, snapshot in sorted(self._snapshots.items())},
+        }
+
+
+__all__ = ["SensorWorkerSupervisor", "WorkerSpec", "merge_metrics", "run_worker", "shared_topic"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run sensor ingestion workers on an MQTT shared subscription.")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: SENSOR_WORKERS)")
+    parser.add_argument("--group", help="Shared subscription group (default: SENSOR_SHARE_GROUP)")
+    parser.add_argument("--topic", default="sensors/#")
+    parser.add_argument("--report-seconds", type=float, default=30.0, help="Interval between merged metrics log lines")
+    parser.add_argument("--publish-seconds", type=float, default=5.0, help="Interval between publishing merged aggregates for the API")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    supervisor = SensorWorkerSupervisor(workers=args.workers, group=args.group, topic=args.topic)
+    supervisor.start()
+    last_report = time.monotonic()
+    try:
+        while True:
+            time.sleep(args.publish_seconds)
+            supervisor.supervise()
+            supervisor.publish_aggregates()
+            if time.monotonic() - last_report >= args.report_seconds:
+                log.info("Sensor workers: %s", supervisor.metrics()["totals"])
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+        supervisor.publish_aggregates()
+
+
+if __name__ == "__main__":
+    main()
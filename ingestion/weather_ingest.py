@@ -3,11 +3,14 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import json
 import logging
+import os
+import time
 from datetime import datetime, timedelta
-import tempfile
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
 
 import httpx
 import numpy as np
@@ -18,11 +21,39 @@ try:
 except ImportError:  # pragma: no cover - optional dependency for ECMWF
     cdsapi = None
 
+from ingestion.forecast_cache import ForecastCache, ForecastCacheKey
+from ingestion.forecast_store import ForecastStore
+from shared import jsonio
+from shared.circuit_breaker import CircuitBreaker
 from shared.config import get_settings
+from shared.http_client import get_shared_client, http_pool_metrics
+from shared.singleflight import SingleFlight
 
 log = logging.getLogger(__name__)
 
 
+def _decode_times(values: Optional[list]) -> np.ndarray:
+    """Bulk-convert Open-Meteo ``time`` values (unix seconds or ISO strings) to ``datetime64[m]``."""
+
+    if not values:
+        return np.array([], dtype="datetime64[m]")
+    if isinstance(values[0], str):
+        return np.asarray(values, dtype="datetime64[m]")
+    return np.asarray(values, dtype="int64").astype("datetime64[s]").astype("datetime64[m]")
+
+
+def _batch_kind(size: int) -> str:
+    """Latency-estimate key of an Open-Meteo batch: its size rounded up to a power of two."""
+
+    return f"batch-{1 << max(0, size - 1).bit_length()}"
+
+
+def _client_error(status_code: int) -> bool:
+    """A 4xx caused by the request itself; 408 and 429 are the provider's load, not ours."""
+
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+
 class WeatherIngestor:
     """Ingest weather forecasts from external APIs into xarray datasets."""
 
@@ -32,26 +63,184 @@ class WeatherIngestor:
         variables: Optional[List[str]] = None,
         storage_path: Optional[Path] = None,
         http_client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ForecastCache] = None,
     ) -> None:
         self.base_url = base_url
         self.variables = variables or ["temperature_2m", "precipitation", "windspeed_10m"]
         settings = get_settings()
-        self.storage_path = storage_path or (settings.data_root / "processed" / "weather_forecasts.nc")
-        self.client = http_client or httpx.AsyncClient(timeout=30)
-        self._lock = asyncio.Lock()
+        self.forecast_days = settings.open_meteo_forecast_days
+        self.storage_path = storage_path or (settings.data_root / "processed" / "forecast_store")
+        self.client = http_client or get_shared_client()
+        self._owns_client = http_client is not None
         self.settings = settings
+        self.store = ForecastStore(self.storage_path, resolution=settings.forecast_grid_resolution)
+        if cache is None and settings.forecast_cache_size > 0:
+            cache = ForecastCache(
+                max_entries=settings.forecast_cache_size,
+                resolution=settings.forecast_grid_resolution,
+                update_interval=settings.forecast_update_interval_minutes * 60,
+            )
+        self.cache = cache
+        self.ecmwf_cache_dir = settings.data_root / "raw" / "weather" / "ecmwf"
+        self._inflight: SingleFlight[xr.Dataset] = SingleFlight()
+        self._ecmwf_downloads: SingleFlight[Path] = SingleFlight()
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=settings.breaker_failure_threshold,
+                recovery_time=settings.breaker_recovery_seconds,
+                min_timeout=settings.breaker_min_timeout_seconds,
+                max_timeout=settings.breaker_max_timeout_seconds,
+            )
+            for name in ("open-meteo", "ecmwf")
+        }
 
     async def fetch_forecast(self, lat: float, lon: float) -> xr.Dataset:
-        """Fetch forecast for a single point, returning a dataset."""
+        """Fetch forecast for a single point, returning a dataset.
+
+        Points are served from the grid-cell cache when the current model run has
+        already been fetched for the containing cell; otherwise the provider is
+        queried at the cell centre and the result cached for the rest of the run.
+        Concurrent misses for the same key share a single upstream request.
+        """
+
+        if self.cache is None:
+            key = (lat, lon, tuple(self.variables))
+            dataset = await self._inflight.do(key, lambda: self._fetch_provider(lat, lon))
+        else:
+            key = self.cache.key(lat, lon, self.variables, self.forecast_days)
+            dataset = self.cache.get(key)
+            if dataset is None:
+                dataset = await self._inflight.do(key, lambda: self._fetch_cell(key))
+        result = dataset.copy()
+        result.attrs.update({"lat": lat, "lon": lon})
+        return result
+
+    async def _fetch_cell(self, key: ForecastCacheKey) -> xr.Dataset:
+        cell_lat, cell_lon = self.cache.cell_center(key.cell)
+        dataset = await self._fetch_provider(cell_lat, cell_lon)
+        if self._cacheable(dataset):
+            dataset.attrs["model_run"] = self.cache.model_run_time(key.model_run).isoformat()
+            self.cache.put(key, dataset)
+        return dataset
+
+    async def fetch_many(self, points: Iterable[tuple[float, float]]) -> xr.Dataset:
+        """Fetch forecasts for many points into one dataset along ``location``.
 
+        Open-Meteo misses are packed ``open_meteo_batch_size`` points per request and
+        at most ``weather_max_concurrency`` requests run at once. With ECMWF and
+        ``ecmwf_bulk_area`` enabled, all misses share one CDS download covering
+        their bounding area. Cached cells and duplicate cells are never requested
+        upstream.
+        """
+
+        points = [(float(lat), float(lon)) for lat, lon in points]
+        return self._stack_locations(await self.fetch_points(points), points)
+
+    async def fetch_points(
+        self,
+        points: Iterable[tuple[float, float]],
+        on_ready: Optional[Callable[[int, xr.Dataset], None]] = None,
+    ) -> List[xr.Dataset]:
+        """Per-point datasets in input order, fetched as in :meth:`fetch_many`.
+
+        Points in the same grid cell share one dataset object, so treat the results
+        as read-only. ``on_ready(index, dataset)`` is called as soon as each point is
+        available (cache hits first), which lets callers stream partial results.
+        """
+
+        points = [(float(lat), float(lon)) for lat, lon in points]
+        if not points:
+            raise ValueError("at least one point is required")
+        semaphore = asyncio.Semaphore(max(1, self.settings.weather_max_concurrency))
+        if not self._use_ecmwf():
+            return await self._fetch_cached_many(
+                points, self._fetch_open_meteo_points, self.settings.open_meteo_batch_size, semaphore, on_ready
+            )
+        if self.settings.ecmwf_bulk_area:
+            return await self._fetch_cached_many(points, self._fetch_ecmwf_many, len(points), semaphore, on_ready)
+
+        async def _bounded(idx: int, lat: float, lon: float) -> xr.Dataset:
+            async with semaphore:
+                dataset = await self.fetch_forecast(lat, lon)
+            if on_ready is not None:
+                on_ready(idx, dataset)
+            return dataset
+
+        return list(await asyncio.gather(*(_bounded(idx, lat, lon) for idx, (lat, lon) in enumerate(points))))
+
+    def _use_ecmwf(self) -> bool:
         if self.settings.weather_provider.lower() == "ecmwf" and self.settings.ecmwf_key:
             if cdsapi is None:
                 log.error("cdsapi package not installed; falling back to Open-Meteo provider")
-            else:
-                return await self._fetch_ecmwf(lat, lon)
+                return False
+            return True
+        return False
 
+    async def _fetch_provider(self, lat: float, lon: float) -> xr.Dataset:
+        if self._use_ecmwf():
+            return await self._fetch_ecmwf(lat, lon)
         return await self._fetch_open_meteo(lat, lon)
 
+    async def _fetch_cached_many(
+        self,
+        points: Sequence[Tuple[float, float]],
+        fetch_batch: Callable[[Sequence[Tuple[float, float]]], Awaitable[List[xr.Dataset]]],
+        batch_size: int,
+        semaphore: asyncio.Semaphore,
+        on_ready: Optional[Callable[[int, xr.Dataset], None]] = None,
+    ) -> List[xr.Dataset]:
+        results: List[Optional[xr.Dataset]] = [None] * len(points)
+        pending: Dict[Hashable, List[int]] = {}
+        targets: Dict[Hashable, Tuple[float, float]] = {}
+        for idx, (lat, lon) in enumerate(points):
+            if self.cache is None:
+                key: Hashable = (lat, lon)
+                target = (lat, lon)
+            else:
+                key = self.cache.key(lat, lon, self.variables, self.forecast_days)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[idx] = cached
+                    if on_ready is not None:
+                        on_ready(idx, cached)
+                    continue
+                target = self.cache.cell_center(key.cell)
+            pending.setdefault(key, []).append(idx)
+            targets[key] = target
+
+        async def _run(chunk: List[Hashable]) -> None:
+            async with semaphore:
+                batch = await fetch_batch([targets[key] for key in chunk])
+            for dataset, key in zip(batch, chunk):
+                if self.cache is not None and self._cacheable(dataset):
+                    dataset.attrs["model_run"] = self.cache.model_run_time(key.model_run).isoformat()
+                    self.cache.put(key, dataset)
+                for idx in pending[key]:
+                    results[idx] = dataset
+                    if on_ready is not None:
+                        on_ready(idx, dataset)
+
+        keys = list(pending)
+        size = max(1, batch_size)
+        await asyncio.gather(*(_run(keys[start : start + size]) for start in range(0, len(keys), size)))
+        return results  # type: ignore[return-value]
+
+    @staticmethod
+    def _cacheable(dataset: xr.Dataset) -> bool:
+        return dataset.attrs.get("source") != "synthetic" and not dataset.attrs.get("stale")
+
+    def _fallback_dataset(self, lat: float, lon: float) -> xr.Dataset:
+        """Last cached forecast for the cell if any, otherwise the synthetic series."""
+
+        if self.cache is not None:
+            stale = self.cache.get_stale(lat, lon, self.variables, forecast_days=self.forecast_days)
+            if stale is not None:
+                dataset = stale.copy()
+                dataset.attrs.update({"stale": "true", "lat": lat, "lon": lon})
+                return dataset
+        return self._synthetic_dataset(lat, lon)
+
     async def _fetch_open_meteo(self, lat: float, lon: float) -> xr.Dataset:
         """Retrieve forecast data from the Open-Meteo public API."""
 
@@ -59,26 +248,128 @@ class WeatherIngestor:
             "latitude": lat,
             "longitude": lon,
             "hourly": ",".join(self.variables),
+            "timeformat": "unixtime",
+            "forecast_days": self.forecast_days,
         }
+        dataset = await self._request_open_meteo(
+            params, lambda payload: self._dataset_from_payload(payload[0] if isinstance(payload, list) else payload), kind="point"
+        )
+        if dataset is None:
+            return self._fallback_dataset(lat, lon)
+        dataset.attrs.update({"lat": lat, "lon": lon})
+        return dataset
+
+    async def _fetch_open_meteo_points(self, points: Sequence[Tuple[float, float]]) -> List[xr.Dataset]:
+        batch = await self._fetch_open_meteo_batch(points)
+        if batch is None:
+            return [self._fallback_dataset(lat, lon) for lat, lon in points]
+        return [batch.isel(location=position, drop=True) for position in range(len(points))]
+
+    async def _fetch_open_meteo_batch(self, points: Sequence[Tuple[float, float]]) -> Optional[xr.Dataset]:
+        """Retrieve several locations in one Open-Meteo request (comma-separated coordinates).
+
+        Returns ``None`` when the provider is unavailable so callers can fall back.
+        """
+
+        params = {
+            "latitude": ",".join(repr(float(lat)) for lat, _ in points),
+            "longitude": ",".join(repr(float(lon)) for _, lon in points),
+            "hourly": ",".join(self.variables),
+            "timeformat": "unixtime",
+            "forecast_days": self.forecast_days,
+        }
+
+        def convert(payload) -> xr.Dataset:
+            dataset = self._dataset_from_batch_payload(payload if isinstance(payload, list) else [payload])
+            if dataset.sizes["location"] != len(points):
+                raise ValueError(f"{dataset.sizes['location']} locations returned for {len(points)} points")
+            return dataset
+
+        dataset = await self._request_open_meteo(params, convert, kind=_batch_kind(len(points)))
+        if dataset is None:
+            return None
+        lats, lons = zip(*points)
+        return dataset.assign_coords(latitude=("location", list(lats)), longitude=("location", list(lons)))
+
+    async def _request_open_meteo(self, params: dict, convert: Callable[[Any], xr.Dataset], kind: str) -> Optional[xr.Dataset]:
+        """Call Open-Meteo through its circuit breaker and ``convert`` the payload; ``None`` means use the fallback.
+
+        While the breaker is open no request is made at all, and otherwise the
+        request timeout follows the breaker's latency-adaptive estimate for
+        ``kind``, so slow batch requests neither inflate single-point timeouts nor
+        get cut off by them. A 200 whose body does not convert (wrong shape, bad
+        times, no hourly data) counts as a failure like a transport error; a 4xx
+        other than 408/429 is a problem with the request, not the provider, and
+        leaves the breaker alone.
+        """
+
+        breaker = self.breakers["open-meteo"]
+        if not breaker.allow():
+            log.debug("Open-Meteo circuit open; serving fallback")
+            return None
+        started = time.perf_counter()
         try:
-            response = await self.client.get(self.base_url, params=params)
+            response = await self.client.get(self.base_url, params=params, timeout=breaker.timeout(kind))
             response.raise_for_status()
-            payload = response.json()
-            dataset = self._dataset_from_payload(payload)
-        except httpx.HTTPError as exc:
-            log.warning("Weather API failed (%s), generating synthetic fallback", exc)
-            dataset = self._synthetic_dataset(lat, lon)
-        dataset.attrs.update({"lat": lat, "lon": lon})
+            dataset = convert(jsonio.loads(response.content))
+        except httpx.HTTPStatusError as exc:
+            if _client_error(exc.response.status_code):
+                breaker.release()
+                log.warning("Weather API rejected the request (%s), serving fallback", exc.response.status_code)
+            else:
+                breaker.record_failure()
+                log.warning("Weather API failed (%s), serving fallback", exc)
+            return None
+        except Exception as exc:
+            breaker.record_failure()
+            log.warning("Weather API failed (%s), serving fallback", exc)
+            return None
+        breaker.record_success(time.perf_counter() - started, kind)
         return dataset
 
     async def _fetch_ecmwf(self, lat: float, lon: float) -> xr.Dataset:
         """Retrieve a localised ECMWF dataset via CDS API."""
 
-        request_payload = self._build_ecmwf_request(lat, lon)
-        tmp_dir = Path(tempfile.mkdtemp())
-        target = tmp_dir / f"ecmwf-{lat:.3f}-{lon:.3f}.nc"
+        return (await self._fetch_ecmwf_many([(lat, lon)]))[0]
+
+    async def _fetch_ecmwf_many(self, points: Sequence[Tuple[float, float]]) -> List[xr.Dataset]:
+        """Download one ERA5 area covering ``points`` and extract each point's series.
+
+        Downloads are cached under ``data/raw/weather/ecmwf`` keyed by a hash of the
+        CDS request, so every call for the same day, variables and area reuses one
+        file, and concurrent callers share a single in-flight CDS job.
+        """
+
+        breaker = self.breakers["ecmwf"]
+        if not breaker.allow():
+            return [self._fallback_dataset(lat, lon) for lat, lon in points]
+        request_payload = self._build_ecmwf_area_request(points)
+        started = time.perf_counter()
+        try:
+            path = await self._download_ecmwf_area(request_payload)
+            with xr.open_dataset(path) as raw_dataset:
+                selected = self._select_points(raw_dataset, points, self.settings.ecmwf_interpolation).load()
+            datasets = []
+            for position, (lat, lon) in enumerate(points):
+                dataset = self._ecmwf_to_dataset(selected.isel(location=position))
+                dataset.attrs.update({"source": "ecmwf-era5", "lat": lat, "lon": lon})
+                datasets.append(dataset)
+        except Exception as exc:  # pragma: no cover - requires network
+            breaker.record_failure()
+            log.error("ECMWF retrieval failed (%s); serving fallback", exc)
+            return [self._fallback_dataset(lat, lon) for lat, lon in points]
+        breaker.record_success(time.perf_counter() - started)
+        return datasets
+
+    async def _download_ecmwf_area(self, request_payload: dict) -> Path:
+        digest = hashlib.sha256(json.dumps(request_payload, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+        target = self.ecmwf_cache_dir / f"era5-{digest}.nc"
 
         def _download() -> Path:
+            if target.exists():
+                return target
+            self.ecmwf_cache_dir.mkdir(parents=True, exist_ok=True)
+            partial = target.with_suffix(".nc.part")
             client = cdsapi.Client(
                 url=self.settings.ecmwf_url,
                 key=self.settings.ecmwf_key,
@@ -88,30 +379,59 @@ class WeatherIngestor:
             client.retrieve(
                 "reanalysis-era5-single-levels",
                 request_payload,
-                str(target),
+                str(partial),
             )
+            os.replace(partial, target)
             return target
 
-        try:
-            path = await asyncio.to_thread(_download)
-            raw_dataset = xr.open_dataset(path)
-            dataset = self._ecmwf_to_dataset(raw_dataset)
-            dataset.attrs.update({"source": "ecmwf-era5", "lat": lat, "lon": lon})
-            return dataset
-        except Exception as exc:  # pragma: no cover - requires network
-            log.error("ECMWF retrieval failed (%s); generating synthetic data", exc)
-            return self._synthetic_dataset(lat, lon)
-        finally:
-            try:
-                if target.exists():
-                    target.unlink()
-                tmp_dir.rmdir()
-            except OSError:
-                pass
+        return await self._ecmwf_downloads.do(digest, lambda: asyncio.to_thread(_download))
+
+    @staticmethod
+    def _select_points(raw_dataset: xr.Dataset, points: Sequence[Tuple[float, float]], method: str = "nearest") -> xr.Dataset:
+        """Vectorised nearest or bilinear extraction of ``points`` onto a ``location`` dimension."""
+
+        lats = np.array([lat for lat, _ in points], dtype=float)
+        lons = np.array([lon for _, lon in points], dtype=float)
+        if method == "nearest":
+            return raw_dataset.sel(
+                latitude=xr.DataArray(lats, dims="location"),
+                longitude=xr.DataArray(lons, dims="location"),
+                method="nearest",
+            ).drop_vars(["latitude", "longitude"])
+        if method != "bilinear":
+            raise ValueError(f"unsupported interpolation method: {method}")
+
+        def _bracket(grid: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, xr.DataArray]:
+            order = np.argsort(grid)
+            position = np.interp(values, grid[order], np.arange(grid.size))
+            lower = np.floor(position).astype(int)
+            upper = np.minimum(lower + 1, grid.size - 1)
+            return order[lower], order[upper], xr.DataArray(position - lower, dims="location")
+
+        lat_lo, lat_hi, wy = _bracket(raw_dataset["latitude"].values, lats)
+        lon_lo, lon_hi, wx = _bracket(raw_dataset["longitude"].values, lons)
+
+        def _corner(lat_idx: np.ndarray, lon_idx: np.ndarray) -> xr.Dataset:
+            return raw_dataset.isel(
+                latitude=xr.DataArray(lat_idx, dims="location"),
+                longitude=xr.DataArray(lon_idx, dims="location"),
+            ).drop_vars(["latitude", "longitude"])
+
+        return (
+            _corner(lat_lo, lon_lo) * (1 - wy) * (1 - wx)
+            + _corner(lat_hi, lon_lo) * wy * (1 - wx)
+            + _corner(lat_lo, lon_hi) * (1 - wy) * wx
+            + _corner(lat_hi, lon_hi) * wy * wx
+        )
 
     def _build_ecmwf_request(self, lat: float, lon: float) -> dict:
         """Construct ECMWF request payload for ERA5 single-level variables."""
 
+        return self._build_ecmwf_area_request([(lat, lon)])
+
+    def _build_ecmwf_area_request(self, points: Sequence[Tuple[float, float]], delta: float = 0.1) -> dict:
+        """ERA5 request for the bounding area of ``points`` (padded by ``delta`` degrees)."""
+
         now = datetime.utcnow()
         hours = [f"{hour:02d}" for hour in range(0, 24)]
         return {
@@ -121,19 +441,23 @@ class WeatherIngestor:
             "month": f"{now.month:02d}",
             "day": f"{now.day:02d}",
             "time": hours,
-            "area": self._point_to_area(lat, lon),
+            "area": self._points_to_area(points, delta),
             "format": "netcdf",
         }
 
+    @staticmethod
+    def _points_to_area(points: Sequence[Tuple[float, float]], delta: float = 0.1) -> List[float]:
+        """Bounding box [N, W, S, E] covering every point, padded by ``delta``."""
+
+        lats = [lat for lat, _ in points]
+        lons = [lon for _, lon in points]
+        return [min(90.0, max(lats) + delta), min(lons) - delta, max(-90.0, min(lats) - delta), max(lons) + delta]
+
     @staticmethod
     def _point_to_area(lat: float, lon: float, delta: float = 0.1) -> List[float]:
         """Convert a point to an ECMWF bounding box [N, W, S, E]."""
 
-        north = min(90.0, lat + delta)
-        south = max(-90.0, lat - delta)
-        east = lon + delta
-        west = lon - delta
-        return [north, west, south, east]
+        return WeatherIngestor._points_to_area([(lat, lon)], delta)
 
     def _ecmwf_to_dataset(self, raw_dataset: xr.Dataset) -> xr.Dataset:
         """Transform ERA5 dataset to the internal forecast schema."""
@@ -190,28 +514,66 @@ class WeatherIngestor:
         return dataset
 
     async def ingest_many(self, points: Iterable[tuple[float, float]]) -> xr.Dataset:
-        """Fetch forecasts for multiple locations and merge into a single dataset."""
+        """Fetch forecasts for multiple locations and append them to the forecast store."""
 
-        datasets = await asyncio.gather(*(self.fetch_forecast(lat, lon) for lat, lon in points))
-        combined = xr.concat(datasets, dim="location")
-        combined = combined.assign_coords(location=list(range(len(datasets))))
-        async with self._lock:
-            combined.to_netcdf(self.storage_path)
+        combined = await self.fetch_many(points)
+        await asyncio.to_thread(self.store.append, combined)
         return combined
 
     def _dataset_from_payload(self, payload: dict) -> xr.Dataset:
-        hourly = payload.get("hourly", {})
-        time = hourly.get("time") or []
-        coords = {
-            "time": np.array([np.datetime64(t) for t in time]),
-            "variable": np.array(self.variables),
-        }
-        data = [hourly.get(var, [np.nan] * len(time)) for var in self.variables]
-        array = np.vstack(data)
-        dataset = xr.Dataset({"forecast": (("variable", "time"), array)}, coords=coords)
-        dataset.attrs.update({"source": payload.get("timezone", "open-meteo"), "generated_at": datetime.utcnow().isoformat()})
+        return self._dataset_from_batch_payload([payload]).isel(location=0, drop=True)
+
+    def _dataset_from_batch_payload(self, payloads: List[dict]) -> xr.Dataset:
+        """Decode a multi-location response straight into a (location, variable, time) array.
+
+        Values are copied from the parsed JSON lists into one preallocated float64
+        array (``None`` becomes NaN) and the time axis is parsed in bulk, so no
+        intermediate per-value Python objects are created.
+        """
+
+        hourly = [payload.get("hourly", {}) for payload in payloads]
+        times = _decode_times(hourly[0].get("time") if hourly else None)
+        if not times.size:
+            raise ValueError("payload has no hourly time axis")
+        array = np.full((len(hourly), len(self.variables), times.size), np.nan)
+        for location, entry in enumerate(hourly):
+            for row, var in enumerate(self.variables):
+                series = entry.get(var)
+                if series:
+                    array[location, row, : len(series)] = series[: times.size]
+        coords = {"time": times, "variable": np.array(self.variables)}
+        dataset = xr.Dataset({"forecast": (("location", "variable", "time"), array)}, coords=coords)
+        source = payloads[0].get("timezone", "open-meteo") if payloads else "open-meteo"
+        dataset.attrs.update({"source": source, "generated_at": datetime.utcnow().isoformat()})
         return dataset
 
+    @staticmethod
+    def _stack_locations(datasets: Sequence[xr.Dataset], points: Sequence[Tuple[float, float]]) -> xr.Dataset:
+        """Stack per-point datasets along ``location`` keeping the requested coordinates."""
+
+        first = datasets[0]
+        aligned = all(
+            np.array_equal(ds["time"].values, first["time"].values)
+            and np.array_equal(ds["variable"].values, first["variable"].values)
+            for ds in datasets[1:]
+        )
+        if aligned:
+            data = np.stack([ds["forecast"].values for ds in datasets])
+            combined = xr.Dataset(
+                {"forecast": (("location", "variable", "time"), data)},
+                coords={"variable": first["variable"].values, "time": first["time"].values},
+            )
+        else:
+            combined = xr.concat(list(datasets), dim="location")
+        lats, lons = zip(*points)
+        combined = combined.assign_coords(
+            location=np.arange(len(datasets)),
+            latitude=("location", np.asarray(lats, dtype=float)),
+            longitude=("location", np.asarray(lons, dtype=float)),
+        )
+        combined.attrs = {key: value for key, value in first.attrs.items() if key not in ("lat", "lon")}
+        return combined
+
     def _synthetic_dataset(self, lat: float, lon: float) -> xr.Dataset:
         base_time = datetime.utcnow()
         times = np.array([np.datetime64(base_time + timedelta(hours=i)) for i in range(48)])
@@ -226,8 +588,21 @@ class WeatherIngestor:
         dataset.attrs.update({"source": "synthetic", "lat": lat, "lon": lon})
         return dataset
 
+    def metrics(self) -> dict:
+        """Cache, coalescing, connection-pool and breaker counters keyed by component name."""
+
+        components = {
+            "forecast_inflight": self._inflight.snapshot(),
+            "http_pool": http_pool_metrics(),
+            "weather_breakers": {name: breaker.snapshot() for name, breaker in self.breakers.items()},
+        }
+        if self.cache is not None:
+            components["forecast_cache"] = self.cache.snapshot()
+        return components
+
     async def close(self) -> None:
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
 
 
 async def main(points: Iterable[tuple[float, float]]) -> None:
@@ -0,0 +1,320 @@
+"""Versioned cache of pre-serialized, pre-compressed risk products per basin."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from layers.mapping import RiskLayerConfig, build_risk_map
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class RiskInputs:
+    hazard: gpd.GeoDataFrame
+    vulnerability: List[gpd.GeoDataFrame]
+    config: RiskLayerConfig
+
+
+@dataclass
+class CachedBody:
+    """One rendered product: identity and gzip bodies plus validators."""
+
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    version: str
+    built_at: float
+    media_type: str = "application/json"
+
+    @property
+    def gzip_etag(self) -> str:
+        """Strong validators are per representation, so the gzip body gets its own."""
+
+        return f'{self.etag[:-1]}-gzip"'
+
+
+@dataclass
+class RiskCacheStats:
+    hits: int = 0
+    builds: int = 0
+    risk_builds: int = 0
+    refreshes: int = 0
+    unchanged_refreshes: int = 0
+    rechecks: int = 0
+    last_build_seconds: float = 0.0
+
+
+@dataclass
+class RiskProduct:
+    """How to load a product's inputs for a basin and render its JSON body from the risk map."""
+
+    kind: str
+    loader: Callable[[str], RiskInputs]
+    render: Callable[[str, gpd.GeoDataFrame], bytes]
+
+
+def frame_digest(frame: gpd.GeoDataFrame, digest: "hashlib._Hash") -> None:
+    """Feed a GeoDataFrame's columns, dtypes, CRS, attribute values and WKB geometry into ``digest``."""
+
+    geometry = frame.geometry.name
+    attributes = frame.drop(columns=geometry)
+    digest.update(json.dumps([list(map(str, attributes.columns)), [str(dtype) for dtype in attributes.dtypes], str(frame.crs)]).encode())
+    digest.update(pd.util.hash_pandas_object(attributes, index=True).values.tobytes())
+    for wkb in shapely.to_wkb(frame.geometry.values, hex=False):
+        digest.update(wkb or b"")
+
+
+def content_hash(inputs: RiskInputs) -> str:
+    """Hex SHA-256 of everything ``build_risk_map`` reads; equal hashes mean equal risk maps."""
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps(asdict(inputs.config), sort_keys=True).encode())
+    frame_digest(inputs.hazard, digest)
+    for layer in inputs.vulnerability:
+        frame_digest(layer, digest)
+    return digest.hexdigest()
+
+
+class RiskProductCache:
+    """Risk products (``/risk-map``, ``/adaptation`` bodies) cached per ``(basin, kind)``.
+
+    The first request for a basin loads its inputs, hashes them with
+    :func:`content_hash` and runs ``build_risk_map`` once per distinct hash (shared
+    across product kinds). The rendered JSON is stored together with a gzip copy
+    and a strong ETag derived from the product kind and input hash, so a repeat
+    request is a dict lookup and a rebuild from unchanged inputs keeps its ETag
+    (renderers must therefore produce the same bytes for the same risk map).
+
+    Once an entry's hash is older than ``recheck_seconds`` it is still served, and
+    a background thread reloads and re-hashes its inputs, rebuilding only if they
+    changed (stale-while-revalidate); :meth:`refresh` does the same synchronously
+    (call it when new hazard data lands). Loading and building are serialised per
+    ``(basin, kind)``, so a slow basin never holds up requests for another.
+    """
+
+    def __init__(
+        self,
+        products: List[RiskProduct],
+        max_entries: int = 256,
+        compresslevel: int = 6,
+        recheck_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.products: Dict[str, RiskProduct] = {product.kind: product for product in products}
+        self.max_entries = max(1, max_entries)
+        self.compresslevel = compresslevel
+        self.recheck_seconds = recheck_seconds
+        self.stats = RiskCacheStats()
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], CachedBody]" = OrderedDict()
+        self._risk_maps: "OrderedDict[str, gpd.GeoDataFrame]" = OrderedDict()
+        # (basin, kind) -> (input hash, when it was last computed)
+        self._versions: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._rechecking: Dict[Tuple[str, str], threading.Thread] = {}
+
+    def peek(self, basin_id: str, kind: str) -> Optional[CachedBody]:
+        """The cached body if present, without building (safe on the event loop).
+
+        A body whose inputs are due for a re-check is still returned; the re-check
+        runs in the background.
+        """
+
+        key = (basin_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            if self._checked_version(key) is None:
+                self._schedule_recheck(key)
+            return entry
+
+    def get(self, basin_id: str, kind: str) -> CachedBody:
+        """Cached body, building it first if there is none (CPU-bound; call from a worker thread)."""
+
+        entry = self.peek(basin_id, kind)
+        if entry is not None:
+            return entry
+        product = self.products[kind]
+        with self._key_lock((basin_id, kind)):
+            with self._lock:
+                entry = self._entries.get((basin_id, kind))
+            if entry is not None:
+                return entry
+            inputs = product.loader(basin_id)
+            return self._build(basin_id, product, inputs, content_hash(inputs))
+
+    def risk_map(self, basin_id: str, kind: str) -> Tuple[str, gpd.GeoDataFrame]:
+        """``(version, risk map)`` behind a product without rendering its body.
+
+        Uses the last input hash seen for ``(basin, kind)``, re-checking it in the
+        background once it is older than ``recheck_seconds``; the inputs are only
+        loaded inline when no risk map for the key is held.
+        """
+
+        key = (basin_id, kind)
+        with self._lock:
+            version, risk = self._known_risk_map(key)
+            if risk is not None:
+                if self._checked_version(key) is None:
+                    self._schedule_recheck(key)
+                return version, risk
+        with self._key_lock(key):
+            with self._lock:
+                version, risk = self._known_risk_map(key)
+            if risk is not None:
+                return version, risk
+            inputs = self.products[kind].loader(basin_id)
+            version = content_hash(inputs)
+            risk = self._risk_map(version, inputs)
+            self._remember(basin_id, kind, version)
+            return version, risk
+
+    def refresh(self, basin_id: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Reload inputs of cached products and risk maps (one basin or all); returns the keys that changed."""
+
+        with self._lock:
+            keys = [key for key in dict.fromkeys([*self._entries, *self._versions]) if basin_id is None or key[0] == basin_id]
+        rebuilt = []
+        for key in keys:
+            changed = self._recheck(key)
+            with self._lock:
+                self.stats.refreshes += 1
+                self.stats.unchanged_refreshes += not changed
+            if changed:
+                rebuilt.append(key)
+        return rebuilt
+
+    def invalidate(self, basin_id: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if basin_id is None or key[0] == basin_id]:
+                del self._entries[key]
+            for key in [key for key in self._versions if basin_id is None or key[0] == basin_id]:
+                del self._versions[key]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            data = asdict(self.stats)
+            data["entries"] = len(self._entries)
+            data["risk_maps"] = len(self._risk_maps)
+            data["rechecking"] = len(self._rechecking)
+        return data
+
+    def _checked_version(self, key: Tuple[str, str]) -> Optional[str]:
+        """Input hash for ``key`` if it was computed within ``recheck_seconds`` (hold ``_lock``)."""
+
+        version, checked_at = self._versions.get(key, (None, 0.0))
+        if version is None or self._clock() - checked_at > self.recheck_seconds:
+            return None
+        return version
+
+    def _known_risk_map(self, key: Tuple[str, str]) -> Tuple[Optional[str], Optional[gpd.GeoDataFrame]]:
+        """Last input hash for ``key`` and its risk map if still held, however old (hold ``_lock``)."""
+
+        version = self._versions.get(key, (None, 0.0))[0]
+        return version, self._risk_maps.get(version) if version is not None else None
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _schedule_recheck(self, key: Tuple[str, str]) -> None:
+        """Start one background re-check of ``key`` unless one is running (hold ``_lock``)."""
+
+        if key in self._rechecking:
+            return
+        self.stats.rechecks += 1
+        thread = threading.Thread(target=self._background_recheck, args=(key,), name=f"risk-recheck-{key[0]}-{key[1]}", daemon=True)
+        self._rechecking[key] = thread
+        thread.start()
+
+    def _background_recheck(self, key: Tuple[str, str]) -> None:
+        try:
+            self._recheck(key)
+        except Exception:  # keep serving the cached body; the next request retries
+            log.exception("Re-checking %s inputs of basin %s failed", key[1], key[0])
+        finally:
+            with self._lock:
+                self._rechecking.pop(key, None)
+
+    def _recheck(self, key: Tuple[str, str]) -> bool:
+        """Reload and re-hash ``key``'s inputs, rebuilding what they feed if they changed."""
+
+        basin_id, kind = key
+        product = self.products[kind]
+        with self._key_lock(key):
+            inputs = product.loader(basin_id)
+            version = content_hash(inputs)
+            with self._lock:
+                current = self._entries.get(key)
+                known = self._versions.get(key, (None, 0.0))[0]
+            if known == version and (current is None or current.version == version):
+                self._remember(basin_id, kind, version)
+                return False
+            if current is not None:
+                self._build(basin_id, product, inputs, version)
+            else:
+                self._risk_map(version, inputs)
+                self._remember(basin_id, kind, version)
+            return True
+
+    def _remember(self, basin_id: str, kind: str, version: str) -> None:
+        with self._lock:
+            self._versions[(basin_id, kind)] = (version, self._clock())
+            self._versions.move_to_end((basin_id, kind))
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+    def _risk_map(self, version: str, inputs: RiskInputs) -> gpd.GeoDataFrame:
+        with self._lock:
+            risk = self._risk_maps.get(version)
+        if risk is not None:
+            return risk
+        risk = build_risk_map(inputs.hazard, inputs.vulnerability, inputs.config)
+        with self._lock:
+            self.stats.risk_builds += 1
+            self._risk_maps[version] = risk
+            while len(self._risk_maps) > self.max_entries:
+                self._risk_maps.popitem(last=False)
+        return risk
+
+    def _build(self, basin_id: str, product: RiskProduct, inputs: RiskInputs, version: str) -> CachedBody:
+        started = time.perf_counter()
+        body = product.render(basin_id, self._risk_map(version, inputs))
+        entry = CachedBody(
+            body=body,
+            gzip_body=gzip.compress(body, compresslevel=self.compresslevel, mtime=0),
+            etag=f'"{product.kind}-{version[:32]}"',
+            version=version,
+            built_at=time.time(),
+        )
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._entries[(basin_id, product.kind)] = entry
+            self._entries.move_to_end((basin_id, product.kind))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats.builds += 1
+            self.stats.last_build_seconds = elapsed
+        self._remember(basin_id, product.kind, version)
+        log.info("Built %s for basin %s (inputs %s) in %.2f s", product.kind, basin_id, version[:12], elapsed)
+        return entry
+
+
+__all__ = ["CachedBody", "RiskInputs", "RiskProduct", "RiskProductCache", "content_hash"]
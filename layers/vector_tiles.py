@@ -0,0 +1,285 @@
+"""Mapbox Vector Tiles (MVT v2) of risk maps with a version-keyed on-disk tile cache."""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import geopandas as gpd
+import mapbox_vector_tile
+import numpy as np
+import pandas as pd
+import shapely
+from mapbox_vector_tile.encoder import on_invalid_geometry_make_valid
+
+from layers.risk_cache import RiskProductCache
+from shared.config import get_settings
+
+log = logging.getLogger(__name__)
+
+EXTENT = 4096
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+ORIGIN = 20037508.342789244  # half the EPSG:3857 world width in metres
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def encode_layer(name: str, geometries: np.ndarray, attributes: pd.DataFrame, ids: Optional[np.ndarray] = None, extent: int = EXTENT) -> bytes:
+    """One MVT ``Tile`` holding a single polygon layer; empty bytes when there are no geometries.
+
+    ``geometries`` are already in integer, y-down tile coordinates; winding,
+    ring closing and the command stream are left to ``mapbox_vector_tile``.
+    Nulls are omitted from a feature's tags.
+    """
+
+    if not len(geometries):
+        return b""
+    properties = attributes.astype(object).where(attributes.notna(), None).to_dict("records")
+    features = [
+        {
+            "geometry": geometry,
+            "properties": {key: _native(value) for key, value in props.items() if value is not None},
+            "id": None if ids is None else int(ids[index]),
+        }
+        for index, (geometry, props) in enumerate(zip(geometries, properties))
+    ]
+    options = {"extents": extent, "y_coord_down": True, "on_invalid_geometry": on_invalid_geometry_make_valid}
+    return mapbox_vector_tile.encode({"name": name, "features": features}, default_options=options)
+
+
+def _native(value):
+    """Python scalars for the encoder, which only tags ``str``/``bool``/``int``/``float`` values."""
+
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """EPSG:3857 ``(minx, miny, maxx, maxy)`` of an XYZ (slippy map) tile."""
+
+    size = 2 * ORIGIN / (1 << z)
+    return (-ORIGIN + x * size, ORIGIN - (y + 1) * size, -ORIGIN + (x + 1) * size, ORIGIN - y * size)
+
+
+@dataclass
+class TileLayer:
+    """A risk map projected to EPSG:3857 with a spatial index, ready to cut tiles from."""
+
+    geometries: np.ndarray
+    attributes: pd.DataFrame
+    tree: shapely.STRtree
+    bounds: Tuple[float, float, float, float]
+
+    @classmethod
+    def from_frame(cls, frame: gpd.GeoDataFrame) -> "TileLayer":
+        if frame.crs is None:
+            frame = frame.set_crs("EPSG:4326")
+        projected = frame.to_crs("EPSG:3857")
+        geometries = np.asarray(projected.geometry.values, dtype=object)
+        attributes = pd.DataFrame(projected.drop(columns=projected.geometry.name)).reset_index(drop=True)
+        bounds = tuple(shapely.total_bounds(geometries)) if len(geometries) else (math.inf, math.inf, -math.inf, -math.inf)
+        return cls(geometries=geometries, attributes=attributes, tree=shapely.STRtree(geometries), bounds=bounds)
+
+    def overlaps(self, z: int, x: int, y: int, extent: int = EXTENT, buffer: int = 64) -> bool:
+        """Whether the buffered tile touches the layer's extent at all."""
+
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        pad = buffer * (maxx - minx) / extent
+        left, bottom, right, top = self.bounds
+        return minx - pad <= right and left <= maxx + pad and miny - pad <= top and bottom <= maxy + pad
+
+    def tile(self, z: int, x: int, y: int, name: str = "risk", extent: int = EXTENT, buffer: int = 64, simplify: float = 4.0) -> bytes:
+        """Encode one tile: index lookup, clip, project to tile units, simplify, snap to the grid.
+
+        Polygons that collapse below one tile unit at this zoom drop out, so low zooms
+        carry fewer, coarser features.
+        """
+
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        scale = extent / (maxx - minx)
+        pad = buffer / scale
+        hits = np.sort(self.tree.query(shapely.box(minx - pad, miny - pad, maxx + pad, maxy + pad), predicate="intersects"))
+        if not len(hits):
+            return b""
+        clipped = shapely.clip_by_rect(self.geometries[hits], minx - pad, miny - pad, maxx + pad, maxy + pad)
+        local = shapely.transform(clipped, lambda coords: (coords - (minx, maxy)) * (scale, -scale))
+        if simplify > 0:
+            local = shapely.simplify(local, simplify)
+        snapped = shapely.set_precision(local, 1.0, mode="pointwise")
+        invalid = ~shapely.is_valid(snapped)
+        if invalid.any():
+            # Only geometries that snapping broke pay for GEOS's validity-preserving reducer.
+            snapped[invalid] = shapely.set_precision(local[invalid], 1.0)
+        keep = ~shapely.is_empty(snapped)
+        if not keep.any():
+            return b""
+        return encode_layer(name, snapped[keep], self.attributes.iloc[hits[keep]], ids=hits[keep], extent=extent)
+
+
+@dataclass
+class VectorTile:
+    body: bytes
+    version: str
+    key: str
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.key}"'
+
+
+@dataclass
+class TileCacheStats:
+    hits: int = 0
+    builds: int = 0
+    empty: int = 0
+    invalidations: int = 0
+    last_build_seconds: float = 0.0
+
+
+class RiskTileCache:
+    """Vector tiles cut from ``RiskProductCache`` risk maps, cached on disk per risk version.
+
+    Tiles live at ``<root>/<basin>/<key>/<z>/<x>/<y>.mvt``, where ``key`` combines
+    the risk map's input content hash with the simplification tolerance. Empty
+    tiles are not written (tiles outside the map's extent are not even cut), so
+    walking the tile pyramid cannot fill the disk. When
+    ``RiskProductCache.refresh`` picks up new inputs the next request writes under
+    a new directory and the previous version's tiles for that basin are removed.
+    The projected, indexed risk map of recent versions is kept in memory.
+    """
+
+    def __init__(
+        self,
+        risk_cache: RiskProductCache,
+        root: Optional[Path] = None,
+        kind: str = "risk-map",
+        max_zoom: Optional[int] = None,
+        simplify: Optional[float] = None,
+        max_layers: int = 8,
+    ) -> None:
+        settings = get_settings()
+        self.risk_cache = risk_cache
+        self.kind = kind
+        self.root = Path(root or settings.data_root / "processed" / "tiles" / "risk")
+        self.max_zoom = settings.risk_tile_max_zoom if max_zoom is None else max_zoom
+        self.simplify = settings.risk_tile_simplify if simplify is None else simplify
+        self.max_layers = max(1, max_layers)
+        self.stats = TileCacheStats()
+        self._layers: "OrderedDict[str, TileLayer]" = OrderedDict()
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def in_range(self, z: int, x: int, y: int) -> bool:
+        return 0 <= z <= self.max_zoom and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+    def get(self, basin_id: str, z: int, x: int, y: int) -> VectorTile:
+        """Tile bytes for the basin's current risk version (CPU/disk bound; call from a worker thread)."""
+
+        if not self.in_range(z, x, y):
+            raise ValueError(f"tile {z}/{x}/{y} outside zoom 0-{self.max_zoom}")
+        version, frame = self.risk_cache.risk_map(basin_id, self.kind)
+        key = self._track_version(basin_id, version)
+        path = self._path(basin_id, key, z, x, y)
+        try:
+            body = path.read_bytes()
+        except FileNotFoundError:
+            pass
+        else:
+            self.stats.hits += 1
+            return VectorTile(body, version, key)
+
+        layer = self._layer(version, frame)
+        if not layer.overlaps(z, x, y):
+            self.stats.empty += 1
+            return VectorTile(b"", version, key)
+        started = time.perf_counter()
+        body = layer.tile(z, x, y, simplify=self.simplify)
+        self.stats.builds += 1
+        if body:
+            self._store(path, body)
+        else:
+            self.stats.empty += 1
+        self.stats.last_build_seconds = time.perf_counter() - started
+        return VectorTile(body, version, key)
+
+    def metrics(self) -> dict:
+        data = asdict(self.stats)
+        data["layers"] = len(self._layers)
+        return data
+
+    def _layer(self, version: str, frame: gpd.GeoDataFrame) -> TileLayer:
+        with self._lock:
+            layer = self._layers.get(version)
+            if layer is not None:
+                self._layers.move_to_end(version)
+                return layer
+        layer = TileLayer.from_frame(frame)
+        with self._lock:
+            self._layers[version] = layer
+            while len(self._layers) > self.max_layers:
+                self._layers.popitem(last=False)
+        return layer
+
+    def _key(self, version: str) -> str:
+        return f"{version[:32]}-s{self.simplify:g}"
+
+    def _track_version(self, basin_id: str, version: str) -> str:
+        """Drop other versions' tiles the first time a basin is seen at ``version``; returns its key."""
+
+        key = self._key(version)
+        with self._lock:
+            if self._versions.get(basin_id) == key:
+                return key
+            self._versions[basin_id] = key
+        basin_dir = self.root / _safe(basin_id)
+        if basin_dir.is_dir():
+            for stale in basin_dir.iterdir():
+                if stale.name != key:
+                    shutil.rmtree(stale, ignore_errors=True)
+                    self.stats.invalidations += 1
+                    log.info("Removed risk tiles of basin %s (%s)", basin_id, stale.name[:12])
+        return key
+
+    def _path(self, basin_id: str, key: str, z: int, x: int, y: int) -> Path:
+        return self.root / _safe(basin_id) / key / str(z) / str(x) / f"{y}.mvt"
+
+    @staticmethod
+    def _store(path: Path, body: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(body)
+        tmp_path.replace(path)
+
+
+def _safe(value: str) -> str:
+    return _UNSAFE.sub("_", value) or "_"
+
+
+def lonlat_to_tile(longitude: float, latitude: float, z: int) -> Tuple[int, int]:
+    """XYZ tile containing a WGS84 point."""
+
+    latitude = max(min(latitude, 85.05112878), -85.05112878)
+    n = 1 << z
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+__all__ = [
+    "MVT_MEDIA_TYPE",
+    "RiskTileCache",
+    "TileLayer",
+    "VectorTile",
+    "encode_layer",
+    "lonlat_to_tile",
+    "tile_bounds",
+]
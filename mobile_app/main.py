@@ -4,12 +4,13 @@ from __future__ import annotations
 
 from pathlib import Path
 
-import httpx
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from shared.http_client import close_shared_client, get_shared_client
+
 
 def create_mobile_app(api_url: str = "http://localhost:8000") -> FastAPI:
     app = FastAPI(title="Hyperlocal Mobile Companion")
@@ -18,6 +19,10 @@ def create_mobile_app(api_url: str = "http://localhost:8000") -> FastAPI:
     static_dir.mkdir(exist_ok=True)
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        await close_shared_client()
+
     @app.get("/", response_class=HTMLResponse)
     async def index(request: Request) -> HTMLResponse:
         return templates.TemplateResponse("index.html", {"request": request})
@@ -25,10 +30,9 @@ def create_mobile_app(api_url: str = "http://localhost:8000") -> FastAPI:
     @app.get("/forecast")
     async def forecast(lat: float, lon: float):
         payload = {"latitude": lat, "longitude": lon, "horizon_hours": 48}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{api_url}/forecast", json=payload)
-            response.raise_for_status()
-            return response.json()
+        response = await get_shared_client().post(f"{api_url}/forecast", json=payload)
+        response.raise_for_status()
+        return response.json()
 
     return app
 
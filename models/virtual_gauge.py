@@ -5,12 +5,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
 import numpy as np
 import pandas as pd
 import xarray as xr
 
+from shared.zonal_stats import ZonalStatsEngine, ZonalWeights, Zones
+
 
 @dataclass
 class GaugeCalibration:
@@ -22,8 +24,17 @@ class GaugeCalibration:
 class VirtualGauge:
     """Estimate river discharge from remote sensing precipitation inputs."""
 
-    def __init__(self, calibration: Optional[GaugeCalibration] = None) -> None:
+    def __init__(self, calibration: Optional[GaugeCalibration] = None, engine: Optional[ZonalStatsEngine] = None) -> None:
         self.calibration = calibration or GaugeCalibration(slope=1.0, intercept=0.0, last_updated=datetime.utcnow())
+        self._engine = engine
+
+    @property
+    def engine(self) -> ZonalStatsEngine:
+        """Zonal statistics engine kept for the gauge's lifetime so its weight cache is reused."""
+
+        if self._engine is None:
+            self._engine = ZonalStatsEngine()
+        return self._engine
 
     def estimate_discharge(self, rainfall_ds: xr.Dataset, catchment_mask: xr.DataArray) -> pd.Series:
         rainfall = rainfall_ds["forecast"].mean(dim="variable")
@@ -34,6 +45,27 @@ class VirtualGauge:
         calibrated.name = "discharge_cms"
         return calibrated
 
+    def estimate_catchment_discharge(
+        self,
+        rainfall: Union[xr.Dataset, xr.DataArray],
+        catchments: Union[Zones, ZonalWeights],
+        engine: Optional[ZonalStatsEngine] = None,
+        id_column: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Calibrated discharge for many catchments at once (time x catchment).
+
+        Areal rainfall comes from ``engine`` (the gauge's own engine by default;
+        fractional-coverage sparse weights cached per grid), so all catchments are
+        reduced in one matrix product.
+        """
+
+        if isinstance(rainfall, xr.Dataset):
+            rainfall = rainfall["forecast"].mean(dim="variable")
+        engine = engine or self.engine
+        areal = engine.areal_mean(rainfall, catchments, id_column=id_column)
+        discharge = areal.transpose(..., "zone").to_pandas().fillna(0.0)
+        return self.calibration.slope * discharge + self.calibration.intercept
+
     def update_calibration(self, observed: pd.Series, simulated: pd.Series) -> None:
         if len(observed) != len(simulated):
             raise ValueError("Observed and simulated series must align")
@@ -0,0 +1,124 @@
+"""Per-point cost of forecasts: one POST /forecast per point vs. a single POST /forecast/batch.
+
+The API runs in-process over httpx's ASGI transport. Open-Meteo is simulated by a
+mock transport that answers after ``--upstream-ms`` (one round trip, whatever the
+number of coordinates). The forecast cache is cleared before each run so both
+paths start cold; ``--duplicates`` of the points repeat an earlier grid cell, as
+dashboard tiles and nearby assets do.
+
+    python scripts/bench_forecast_batch.py --points 300 --upstream-ms 80
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+
+from ingestion.weather_ingest import WeatherIngestor  # noqa: E402
+from shared.config import get_settings  # noqa: E402
+
+HEADERS = {"x-api-key": "bench-key"}
+HOURS = 168
+
+
+def _upstream(delay: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        lats = request.url.params["latitude"].split(",")
+        body = [
+            {
+                "hourly": {
+                    "time": [1714521600 + hour * 3600 for hour in range(HOURS)],
+                    "temperature_2m": [28.0] * HOURS,
+                    "precipitation": [0.4] * HOURS,
+                    "windspeed_10m": [3.0] * HOURS,
+                }
+            }
+            for _ in lats
+        ]
+        return httpx.Response(200, json=body if len(body) > 1 else body[0])
+
+    return httpx.MockTransport(handler)
+
+
+def _points(count: int, duplicates: float) -> list:
+    rng = random.Random(0)
+    points = []
+    for _ in range(count):
+        if points and rng.random() < duplicates:
+            lat, lon = rng.choice(points)
+            points.append((lat + 0.001, lon + 0.001))
+        else:
+            points.append((round(rng.uniform(5.9, 9.8), 4), round(rng.uniform(79.7, 81.9), 4)))
+    return points
+
+
+async def _run(args: argparse.Namespace) -> None:
+    from api.main import app, on_shutdown, on_startup
+
+    await on_startup()
+    upstream = httpx.AsyncClient(transport=_upstream(args.upstream_ms / 1000))
+    app.state.weather_ingestor = WeatherIngestor(http_client=upstream)
+    points = _points(args.points, args.duplicates)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+            async def single() -> None:
+                for lat, lon in points:
+                    response = await client.post("/forecast", json={"latitude": lat, "longitude": lon, "horizon_hours": HOURS}, headers=HEADERS)
+                    response.raise_for_status()
+
+            async def batch() -> None:
+                body = {"points": [{"latitude": lat, "longitude": lon} for lat, lon in points], "horizon_hours": HOURS}
+                response = await client.post("/forecast/batch", json=body, headers=HEADERS)
+                response.raise_for_status()
+                assert response.json()["count"] == len(points)
+
+            async def streamed() -> None:
+                body = {"points": [{"latitude": lat, "longitude": lon} for lat, lon in points], "horizon_hours": HOURS, "stream": True}
+                async with client.stream("POST", "/forecast/batch", json=body, headers=HEADERS) as response:
+                    lines = [line async for line in response.aiter_lines() if line]
+                assert len(lines) == len(points)
+
+            for label, run in (("POST /forecast x N", single), ("POST /forecast/batch", batch), ("POST /forecast/batch stream", streamed)):
+                app.state.weather_ingestor.cache.clear()
+                started = time.perf_counter()
+                await run()
+                elapsed = time.perf_counter() - started
+                print(f"{label:>28}: {elapsed:7.2f} s total, {elapsed / len(points) * 1000:8.2f} ms/point")
+    finally:
+        await app.state.weather_ingestor.close()
+        await on_shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=300)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="Fraction of points that repeat an earlier grid cell")
+    parser.add_argument("--upstream-ms", type=float, default=80.0)
+    args = parser.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    os.environ.setdefault("DATA_ROOT", str(tmp))
+    os.environ.setdefault("LOGS_DIR", str(tmp))
+    os.environ["API_KEYS"] = '["bench-key"]'
+    os.environ["PREFETCH_ENABLED"] = "false"
+    get_settings.cache_clear()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
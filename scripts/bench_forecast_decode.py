@@ -0,0 +1,99 @@
+"""Micro-benchmark the Open-Meteo payload decoder against the previous implementation.
+
+Builds a multi-location 16-day hourly payload in memory and times parsing plus
+decoding into an ``xarray.Dataset`` for both the legacy path (``json`` +
+per-timestamp ``np.datetime64`` + ``vstack``) and ``WeatherIngestor``'s bulk decoder.
+
+    python scripts/bench_forecast_decode.py --locations 200 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+import xarray as xr  # noqa: E402
+
+from ingestion import weather_ingest  # noqa: E402
+from shared import jsonio  # noqa: E402
+from shared.config import get_settings  # noqa: E402
+
+VARIABLES = ["temperature_2m", "precipitation", "windspeed_10m"]
+
+
+def _payload(locations: int, hours: int, unixtime: bool) -> bytes:
+    start = np.datetime64("2024-01-01T00:00")
+    steps = start + np.arange(hours) * np.timedelta64(1, "h")
+    if unixtime:
+        times = steps.astype("datetime64[s]").astype("int64").tolist()
+    else:
+        times = [str(step) for step in steps]
+    rng = np.random.default_rng(0)
+    body = [
+        {"hourly": {"time": times, **{var: np.round(rng.random(hours) * 10, 2).tolist() for var in VARIABLES}}}
+        for _ in range(locations)
+    ]
+    return json.dumps(body).encode("utf-8")
+
+
+def _legacy_decode(content: bytes) -> list:
+    datasets = []
+    for payload in json.loads(content):
+        hourly = payload.get("hourly", {})
+        time_values = hourly.get("time") or []
+        coords = {"time": np.array([np.datetime64(t) for t in time_values]), "variable": np.array(VARIABLES)}
+        array = np.vstack([hourly.get(var, [np.nan] * len(time_values)) for var in VARIABLES])
+        datasets.append(xr.Dataset({"forecast": (("variable", "time"), array)}, coords=coords))
+    return datasets
+
+
+def _timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--hours", type=int, default=16 * 24)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("DATA_ROOT", tmp)
+    os.environ.setdefault("LOGS_DIR", tmp)
+    get_settings.cache_clear()
+    ingestor = weather_ingest.WeatherIngestor(variables=VARIABLES)
+
+    iso_payload = _payload(args.locations, args.hours, unixtime=False)
+    unix_payload = _payload(args.locations, args.hours, unixtime=True)
+    cases = {
+        "legacy (iso)": lambda: _legacy_decode(iso_payload),
+        "bulk (iso)": lambda: ingestor._dataset_from_batch_payload(jsonio.loads(iso_payload)),
+        "bulk (unixtime)": lambda: ingestor._dataset_from_batch_payload(jsonio.loads(unix_payload)),
+    }
+    parser_name = "orjson" if jsonio.orjson is not None else "json"
+    print(f"{args.locations} locations x {args.hours} h x {len(VARIABLES)} variables, {len(iso_payload) / 1e6:.1f} MB; parser={parser_name}")
+    baseline = None
+    for label, func in cases.items():
+        elapsed = _timed(func, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{label:>16}: {elapsed * 1000:8.1f} ms  ({baseline / elapsed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
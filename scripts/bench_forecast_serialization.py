@@ -0,0 +1,89 @@
+"""Benchmark /forecast serialization: per-hour pydantic models vs. the columnar fast path.
+
+"legacy" is the previous ``dataset_to_forecast_response`` (a ``WeatherPoint`` per
+hour with ``variables.index`` lookups) followed by FastAPI's ``jsonable_encoder``
+and ``JSONResponse``. "rows" and "columns" are ``forecast_payload`` rendered by
+``fast_json_response`` in the two layouts. Times are per response body.
+
+    python scripts/bench_forecast_serialization.py --repeat 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import xarray as xr  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from api import models  # noqa: E402
+from api.utils import COLUMNS, ROWS, fast_json_response, forecast_payload  # noqa: E402
+
+
+def _dataset(hours: int) -> xr.Dataset:
+    times = pd.date_range("2024-05-01", periods=hours, freq="h")
+    data = np.random.default_rng(0).random((3, hours), dtype=np.float32) * 30
+    dataset = xr.Dataset(
+        {"forecast": (("variable", "time"), data)},
+        coords={"variable": ["temperature_2m", "precipitation", "windspeed_10m"], "time": times},
+    )
+    dataset.attrs["source"] = "open-meteo"
+    return dataset
+
+
+def _legacy(dataset: xr.Dataset, latitude: float, longitude: float) -> bytes:
+    weather_points = []
+    forecast_data = dataset["forecast"].values
+    times = dataset.coords["time"].values
+    variables = list(dataset.coords["variable"].values)
+    for idx, stamp in enumerate(times):
+        entry = {var: float(forecast_data[variables.index(var)][idx]) for var in variables}
+        weather_points.append(
+            models.WeatherPoint(
+                time=np.datetime64(stamp).astype("datetime64[s]").tolist(),
+                temperature_c=entry.get("temperature_2m", 0.0),
+                precipitation_mm=entry.get("precipitation", 0.0),
+                windspeed_ms=entry.get("windspeed_10m", 0.0),
+            )
+        )
+    response = models.ForecastResponse(location=(latitude, longitude), hourly=weather_points, source=str(dataset.attrs.get("source")))
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def _timed(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = func()
+    assert body
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for label, hours in (("168 h (7 days)", 168), ("384 h (16 days)", 384)):
+        dataset = _dataset(hours)
+        cases = [
+            ("legacy", lambda: _legacy(dataset, 6.9, 79.8)),
+            ("rows", lambda: fast_json_response(forecast_payload(dataset, 6.9, 79.8, hours, ROWS)).body),
+            ("columns", lambda: fast_json_response(forecast_payload(dataset, 6.9, 79.8, hours, COLUMNS)).body),
+        ]
+        results = {name: (_timed(func, args.repeat), len(func())) for name, func in cases}
+        baseline = results["legacy"][0]
+        for name, (seconds, size) in results.items():
+            print(f"{label:>16} {name:>8}: {seconds * 1e6:9.0f} us/response ({baseline / seconds:5.1f}x), {size / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark GeoJSON encoding of risk layers: per-row pydantic vs. the vectorised encoder.
+
+For each ``--sizes`` entry a grid of risk polygons (``exposure_index``,
+``flood_probability``, ``population_density``, ``risk_level``) is encoded with
+the previous ``iterrows`` + ``GeoJSONFeature`` path (up to ``--legacy-max``
+features, it needs about a millisecond per feature), with
+``geojson_feature_collection`` joined into one body, and streamed chunk by chunk.
+Peak memory is measured with ``tracemalloc`` in separate passes.
+
+    python scripts/bench_geojson.py --sizes 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import geopandas as gpd  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import shapely  # noqa: E402
+
+from api import models  # noqa: E402
+from api.utils import geojson_feature_collection  # noqa: E402
+
+
+def _risk_map(size: int) -> gpd.GeoDataFrame:
+    rng = np.random.default_rng(0)
+    cells = int(np.ceil(np.sqrt(size)))
+    x, y = np.divmod(np.arange(size), cells)
+    step = 0.6 / cells
+    geometry = shapely.box(79.85 + x * step, 6.85 + y * step, 79.85 + (x + 1) * step, 6.85 + (y + 1) * step)
+    exposure = rng.random(size)
+    return gpd.GeoDataFrame(
+        {
+            "flood_probability": rng.random(size),
+            "population_density": rng.integers(10, 2000, size),
+            "exposure_index": exposure,
+            "risk_level": pd.cut(exposure, [0, 1 / 3, 2 / 3, 1], labels=["low", "medium", "high"], include_lowest=True),
+        },
+        geometry=geometry,
+        crs="EPSG:4326",
+    )
+
+
+def _legacy(frame: gpd.GeoDataFrame) -> bytes:
+    features = [
+        models.GeoJSONFeature(geometry=row.geometry.__geo_interface__, properties=row.drop(labels="geometry").to_dict())
+        for _, row in frame.iterrows()
+    ]
+    return models.RiskMapResponse(features=features, generated_at=datetime.utcnow()).json(separators=(",", ":")).encode()
+
+
+def _joined(frame: gpd.GeoDataFrame) -> bytes:
+    return b"".join(geojson_feature_collection(frame, generated_at=datetime.utcnow().isoformat()))
+
+
+def _streamed(frame: gpd.GeoDataFrame, chunk_features: int) -> tuple:
+    started = time.perf_counter()
+    first = None
+    total = 0
+    for chunk in geojson_feature_collection(frame, chunk_features, generated_at=datetime.utcnow().isoformat()):
+        if first is None and total:
+            first = time.perf_counter() - started
+        total += len(chunk)
+    return first, time.perf_counter() - started, total
+
+
+def _peak_mib(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000)
+    parser.add_argument("--chunk-features", type=int, default=10000)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        frame = _risk_map(size)
+        print(f"{size} features")
+        if size <= args.legacy_max:
+            started = time.perf_counter()
+            body = _legacy(frame)
+            print(f"{'iterrows + pydantic':>24}: {time.perf_counter() - started:8.2f} s  {len(body) / 2**20:7.1f} MiB")
+        else:
+            print(f"{'iterrows + pydantic':>24}: skipped (> --legacy-max)")
+        started = time.perf_counter()
+        body = _joined(frame)
+        print(f"{'vectorised, one body':>24}: {time.perf_counter() - started:8.2f} s  {len(body) / 2**20:7.1f} MiB")
+        del body
+        first, elapsed, total = _streamed(frame, args.chunk_features)
+        print(f"{'vectorised, streamed':>24}: {elapsed:8.2f} s  {total / 2**20:7.1f} MiB, first chunk after {first * 1000:.0f} ms")
+        joined_peak = _peak_mib(lambda: _joined(frame))
+        streamed_peak = _peak_mib(lambda: _streamed(frame, args.chunk_features))
+        print(f"{'peak memory':>24}: one body {joined_peak:.0f} MiB, streamed {streamed_peak:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark risk-map requests: rebuilding per request vs. the versioned RiskProductCache.
+
+Builds a ``--cells`` x ``--cells`` hazard grid overlaid with a shifted vulnerability
+grid, then times the previous per-request path (``build_risk_map`` + GeoJSON +
+pydantic serialization), a cold cache fill, a warm hit, a ``refresh`` with
+unchanged inputs, and a 304 revalidation through ``cached_body_response``.
+
+    python scripts/bench_risk_cache.py --cells 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+from datetime import datetime
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import geopandas as gpd  # noqa: E402
+import numpy as np  # noqa: E402
+from shapely.geometry import box  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from api import models  # noqa: E402
+from api.utils import cached_body_response, geo_dataframe_to_geojson_features  # noqa: E402
+from layers.mapping import RiskLayerConfig, build_risk_map  # noqa: E402
+from layers.risk_cache import RiskInputs, RiskProduct, RiskProductCache  # noqa: E402
+
+
+def _inputs(cells: int) -> RiskInputs:
+    rng = np.random.default_rng(0)
+    size = 0.1
+    hazard_boxes = [box(x * size, y * size, (x + 1) * size, (y + 1) * size) for x in range(cells) for y in range(cells)]
+    vulnerability_boxes = [box(x * size + size / 2, y * size, (x + 1) * size + size / 2, (y + 1) * size) for x in range(cells) for y in range(cells)]
+    hazard = gpd.GeoDataFrame({"flood_probability": rng.random(len(hazard_boxes)), "geometry": hazard_boxes}, crs="EPSG:4326")
+    vulnerability = gpd.GeoDataFrame({"population_density": rng.integers(10, 2000, len(vulnerability_boxes)), "geometry": vulnerability_boxes}, crs="EPSG:4326")
+    return RiskInputs(hazard, [vulnerability], RiskLayerConfig(["flood_probability"], ["population_density"]))
+
+
+def _render(basin_id: str, risk: gpd.GeoDataFrame) -> bytes:
+    features = list(geo_dataframe_to_geojson_features(risk))
+    return models.RiskMapResponse(features=features, generated_at=datetime.utcnow()).json(separators=(",", ":")).encode()
+
+
+def _request(headers: dict) -> Request:
+    raw = [(key.lower().encode(), value.encode()) for key, value in headers.items()]
+    return Request({"type": "http", "method": "POST", "path": "/risk-map", "headers": raw, "query_string": b""})
+
+
+def _timed(func, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    inputs = _inputs(args.cells)
+    cache = RiskProductCache([RiskProduct("risk-map", lambda basin: inputs, _render)])
+    uncached = _timed(lambda: _render("bench", build_risk_map(inputs.hazard, inputs.vulnerability, inputs.config)))
+
+    def cache_response(headers: dict):
+        body = cache.peek("bench", "risk-map") or cache.get("bench", "risk-map")
+        return cached_body_response(_request(headers), body)
+
+    cold = _timed(lambda: cache_response({}))
+    entry = cache.peek("bench", "risk-map")
+
+    warm = _timed(lambda: cache_response({"accept-encoding": "gzip"}), args.repeat)
+    revalidate = _timed(lambda: cache_response({"if-none-match": entry.gzip_etag}), args.repeat)
+    refresh = _timed(lambda: cache.refresh("bench"))
+    print(f"{len(inputs.hazard)} hazard x {len(inputs.vulnerability[0])} vulnerability polygons; body {len(entry.body) / 1024:.0f} KiB, gzip {len(entry.gzip_body) / 1024:.0f} KiB")
+    print(f"{'rebuild per request':>24}: {uncached * 1000:10.2f} ms")
+    print(f"{'cold cache fill':>24}: {cold * 1000:10.2f} ms")
+    print(f"{'warm hit (gzip body)':>24}: {warm * 1000:10.4f} ms")
+    print(f"{'304 revalidation':>24}: {revalidate * 1000:10.4f} ms")
+    print(f"{'refresh, inputs same':>24}: {refresh * 1000:10.2f} ms (hash only)")
+
+
+if __name__ == "__main__":
+    main()
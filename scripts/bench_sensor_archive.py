@@ -0,0 +1,85 @@
+"""Throughput of sensor message persistence: per-message writes vs. the group-commit archive.
+
+Synthetic ``paho.mqtt.client.MQTTMessage`` objects are pushed through
+``SensorMQTTIngestor._handle_message`` exactly as the paho network thread would.
+"legacy" reproduces the previous ``_persist`` (one JSON file plus reopening the
+NDJSON log per message); "archive" uses the writer thread. Reported rates are
+messages/sec on the calling (network) thread and end-to-end until durable.
+
+    python scripts/bench_sensor_archive.py --messages 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import paho.mqtt.client as mqtt  # noqa: E402
+
+from ingestion.sensor_archive import SensorArchiveWriter  # noqa: E402
+from ingestion.sensor_mqtt import SensorMessage, SensorMQTTIngestor  # noqa: E402
+from shared.config import get_settings  # noqa: E402
+
+
+def _messages(count: int) -> list:
+    messages = []
+    for index in range(count):
+        message = mqtt.MQTTMessage(topic=f"sensors/station-{index % 200}/level".encode())
+        message.payload = json.dumps({"sensor_id": f"station-{index % 200}", "water_level": 1.5 + index % 7 * 0.1, "seq": index}).encode()
+        messages.append(message)
+    return messages
+
+
+def _legacy_persist(ingestor: SensorMQTTIngestor, message: SensorMessage) -> None:
+    timestamp = message.received_at.strftime("%Y%m%dT%H%M%S%f")
+    path = ingestor.persist_dir / f"{timestamp}.json"
+    path.write_text(json.dumps({"topic": message.topic, "payload": message.payload}))
+    record = {"topic": message.topic, "received_at": message.received_at.isoformat(), "payload": message.payload}
+    with ingestor.log_path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record) + "\n")
+
+
+def _run(label: str, messages: list, directory: pathlib.Path, legacy: bool) -> None:
+    archive = SensorArchiveWriter(directory)
+    ingestor = SensorMQTTIngestor(persist_dir=directory, archive=archive)
+    if legacy:
+        ingestor._persist = lambda message: _legacy_persist(ingestor, message)  # type: ignore[method-assign]
+    else:
+        archive.start()
+    started = time.perf_counter()
+    for message in messages:
+        ingestor._handle_message(None, None, message)
+    handled = time.perf_counter() - started
+    archive.stop()
+    durable = time.perf_counter() - started
+    count = len(messages)
+    files = sum(1 for _ in directory.iterdir())
+    print(f"{label:>8}: {count / handled:10.0f} msg/s on network thread, {count / durable:10.0f} msg/s durable, {files} files")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    os.environ.setdefault("DATA_ROOT", str(tmp))
+    os.environ.setdefault("LOGS_DIR", str(tmp))
+    get_settings.cache_clear()
+    messages = _messages(args.messages)
+    print(f"{args.messages} messages")
+    _run("legacy", messages, tmp / "legacy", legacy=True)
+    _run("archive", messages, tmp / "archive", legacy=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Sensor readings/sec through one API worker: POST /sensor per reading vs. POST /sensor/batch.
+
+Drives the FastAPI app in-process over httpx's ASGI transport (one event loop, i.e.
+one uvicorn worker, without socket overhead), with the archive writer and rolling
+aggregator running as in production. Batches are sent both as a JSON array and as
+NDJSON.
+
+    python scripts/bench_sensor_batch.py --readings 50000 --batch-size 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+
+from shared.config import get_settings  # noqa: E402
+
+HEADERS = {"x-api-key": "bench-key"}
+
+
+def _readings(count: int) -> list:
+    return [
+        {"topic": f"sensors/station-{index % 200}", "payload": {"water_level": 1.5 + index % 7 * 0.1, "rainfall": index % 3 * 0.2, "seq": index}}
+        for index in range(count)
+    ]
+
+
+async def _single(client: httpx.AsyncClient, readings: list) -> None:
+    for reading in readings:
+        response = await client.post("/sensor", json=reading, headers=HEADERS)
+        response.raise_for_status()
+
+
+def _bodies(readings: list, batch_size: int, ndjson: bool) -> list:
+    bodies = []
+    for offset in range(0, len(readings), batch_size):
+        chunk = readings[offset : offset + batch_size]
+        body = "\n".join(json.dumps(reading) for reading in chunk) if ndjson else json.dumps(chunk)
+        bodies.append((len(chunk), body.encode()))
+    return bodies
+
+
+async def _batched(client: httpx.AsyncClient, bodies: list, ndjson: bool) -> None:
+    headers = {**HEADERS, "content-type": "application/x-ndjson" if ndjson else "application/json"}
+    for count, body in bodies:
+        response = await client.post("/sensor/batch", content=body, headers=headers)
+        response.raise_for_status()
+        assert response.json()["accepted"] == count
+
+
+async def _run(args: argparse.Namespace) -> None:
+    from api.main import app, on_shutdown, on_startup
+
+    await on_startup()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            single = _readings(args.single_readings)
+            readings = _readings(args.readings)
+            as_json = _bodies(readings, args.batch_size, ndjson=False)
+            as_ndjson = _bodies(readings, args.batch_size, ndjson=True)
+            cases = [
+                ("POST /sensor (1 per request)", len(single), lambda: _single(client, single)),
+                (f"POST /sensor/batch JSON x{args.batch_size}", len(readings), lambda: _batched(client, as_json, False)),
+                (f"POST /sensor/batch NDJSON x{args.batch_size}", len(readings), lambda: _batched(client, as_ndjson, True)),
+            ]
+            for label, count, run in cases:
+                started = time.perf_counter()
+                await run()
+                elapsed = time.perf_counter() - started
+                print(f"{label:>36}: {count / elapsed:10.0f} readings/s ({count} in {elapsed:.2f} s)")
+    finally:
+        await on_shutdown()
+    print(f"archived: {app.state.sensor_ingestor.metrics()['archive']['messages']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=50000)
+    parser.add_argument("--single-readings", type=int, default=2000, help="Readings sent one per request")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    os.environ.setdefault("DATA_ROOT", str(tmp))
+    os.environ.setdefault("LOGS_DIR", str(tmp))
+    os.environ["API_KEYS"] = '["bench-key"]'
+    os.environ["PREFETCH_ENABLED"] = "false"
+    get_settings.cache_clear()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
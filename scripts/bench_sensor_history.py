@@ -0,0 +1,99 @@
+"""Benchmark sensor range queries: re-parsing NDJSON segments vs. the compacted Parquet history.
+
+Generates ``--days`` daily archive segments for ``--sensors`` stations reporting
+every ``--interval`` minutes, compacts them with ``SensorHistory`` and times a
+one-sensor/one-month query and a many-sensor/all-days single-column query.
+
+    python scripts/bench_sensor_history.py --days 90 --sensors 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from ingestion.sensor_archive import encode_record  # noqa: E402
+from ingestion.sensor_history import SensorHistory  # noqa: E402
+from ingestion.sensor_mqtt import SensorMessage  # noqa: E402
+from shared.config import get_settings  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def _write_segments(directory: pathlib.Path, days: int, sensors: int, interval: int) -> int:
+    directory.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    steps = 24 * 60 // interval
+    for day in range(days):
+        base = START + timedelta(days=day)
+        lines = []
+        for step in range(steps):
+            received = base + timedelta(minutes=step * interval)
+            for sensor in range(sensors):
+                payload = {"sensor_id": f"station-{sensor}", "water_level": 1.0 + (step % 50) / 100, "rainfall": step % 3 * 0.2, "battery": 3.7}
+                lines.append(encode_record(SensorMessage(topic=f"sensors/station-{sensor}", payload=payload, received_at=received)))
+        (directory / f"sensor_messages.{base:%Y%m%dT%H%M%S}000000.ndjson").write_bytes(b"".join(lines))
+        rows += len(lines)
+    return rows
+
+
+def _scan_ndjson(directory: pathlib.Path, sensors: set, start: datetime, end: datetime) -> int:
+    matched = 0
+    for path in sorted(directory.glob("sensor_messages.*.ndjson")):
+        with path.open("rb") as handle:
+            for line in handle:
+                record = json.loads(line)
+                if record["payload"].get("sensor_id") in sensors and start <= datetime.fromisoformat(record["received_at"]) <= end:
+                    matched += 1
+    return matched
+
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--sensors", type=int, default=100)
+    parser.add_argument("--interval", type=int, default=15, help="Minutes between readings")
+    args = parser.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    os.environ.setdefault("DATA_ROOT", str(tmp))
+    os.environ.setdefault("LOGS_DIR", str(tmp))
+    get_settings.cache_clear()
+    archive_dir = tmp / "sensors"
+    rows = _write_segments(archive_dir, args.days, args.sensors, args.interval)
+    history = SensorHistory(root=tmp / "history", archive_dir=archive_dir)
+    elapsed, _ = _timed(history.compact)
+    print(f"{rows} readings in {args.days} segments; compaction {elapsed:.1f} s")
+
+    month_end = START + timedelta(days=30)
+    all_end = START + timedelta(days=args.days)
+    many = [f"station-{index}" for index in range(0, args.sensors, 5)]
+    cases = [
+        ("1 sensor, 30 days", {"station-7"}, month_end, lambda: history.query(["station-7"], START, month_end)),
+        (f"{len(many)} sensors, {args.days} days, 1 col", set(many), all_end, lambda: history.query(many, START, all_end, columns=["water_level"])),
+    ]
+    for label, sensors, end, query in cases:
+        scan_time, expected = _timed(lambda: _scan_ndjson(archive_dir, sensors, START, end))
+        query_time, frame = _timed(query)
+        assert len(frame) == expected, (len(frame), expected)
+        print(f"{label:>32}: NDJSON scan {scan_time * 1000:9.1f} ms, Parquet {query_time * 1000:7.1f} ms ({len(frame)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark risk vector tiles against the single GeoJSON risk-map body.
+
+Builds a ``--cells`` x ``--cells`` grid of risk polygons (``risk_level`` and
+``exposure_index`` like ``build_risk_map`` output) over a basin-sized extent,
+then compares serialising the whole map as GeoJSON with cutting and encoding
+the tiles a client needs to view it at ``--zoom``, cold and from the disk cache.
+
+    python scripts/bench_vector_tiles.py --cells 300 --zoom 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import geopandas as gpd  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import shapely  # noqa: E402
+
+from api import models  # noqa: E402
+from api.utils import geo_dataframe_to_geojson_features  # noqa: E402
+from layers.vector_tiles import TileLayer, lonlat_to_tile  # noqa: E402
+
+BOUNDS = (79.85, 6.85, 80.45, 7.35)
+
+
+def _risk_map(cells: int) -> gpd.GeoDataFrame:
+    rng = np.random.default_rng(0)
+    minx, miny, maxx, maxy = BOUNDS
+    xs = np.linspace(minx, maxx, cells + 1)
+    ys = np.linspace(miny, maxy, cells + 1)
+    x0, y0 = np.meshgrid(xs[:-1], ys[:-1])
+    x1, y1 = np.meshgrid(xs[1:], ys[1:])
+    geometry = shapely.box(x0.ravel(), y0.ravel(), x1.ravel(), y1.ravel())
+    exposure = rng.random(len(geometry))
+    risk_level = pd.Categorical(pd.cut(exposure, [0, 1 / 3, 2 / 3, 1], labels=["low", "medium", "high"], include_lowest=True))
+    return gpd.GeoDataFrame({"exposure_index": exposure, "risk_level": risk_level}, geometry=geometry, crs="EPSG:4326")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=300)
+    parser.add_argument("--zoom", type=int, default=12)
+    args = parser.parse_args()
+
+    frame = _risk_map(args.cells)
+    started = time.perf_counter()
+    features = list(geo_dataframe_to_geojson_features(frame))
+    geojson = models.RiskMapResponse(features=features, generated_at=datetime.utcnow()).json(separators=(",", ":")).encode()
+    geojson_seconds = time.perf_counter() - started
+    print(f"{len(frame)} polygons; GeoJSON body {len(geojson) / 2**20:.1f} MiB in {geojson_seconds:.2f} s")
+
+    started = time.perf_counter()
+    layer = TileLayer.from_frame(frame)
+    print(f"{'project + index':>24}: {time.perf_counter() - started:8.2f} s (once per risk version)")
+
+    for zoom in sorted({max(args.zoom - 4, 0), args.zoom - 2, args.zoom}):
+        min_x, max_y = lonlat_to_tile(BOUNDS[0], BOUNDS[1], zoom)
+        max_x, min_y = lonlat_to_tile(BOUNDS[2], BOUNDS[3], zoom)
+        tiles = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+        cache = pathlib.Path(tempfile.mkdtemp())
+        started = time.perf_counter()
+        sizes = []
+        for x, y in tiles:
+            body = layer.tile(zoom, x, y)
+            (cache / f"{zoom}-{x}-{y}.mvt").write_bytes(body)
+            sizes.append(len(body))
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        for x, y in tiles:
+            (cache / f"{zoom}-{x}-{y}.mvt").read_bytes()
+        warm = time.perf_counter() - started
+        print(
+            f"{'z%d (%d tiles)' % (zoom, len(tiles)):>24}: cold {cold / len(tiles) * 1000:8.1f} ms/tile, disk hit {warm / len(tiles) * 1000:6.3f} ms/tile, "
+            f"{sum(sizes) / 2**20:6.2f} MiB total, largest {max(sizes) / 1024:6.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
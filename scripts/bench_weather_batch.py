@@ -0,0 +1,90 @@
+"""Benchmark batched Open-Meteo ingestion against one-request-per-point fetching.
+
+Runs entirely against a local ``httpx.MockTransport`` that mimics Open-Meteo
+(single and comma-separated multi-location responses) with a fixed per-request
+latency, so results reflect request fan-out rather than network conditions.
+
+    python scripts/bench_weather_batch.py --points 5000 --latency-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from ingestion.weather_ingest import WeatherIngestor  # noqa: E402
+from shared.config import get_settings  # noqa: E402
+
+HOURS = 16 * 24
+TIMES = [str(t) for t in np.datetime64("2024-01-01T00:00") + np.arange(HOURS) * np.timedelta64(1, "h")]
+
+
+def _location_body(lat: str) -> dict:
+    values = [float(lat)] * HOURS
+    return {
+        "latitude": float(lat),
+        "hourly": {"time": TIMES, "temperature_2m": values, "precipitation": values, "windspeed_10m": values},
+    }
+
+
+def _transport(latency: float, counter: dict) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        counter["requests"] += 1
+        await asyncio.sleep(latency)
+        lats = request.url.params["latitude"].split(",")
+        bodies = [_location_body(lat) for lat in lats]
+        return httpx.Response(200, json=bodies if len(bodies) > 1 else bodies[0])
+
+    return httpx.MockTransport(handler)
+
+
+async def _run(points, latency: float, batched: bool) -> tuple[float, int]:
+    counter = {"requests": 0}
+    client = httpx.AsyncClient(transport=_transport(latency, counter))
+    ingestor = WeatherIngestor(http_client=client)
+    ingestor.cache = None
+    started = time.perf_counter()
+    if batched:
+        await ingestor.fetch_many(points)
+    else:
+        # Previous ingest_many behaviour: one unbounded request per point.
+        await asyncio.gather(*(ingestor.fetch_forecast(lat, lon) for lat, lon in points))
+    elapsed = time.perf_counter() - started
+    await ingestor.close()
+    return elapsed, counter["requests"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("DATA_ROOT", tmp)
+    os.environ.setdefault("LOGS_DIR", tmp)
+    os.environ["WEATHER_PROVIDER"] = "open-meteo"
+    get_settings.cache_clear()
+
+    rng = np.random.default_rng(0)
+    points = [(float(lat), float(lon)) for lat, lon in zip(rng.uniform(-10, 10, args.points), rng.uniform(30, 40, args.points))]
+    latency = args.latency_ms / 1000
+    for label, batched in (("per-point", False), ("batched", True)):
+        elapsed, requests = asyncio.run(_run(points, latency, batched))
+        print(f"{label:>10}: {len(points) / elapsed:10.1f} points/s  {requests:6d} upstream requests  {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
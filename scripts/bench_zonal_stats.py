@@ -0,0 +1,96 @@
+"""Benchmark catchment areal rainfall: per-catchment masked mean vs. sparse zonal weights.
+
+The baseline mirrors ``VirtualGauge.estimate_discharge``: rasterise each catchment
+onto the grid, then ``rainfall.where(mask > 0).mean(...)`` over the full grid. The
+engine builds fractional-coverage weights once (cold) and then reduces every
+catchment for the whole time stack in one sparse product (warm).
+
+    python scripts/bench_zonal_stats.py --catchments 500 --days 90 --grid 400
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import xarray as xr  # noqa: E402
+from rasterio.features import rasterize  # noqa: E402
+from rasterio.transform import from_origin  # noqa: E402
+from shapely.geometry import Point, mapping  # noqa: E402
+
+from shared.zonal_stats import ZonalStatsEngine  # noqa: E402
+
+RESOLUTION = 0.05
+
+
+def _rainfall(grid: int, days: int) -> xr.DataArray:
+    lats = 10.0 - RESOLUTION * (np.arange(grid) + 0.5)
+    lons = 79.0 + RESOLUTION * (np.arange(grid) + 0.5)
+    rng = np.random.default_rng(0)
+    data = rng.gamma(0.6, 8.0, size=(days, grid, grid)).astype(np.float32)
+    return xr.DataArray(
+        data,
+        dims=("time", "latitude", "longitude"),
+        coords={"time": pd.date_range("2024-01-01", periods=days), "latitude": lats, "longitude": lons},
+    )
+
+
+def _catchments(count: int, grid: int) -> list:
+    rng = np.random.default_rng(1)
+    span = grid * RESOLUTION
+    centres = rng.uniform(0.1 * span, 0.9 * span, size=(count, 2))
+    radii = rng.uniform(0.1, 0.4, size=count)
+    return [Point(79.0 + x, 10.0 - y).buffer(r, quad_segs=8) for (x, y), r in zip(centres, radii)]
+
+
+def _masked_mean(rainfall: xr.DataArray, catchments: list, grid: int) -> np.ndarray:
+    transform = from_origin(79.0, 10.0, RESOLUTION, RESOLUTION)
+    results = []
+    for geometry in catchments:
+        mask = rasterize([(mapping(geometry), 1)], out_shape=(grid, grid), transform=transform)
+        catchment_mask = xr.DataArray(mask, dims=("latitude", "longitude"))
+        results.append(rainfall.where(catchment_mask > 0).mean(dim=("latitude", "longitude")).values)
+    return np.stack(results, axis=-1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--catchments", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--grid", type=int, default=400)
+    parser.add_argument("--baseline-limit", type=int, default=100, help="Catchments timed for the baseline (extrapolated)")
+    args = parser.parse_args()
+
+    rainfall = _rainfall(args.grid, args.days)
+    catchments = _catchments(args.catchments, args.grid)
+    print(f"{args.catchments} catchments, {args.days} days on a {args.grid}x{args.grid} grid")
+
+    sample = catchments[: min(args.baseline_limit, len(catchments))]
+    started = time.perf_counter()
+    _masked_mean(rainfall, sample, args.grid)
+    baseline = (time.perf_counter() - started) * len(catchments) / len(sample)
+
+    engine = ZonalStatsEngine(area_weighted=False)
+    started = time.perf_counter()
+    engine.areal_mean(rainfall, catchments)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    engine.areal_mean(rainfall, catchments)
+    warm = time.perf_counter() - started
+
+    suffix = " (extrapolated)" if len(sample) < len(catchments) else ""
+    print(f"{'masked mean':>22}: {baseline * 1000:10.1f} ms{suffix}")
+    print(f"{'sparse weights (cold)':>22}: {cold * 1000:10.1f} ms  ({baseline / cold:6.1f}x)")
+    print(f"{'sparse weights (warm)':>22}: {warm * 1000:10.1f} ms  ({baseline / warm:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,8 @@ import logging
 from pathlib import Path
 from typing import Iterable, Tuple
 
-import httpx
-
 from shared.config import get_settings
+from shared.http_client import close_shared_client, get_shared_client
 
 logger = logging.getLogger(__name__)
 
@@ -32,10 +31,10 @@ def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
 async def download_dataset(dataset: str, output: Path, bbox: Tuple[float, float, float, float] | None) -> Path:
     url = DATASETS[dataset]
     output.parent.mkdir(parents=True, exist_ok=True)
-    async with httpx.AsyncClient(timeout=120) as client:
-        # For complex APIs (e.g., Overpass) we would craft a query. Here we just persist instructions.
-        response = await client.get(url)
-        response.raise_for_status()
+    client = get_shared_client()
+    # For complex APIs (e.g., Overpass) we would craft a query. Here we just persist instructions.
+    response = await client.get(url, timeout=120)
+    response.raise_for_status()
     output.write_bytes(response.content)
     if bbox:
         metadata_path = output.with_suffix(".bbox.json")
@@ -54,7 +53,10 @@ async def main() -> None:
     default_dir = settings.data_root / "processed" / "exposure"
     target_path = Path(args.output) if args.output else default_dir / f"{args.dataset}.geojson"
     bbox = parse_bbox(args.bbox) if args.bbox else None
-    await download_dataset(args.dataset, target_path, bbox)
+    try:
+        await download_dataset(args.dataset, target_path, bbox)
+    finally:
+        await close_shared_client()
     logger.info("Dataset saved to %s", target_path)
 
 
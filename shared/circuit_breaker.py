@@ -0,0 +1,159 @@
+"""Per-provider circuit breaker with latency-adaptive timeouts."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+DEFAULT_KIND = "default"
+
+
+@dataclass
+class BreakerStats:
+    successes: int = 0
+    failures: int = 0
+    rejections: int = 0
+    trips: int = 0
+    probes: int = 0
+    released: int = 0
+
+
+class CircuitBreaker:
+    """Trip after consecutive failures, fail fast while open, probe to recover.
+
+    The timeout callers should use adapts to observed latency the way TCP sizes its
+    retransmission timer: ``smoothed + 4 * deviation`` of successful call latencies,
+    clamped to ``[min_timeout, max_timeout]``. Calls of different cost (a single
+    point versus a 50-point batch) keep separate estimates under their ``kind``;
+    a kind with no successes yet gets ``max_timeout``. After ``recovery_time`` seconds open,
+    a single probe call is let through (half-open); its success closes the circuit
+    and its failure re-opens it. A probe that reports neither (cancelled, or the
+    caller raised something unexpected) is given up after ``max_timeout`` so the
+    next call can probe instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        min_timeout: float = 2.0,
+        max_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_time = recovery_time
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._estimates: Dict[str, Tuple[float, float]] = {}  # kind -> (smoothed, deviation)
+        self.stats = BreakerStats()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._opened_at is not None and self._clock() - self._opened_at >= self.recovery_time:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; ``False`` means use the fallback."""
+
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and (not self._probe_in_flight or self._clock() - self._probe_started >= self.max_timeout):
+                self._probe_in_flight = True
+                self._probe_started = self._clock()
+                self.stats.probes += 1
+                return True
+            self.stats.rejections += 1
+            return False
+
+    def timeout(self, kind: str = DEFAULT_KIND) -> float:
+        """Adaptive per-call timeout in seconds for calls of ``kind``."""
+
+        with self._lock:
+            return self._timeout(kind)
+
+    def _timeout(self, kind: str) -> float:
+        estimate = self._estimates.get(kind)
+        if estimate is None:
+            return self.max_timeout
+        smoothed, deviation = estimate
+        return min(self.max_timeout, max(self.min_timeout, smoothed + 4 * deviation))
+
+    def record_success(self, latency: float, kind: str = DEFAULT_KIND) -> None:
+        with self._lock:
+            estimate = self._estimates.get(kind)
+            if estimate is None:
+                self._estimates[kind] = (latency, latency / 2)
+            else:
+                smoothed, deviation = estimate
+                self._estimates[kind] = (0.875 * smoothed + 0.125 * latency, 0.75 * deviation + 0.25 * abs(smoothed - latency))
+            self.stats.successes += 1
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self._state = CLOSED
+            self._opened_at = None
+
+    def release(self) -> None:
+        """Report a call that says nothing about upstream health, such as a 4xx for a bad request.
+
+        Neither a success nor a failure is counted; a half-open probe slot is freed
+        so the next call can probe.
+        """
+
+        with self._lock:
+            self.stats.released += 1
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.stats.failures += 1
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+                self.stats.trips += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            state = self._current_state()
+            latency = {
+                kind: {"smoothed_seconds": smoothed, "timeout_seconds": self._timeout(kind)}
+                for kind, (smoothed, _) in sorted(self._estimates.items())
+            }
+        return {
+            "state": state,
+            "latency": latency,
+            "consecutive_failures": self._consecutive_failures,
+            "successes": self.stats.successes,
+            "failures": self.stats.failures,
+            "rejections": self.stats.rejections,
+            "trips": self.stats.trips,
+            "probes": self.stats.probes,
+            "released": self.stats.released,
+        }
+
+
+__all__ = ["CircuitBreaker", "BreakerStats", "CLOSED", "OPEN", "HALF_OPEN", "DEFAULT_KIND"]
@@ -2,7 +2,7 @@
 
 from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 from pydantic import BaseSettings, Field, validator
 
@@ -22,18 +22,118 @@ class Settings(BaseSettings):
     )
     ecmwf_key: str = Field(default="", description="ECMWF CDS API key")
     ecmwf_email: str = Field(default="", description="ECMWF account email")
+    ecmwf_bulk_area: bool = Field(
+        default=True,
+        description="Fetch all points of a batch from one cached ERA5 area download",
+    )
+    ecmwf_interpolation: str = Field(
+        default="nearest",
+        description="Point extraction from ERA5 grids (nearest|bilinear)",
+    )
+    forecast_cache_size: int = Field(
+        default=4096,
+        description="Maximum cached forecast grid cells (0 disables the cache)",
+    )
+    forecast_grid_resolution: float = Field(
+        default=0.01,
+        description="Provider grid spacing in degrees used to snap cached forecast points",
+    )
+    forecast_update_interval_minutes: int = Field(
+        default=60,
+        description="Provider model update cadence; cached forecasts expire on each new run",
+    )
+    open_meteo_batch_size: int = Field(
+        default=50,
+        description="Locations packed into a single Open-Meteo request by WeatherIngestor.fetch_many",
+    )
+    open_meteo_forecast_days: int = Field(
+        default=16,
+        description="Days of hourly forecast requested from Open-Meteo (provider default 7, maximum 16; covers horizon_hours up to 384)",
+    )
+    weather_max_concurrency: int = Field(
+        default=4,
+        description="Maximum concurrent upstream weather requests issued by batch ingestion",
+    )
+    breaker_failure_threshold: int = Field(
+        default=5,
+        description="Consecutive weather provider failures before its circuit opens",
+    )
+    breaker_recovery_seconds: float = Field(
+        default=30.0,
+        description="Seconds a weather provider circuit stays open before a half-open probe",
+    )
+    breaker_min_timeout_seconds: float = Field(default=2.0, description="Lower bound of the adaptive request timeout")
+    breaker_max_timeout_seconds: float = Field(default=30.0, description="Upper bound of the adaptive request timeout")
+    prefetch_enabled: bool = Field(
+        default=False,
+        description="Run the forecast prefetch scheduler inside the API process",
+    )
+    prefetch_hotspots: List[Tuple[float, float]] = Field(
+        default_factory=list,
+        description="JSON list of [lat, lon] pairs kept warm by the prefetch scheduler",
+    )
+    prefetch_concurrency: int = Field(default=2, description="Targets refreshed concurrently per prefetch cycle")
+    prefetch_jitter_seconds: float = Field(default=60.0, description="Random delay added to each prefetch cycle")
+    prefetch_publish_delay_seconds: float = Field(
+        default=300.0,
+        description="Delay after a model-run boundary before the provider is expected to have published it",
+    )
+    prefetch_retry_seconds: float = Field(
+        default=30.0,
+        description="First retry delay of a target whose prefetch failed or got fallbacks; doubles per failure",
+    )
+    http_max_connections: int = Field(default=100, description="Shared HTTP pool: total connection limit")
+    http_max_keepalive_connections: int = Field(default=20, description="Shared HTTP pool: idle keep-alive connections")
+    http_keepalive_expiry: float = Field(default=30.0, description="Seconds an idle pooled connection is kept open")
+    http_http2: bool = Field(default=False, description="Negotiate HTTP/2 when the 'h2' package is installed")
+    http_per_host_limit: int = Field(default=20, description="Concurrent requests allowed per upstream host (0 = unlimited)")
+    http_timeout_seconds: float = Field(default=30.0, description="Default timeout for pooled HTTP requests")
     chirps_base_url: str = Field(
         default="https://data.chc.ucsb.edu/products/CHIRPS-2.0/",
         description="Base URL for CHIRPS downloads (HTTP/FTP endpoint)",
     )
     chirps_username: Optional[str] = Field(default=None, description="CHIRPS authenticated username")
     chirps_password: Optional[str] = Field(default=None, description="CHIRPS authenticated password")
+    chirps_backfill_workers: int = Field(default=4, description="Concurrent downloads during a CHIRPS backfill")
+    chirps_ftp_sessions: int = Field(default=2, description="Persistent FTP logins shared by backfill workers")
+    chirps_backfill_retries: int = Field(default=3, description="Retries per CHIRPS file on transient errors")
+    chirps_verify_checksums: bool = Field(default=False, description="Re-hash manifest entries before skipping a day")
+    chirps_datacube_time_chunk: int = Field(default=30, description="Days per chunk in the CHIRPS datacube")
+    chirps_datacube_space_chunk: int = Field(default=64, description="Grid cells per chunk edge in the CHIRPS datacube")
     mqtt_broker_url: str = Field(default="mqtt://localhost")
     mqtt_username: Optional[str] = None
     mqtt_password: Optional[str] = None
     mqtt_ca_cert: Optional[Path] = Field(default=None, description="Path to MQTT CA certificate")
     mqtt_client_cert: Optional[Path] = Field(default=None, description="Path to MQTT client certificate")
     mqtt_client_key: Optional[Path] = Field(default=None, description="Path to MQTT client private key")
+    sensor_archive_batch_size: int = Field(default=1000, description="Sensor messages per archive group commit")
+    sensor_archive_flush_seconds: float = Field(default=0.5, description="Maximum delay before buffered sensor messages are committed")
+    sensor_archive_segment_mb: float = Field(default=64.0, description="Rotate the sensor NDJSON archive after this many MB")
+    sensor_archive_compress: bool = Field(default=False, description="Gzip rotated sensor archive segments")
+    sensor_per_message_files: bool = Field(default=False, description="Also write one JSON file per sensor message (legacy)")
+    sensor_queue_maxsize: int = Field(default=10000, description="Sensor messages buffered for consumers before overflow")
+    sensor_queue_policy: str = Field(default="drop_oldest", description="Queue overflow policy: block, drop_oldest or drop_newest")
+    sensor_workers: int = Field(default=1, description="Sensor ingestion worker processes on the shared subscription")
+    sensor_share_group: str = Field(default="hyperlocal-ingest", description="MQTT shared subscription group name")
+    sensor_queue_block_timeout: float = Field(default=1.0, description="Seconds a producer waits for space under the 'block' policy")
+    sensor_aggregate_fields: List[str] = Field(
+        default_factory=lambda: ["water_level", "rainfall"],
+        description="JSON list of numeric payload fields kept in rolling-window aggregates",
+    )
+    sensor_aggregate_window_seconds: float = Field(default=3600.0, description="Longest rolling aggregate window in seconds")
+    sensor_aggregate_bucket_seconds: float = Field(default=60.0, description="Rolling aggregate bucket width (window resolution) in seconds")
+    sensor_aggregate_future_tolerance_seconds: float = Field(
+        default=300.0, description="How far ahead of the clock a reading's timestamp may be before aggregates reject it"
+    )
+    sensor_aggregate_state_path: Optional[Path] = Field(
+        default=None, description="File the sensor worker supervisor publishes merged aggregates to (default data/processed/sensor_aggregates.npz)"
+    )
+    sensor_batch_max_readings: int = Field(default=50000, description="Most readings accepted in one POST /sensor/batch request")
+    sensor_batch_max_bytes: int = Field(default=16 * 2**20, description="Largest POST /sensor/batch body in bytes; bigger bodies get 413 before parsing")
+    risk_cache_entries: int = Field(default=256, description="Cached (basin, product) risk bodies kept in memory")
+    risk_cache_recheck_seconds: float = Field(default=60.0, description="Seconds before a cached risk product re-hashes its inputs to pick up new data")
+    risk_tile_max_zoom: int = Field(default=16, description="Highest zoom served by /tiles/risk vector tiles")
+    risk_tile_simplify: float = Field(default=4.0, description="Risk tile simplification tolerance in tile units (4096 per tile edge)")
     database_url: str = Field(
         default="sqlite:///./data/processed/hyperlocal.db",
         description="Primary time-series database connection string",
@@ -79,7 +179,7 @@ class Settings(BaseSettings):
     def _expand_path(cls, value: Union[str, Path]) -> Path:
         return Path(value).expanduser().resolve()
 
-    @validator("mqtt_ca_cert", "mqtt_client_cert", "mqtt_client_key", pre=True)
+    @validator("mqtt_ca_cert", "mqtt_client_cert", "mqtt_client_key", "sensor_aggregate_state_path", pre=True)
     def _optional_path(cls, value: Optional[Union[str, Path]]) -> Optional[Path]:
         if value in (None, "", "null"):
             return None
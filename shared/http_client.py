@@ -0,0 +1,228 @@
+"""Shared, instrumented HTTP connection pool for all outbound traffic."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from shared.config import get_settings
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolMetrics:
+    requests: int = 0
+    errors: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    in_flight: int = 0
+    host_waits: int = 0
+    host_wait_seconds_total: float = 0.0
+    host_wait_seconds_max: float = 0.0
+    pool_wait_seconds_total: float = 0.0
+    pool_wait_seconds_max: float = 0.0
+    in_flight_by_host: Dict[str, int] = field(default_factory=dict)
+
+    def snapshot(self) -> dict:
+        data = asdict(self)
+        completed = self.new_connections + self.reused_connections
+        data["reuse_ratio"] = (self.reused_connections / completed) if completed else 0.0
+        data["pool_wait_seconds_avg"] = (self.pool_wait_seconds_total / self.requests) if self.requests else 0.0
+        data["in_flight_by_host"] = {host: count for host, count in self.in_flight_by_host.items() if count}
+        return data
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response stream that frees the per-host slot once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release) -> None:
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Transport wrapper adding per-host concurrency caps and pool metrics.
+
+    New vs. reused connections and time spent waiting for a pooled connection are
+    derived from httpcore's ``trace`` request extension; a per-host slot is held
+    until the response body is closed, so streaming downloads count against it.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, per_host_limit: int = 0, metrics: Optional[PoolMetrics] = None) -> None:
+        self._transport = transport
+        self.per_host_limit = per_host_limit
+        self.metrics = metrics or PoolMetrics()
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        metrics = self.metrics
+        slot = self._slot(host)
+        if slot is not None:
+            waited_from = time.perf_counter()
+            await slot.acquire()
+            waited = time.perf_counter() - waited_from
+            if waited > 0.001:
+                metrics.host_waits += 1
+            metrics.host_wait_seconds_total += waited
+            metrics.host_wait_seconds_max = max(metrics.host_wait_seconds_max, waited)
+
+        released = False
+
+        def _release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            metrics.in_flight -= 1
+            metrics.in_flight_by_host[host] = metrics.in_flight_by_host.get(host, 1) - 1
+            if slot is not None:
+                slot.release()
+
+        started = time.perf_counter()
+        timings = {"connect": 0.0, "connect_started": None, "headers": None, "connected": False}
+        previous_trace = request.extensions.get("trace")
+
+        async def _trace(event: str, info: dict) -> None:
+            now = time.perf_counter()
+            if event == "connection.connect_tcp.started":
+                timings["connected"] = True
+                timings["connect_started"] = now
+            elif event in ("connection.start_tls.complete", "connection.connect_tcp.complete") and timings["connect_started"]:
+                timings["connect"] = now - timings["connect_started"]
+            elif event.endswith("send_request_headers.started") and timings["headers"] is None:
+                timings["headers"] = now
+            if previous_trace is not None:
+                await previous_trace(event, info)
+
+        request.extensions = {**request.extensions, "trace": _trace}
+        metrics.requests += 1
+        metrics.in_flight += 1
+        metrics.in_flight_by_host[host] = metrics.in_flight_by_host.get(host, 0) + 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            metrics.errors += 1
+            _release()
+            raise
+
+        if timings["connected"]:
+            metrics.new_connections += 1
+        else:
+            metrics.reused_connections += 1
+        if timings["headers"] is not None:
+            wait = max(0.0, timings["headers"] - started - timings["connect"])
+            metrics.pool_wait_seconds_total += wait
+            metrics.pool_wait_seconds_max = max(metrics.pool_wait_seconds_max, wait)
+        if isinstance(response.stream, httpx.ByteStream):
+            # Fully buffered body (e.g. mock transports): nothing is held open.
+            _release()
+        else:
+            response.stream = _ReleasingStream(response.stream, _release)
+        return response
+
+    def _slot(self, host: str) -> Optional[asyncio.Semaphore]:
+        if self.per_host_limit <= 0:
+            return None
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return slot
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_metrics = PoolMetrics()
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client(**overrides) -> httpx.AsyncClient:
+    """Build an ``httpx.AsyncClient`` with the pool limits and caps from settings.
+
+    Keyword arguments override individual settings (``max_connections``,
+    ``max_keepalive_connections``, ``keepalive_expiry``, ``http2``,
+    ``per_host_limit``, ``timeout``).
+    """
+
+    settings = get_settings()
+    options = {
+        "max_connections": settings.http_max_connections,
+        "max_keepalive_connections": settings.http_max_keepalive_connections,
+        "keepalive_expiry": settings.http_keepalive_expiry,
+        "http2": settings.http_http2,
+        "per_host_limit": settings.http_per_host_limit,
+        "timeout": settings.http_timeout_seconds,
+    }
+    options.update(overrides)
+    http2 = bool(options["http2"])
+    if http2 and not _http2_available():
+        log.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=options["max_connections"],
+        max_keepalive_connections=options["max_keepalive_connections"],
+        keepalive_expiry=options["keepalive_expiry"],
+    )
+    transport = InstrumentedTransport(
+        httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+        per_host_limit=options["per_host_limit"],
+        metrics=_metrics,
+    )
+    return httpx.AsyncClient(transport=transport, timeout=options["timeout"])
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client, creating it on first use."""
+
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = create_http_client()
+    return _shared_client
+
+
+async def close_shared_client() -> None:
+    global _shared_client
+    if _shared_client is not None and not _shared_client.is_closed:
+        await _shared_client.aclose()
+    _shared_client = None
+
+
+def http_pool_metrics() -> dict:
+    """Connection reuse, pool wait and per-host in-flight counters."""
+
+    return _metrics.snapshot()
+
+
+__all__ = [
+    "InstrumentedTransport",
+    "PoolMetrics",
+    "create_http_client",
+    "get_shared_client",
+    "close_shared_client",
+    "http_pool_metrics",
+]
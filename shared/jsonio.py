@@ -0,0 +1,44 @@
+"""JSON encoding/decoding shared by the ingestion and API hot paths.
+
+``orjson`` (listed in requirements) is used when importable; the stdlib ``json``
+module is the fallback, so behaviour stays the same without it, only slower.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - fallback exercised when orjson is missing
+    orjson = None
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse a JSON document; raises ``ValueError`` (``JSONDecodeError``) on bad input."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def dumps(value: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Compact UTF-8 JSON bytes.
+
+    Values orjson rejects but the stdlib accepts (integers wider than 64 bits)
+    fall back to ``json.dumps``; ``TypeError`` is raised only when neither can
+    encode ``value``.
+    """
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=default)
+        except TypeError:
+            pass
+    return json.dumps(value, separators=(",", ":"), default=default).encode("utf-8")
+
+
+__all__ = ["dumps", "loads", "orjson"]
@@ -0,0 +1,60 @@
+"""In-flight request coalescing for asyncio callers."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    leaders: int = 0
+    coalesced: int = 0
+    failures: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """Run at most one upstream call per key; concurrent callers share its result.
+
+    The upstream call runs in its own task and every caller awaits it through
+    :func:`asyncio.shield`, so cancelling any caller (including the one that
+    started the call) never cancels the shared fetch. Errors propagate to every
+    waiter and the key is released as soon as the call settles, so the next
+    caller after a failure starts a fresh attempt.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, "asyncio.Task[T]"] = {}
+        self.stats = SingleFlightStats()
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._release(key, done))
+            self.stats.leaders += 1
+        else:
+            self.stats.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: "asyncio.Task[T]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved: every waiter may have been cancelled.
+        if not task.cancelled() and task.exception() is not None:
+            self.stats.failures += 1
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def snapshot(self) -> Dict[str, int]:
+        data = asdict(self.stats)
+        data["inflight"] = len(self._inflight)
+        return data
+
+
+__all__ = ["SingleFlight", "SingleFlightStats"]
@@ -0,0 +1,228 @@
+"""Sparse-weight zonal statistics for gridded rainfall over catchment polygons."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Hashable, List, Optional, Sequence, Tuple, Union
+
+import geopandas as gpd
+import numpy as np
+import shapely
+import xarray as xr
+from scipy import sparse
+
+Zones = Union[gpd.GeoDataFrame, gpd.GeoSeries, Sequence[shapely.Geometry]]
+
+
+@dataclass
+class ZonalWeights:
+    """``(zones, cells)`` sparse matrix of fractional cell coverage for one grid."""
+
+    matrix: sparse.csr_matrix
+    zone_ids: List[Hashable]
+    shape: Tuple[int, int]
+
+    @property
+    def coverage(self) -> np.ndarray:
+        """Number of (fractionally) covered cells per zone."""
+
+        return np.asarray(self.matrix.sum(axis=1)).ravel()
+
+
+def _edges(centres: np.ndarray) -> np.ndarray:
+    if len(centres) < 2:
+        raise ValueError("grid needs at least two cells along each axis")
+    step = np.diff(centres)
+    edges = np.empty(len(centres) + 1)
+    edges[1:-1] = centres[:-1] + step / 2
+    edges[0] = centres[0] - step[0] / 2
+    edges[-1] = centres[-1] + step[-1] / 2
+    return edges
+
+
+def coverage_weights(
+    geometries: Sequence[shapely.Geometry],
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    area_weighted: bool = True,
+) -> sparse.csr_matrix:
+    """Fraction of each grid cell covered by each geometry, as a CSR matrix.
+
+    Cells are the rectangles around the (regular or irregular) 1-D centre
+    coordinates, flattened row-major as ``lat * n_lon + lon``. Only cells inside a
+    geometry's bounding box are tested; cells wholly inside it get 1 without an
+    intersection. With ``area_weighted`` each weight is scaled by ``cos(lat)`` so
+    means approximate true areal means on a lat/lon grid.
+    """
+
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    lat_edges = _edges(latitudes)
+    lon_edges = _edges(longitudes)
+    lat_lo, lat_hi = np.minimum(lat_edges[:-1], lat_edges[1:]), np.maximum(lat_edges[:-1], lat_edges[1:])
+    lon_lo, lon_hi = np.minimum(lon_edges[:-1], lon_edges[1:]), np.maximum(lon_edges[:-1], lon_edges[1:])
+    row_scale = np.cos(np.deg2rad(latitudes)) if area_weighted else np.ones_like(latitudes)
+    n_lon = len(longitudes)
+
+    indptr = [0]
+    indices: List[np.ndarray] = []
+    values: List[np.ndarray] = []
+    for geometry in geometries:
+        if geometry is None or geometry.is_empty:
+            indptr.append(indptr[-1])
+            continue
+        min_x, min_y, max_x, max_y = geometry.bounds
+        rows = np.flatnonzero((lat_hi > min_y) & (lat_lo < max_y))
+        cols = np.flatnonzero((lon_hi > min_x) & (lon_lo < max_x))
+        if not len(rows) or not len(cols):
+            indptr.append(indptr[-1])
+            continue
+        grid_rows, grid_cols = np.meshgrid(rows, cols, indexing="ij")
+        grid_rows, grid_cols = grid_rows.ravel(), grid_cols.ravel()
+        boxes = shapely.box(lon_lo[grid_cols], lat_lo[grid_rows], lon_hi[grid_cols], lat_hi[grid_rows])
+        shapely.prepare(geometry)
+        fraction = shapely.contains_properly(geometry, boxes).astype(float)
+        partial = (fraction == 0) & shapely.intersects(geometry, boxes)
+        if partial.any():
+            clipped = shapely.area(shapely.intersection(boxes[partial], geometry))
+            fraction[partial] = clipped / shapely.area(boxes[partial])
+        keep = fraction > 0
+        weights = fraction[keep] * row_scale[grid_rows[keep]]
+        indices.append(grid_rows[keep] * n_lon + grid_cols[keep])
+        values.append(weights)
+        indptr.append(indptr[-1] + int(keep.sum()))
+
+    data = np.concatenate(values) if values else np.empty(0)
+    index = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+    return sparse.csr_matrix((data, index, np.asarray(indptr)), shape=(len(indptr) - 1, len(latitudes) * n_lon))
+
+
+class ZonalStatsEngine:
+    """Areal means for many zones over a gridded stack as one sparse matrix product.
+
+    Each set of zones is rasterised once per grid into a :class:`ZonalWeights`
+    matrix, cached in memory (LRU) and, with ``cache_dir``, on disk as ``.npz`` so
+    other processes reuse it. ``areal_mean`` then reduces every zone for every time
+    step with ``W @ data``; NaN cells are excluded per zone and time.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_cached: int = 32, area_weighted: bool = True) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_cached = max_cached
+        self.area_weighted = area_weighted
+        self._cache: "OrderedDict[str, ZonalWeights]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def weights(
+        self,
+        zones: Zones,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        id_column: Optional[str] = None,
+    ) -> ZonalWeights:
+        geometries, zone_ids = self._geometries(zones, id_column)
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        key = self._key(geometries, zone_ids, latitudes, longitudes)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        shape = (len(latitudes), len(longitudes))
+        matrix = self._load(key)
+        if matrix is None:
+            matrix = coverage_weights(geometries, latitudes, longitudes, area_weighted=self.area_weighted)
+            self.builds += 1
+            self._store(key, matrix)
+        result = ZonalWeights(matrix=matrix, zone_ids=zone_ids, shape=shape)
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return result
+
+    def areal_mean(
+        self,
+        data: xr.DataArray,
+        zones: Union[Zones, ZonalWeights],
+        id_column: Optional[str] = None,
+        lat_dim: str = "latitude",
+        lon_dim: str = "longitude",
+    ) -> xr.DataArray:
+        """Weighted mean of ``data`` per zone; spatial dims are replaced by ``zone``."""
+
+        if isinstance(zones, ZonalWeights):
+            weights = zones
+        else:
+            weights = self.weights(zones, data[lat_dim].values, data[lon_dim].values, id_column=id_column)
+        data = data.transpose(..., lat_dim, lon_dim)
+        outer_dims = data.dims[:-2]
+        if (data.sizes[lat_dim], data.sizes[lon_dim]) != weights.shape:
+            raise ValueError(f"data grid {data.shape[-2:]} does not match weights grid {weights.shape}")
+
+        values = np.asarray(data.values, dtype=np.float64).reshape(-1, weights.shape[0] * weights.shape[1]).T
+        valid = ~np.isnan(values)
+        if valid.all():
+            totals = weights.matrix @ values
+            norms = np.asarray(weights.matrix.sum(axis=1))
+        else:
+            totals = weights.matrix @ np.where(valid, values, 0.0)
+            norms = weights.matrix @ valid.astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(norms > 0, totals / norms, np.nan)
+
+        outer_shape = tuple(data.sizes[dim] for dim in outer_dims)
+        result = means.T.reshape(outer_shape + (len(weights.zone_ids),))
+        coords = {dim: data[dim] for dim in outer_dims if dim in data.coords}
+        coords["zone"] = list(weights.zone_ids)
+        return xr.DataArray(result, dims=outer_dims + ("zone",), coords=coords, name=data.name, attrs=dict(data.attrs))
+
+    @staticmethod
+    def _geometries(zones: Zones, id_column: Optional[str]) -> Tuple[np.ndarray, List[Hashable]]:
+        if isinstance(zones, (gpd.GeoDataFrame, gpd.GeoSeries)):
+            if zones.crs is not None and not zones.crs.equals("EPSG:4326"):
+                zones = zones.to_crs("EPSG:4326")
+            geometry = zones.geometry if isinstance(zones, gpd.GeoDataFrame) else zones
+            ids = zones[id_column] if id_column else zones.index
+            return np.asarray(geometry.values, dtype=object), list(ids)
+        geometries = np.asarray(list(zones), dtype=object)
+        return geometries, list(range(len(geometries)))
+
+    def _key(self, geometries: np.ndarray, zone_ids: List[Hashable], latitudes: np.ndarray, longitudes: np.ndarray) -> str:
+        digest = hashlib.sha1()
+        for blob in shapely.to_wkb(geometries):
+            digest.update(blob or b"")
+        digest.update(repr(zone_ids).encode())
+        digest.update(latitudes.tobytes())
+        digest.update(longitudes.tobytes())
+        digest.update(b"area" if self.area_weighted else b"cell")
+        return digest.hexdigest()
+
+    def _load(self, key: str) -> Optional[sparse.csr_matrix]:
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.npz"
+        if not path.exists():
+            return None
+        try:
+            return sparse.load_npz(path).tocsr()
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: str, matrix: sparse.csr_matrix) -> None:
+        if self.cache_dir is None:
+            return
+        tmp_path = self.cache_dir / f".{key}.tmp.npz"
+        sparse.save_npz(tmp_path, matrix)
+        tmp_path.replace(self.cache_dir / f"{key}.npz")
+
+
+__all__ = ["ZonalStatsEngine", "ZonalWeights", "coverage_weights"]
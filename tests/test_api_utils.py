@@ -0,0 +1,165 @@
+import json
+
+import geopandas as gpd
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+from shapely.geometry import Point, box
+
+from api.models import RiskMapResponse
+from api.utils import dataset_to_forecast_response, forecast_columns, forecast_payload, geojson_feature_collection, geojson_features
+from ingestion.weather_ingest import WeatherIngestor
+from shared.config import get_settings
+
+
+def _dataset(hours=384, variables=("temperature_2m", "precipitation", "windspeed_10m")):
+    times = pd.date_range("2024-05-01", periods=hours, freq="h")
+    data = np.arange(len(variables) * hours, dtype=np.float32).reshape(len(variables), hours)
+    dataset = xr.Dataset({"forecast": (("variable", "time"), data)}, coords={"variable": list(variables), "time": times})
+    dataset.attrs["source"] = "open-meteo"
+    return dataset
+
+
+def test_columns_are_sliced_to_horizon_and_fill_missing_variables():
+    columns = forecast_columns(_dataset(variables=("precipitation", "temperature_2m")), horizon_hours=48)
+
+    assert len(columns["time"]) == 48
+    assert columns["time"][:2] == ["2024-05-01T00:00:00", "2024-05-01T01:00:00"]
+    assert columns["precipitation_mm"][:2] == [0.0, 1.0]
+    assert columns["temperature_c"][0] == 384.0
+    assert columns["windspeed_ms"] == [0.0] * 48
+
+
+def test_rows_layout_matches_forecast_response_model():
+    dataset = _dataset(hours=200)
+    response = dataset_to_forecast_response(dataset, 6.9, 79.8, horizon_hours=168)
+
+    assert len(response.hourly) == 168
+    assert response.hourly[5].windspeed_ms == 405.0
+    payload = forecast_payload(dataset, 6.9, 79.8, 168)
+    assert payload["hourly"][5] == {"time": "2024-05-01T05:00:00", "temperature_c": 5.0, "precipitation_mm": 205.0, "windspeed_ms": 405.0}
+    assert len(dataset_to_forecast_response(dataset, 6.9, 79.8).hourly) == 200
+
+
+def test_geojson_features_match_geo_interface_and_chunks_join_to_valid_json():
+    frame = gpd.GeoDataFrame(
+        {
+            "exposure_index": [0.25, np.nan, 1 / 3],
+            "population_density": [100, 450, 1000],
+            "risk_level": pd.Categorical(["low", None, "high"]),
+            "geometry": [box(0, 0, 1, 1), Point(2.5, 3.5), None],
+        },
+        crs="EPSG:4326",
+    )
+
+    features = [json.loads(feature) for feature in geojson_features(frame)]
+    assert features[0]["geometry"]["coordinates"] == [list(map(list, box(0, 0, 1, 1).exterior.coords))]
+    assert features[1] == {"type": "Feature", "geometry": {"type": "Point", "coordinates": [2.5, 3.5]}, "properties": {"exposure_index": None, "population_density": 450, "risk_level": None}}
+    assert features[2]["geometry"] is None
+    assert features[2]["properties"]["exposure_index"] == pytest.approx(1 / 3, rel=1e-14)
+
+    whole = b"".join(geojson_feature_collection(frame, generated_at="2024-05-01T00:00:00"))
+    chunks = list(geojson_feature_collection(frame, chunk_features=2, generated_at="2024-05-01T00:00:00"))
+    assert b"".join(chunks) == whole and len(chunks) == 4
+    assert RiskMapResponse.parse_raw(whole).features[1].properties["population_density"] == 450
+    assert json.loads(b"".join(geojson_feature_collection(frame.iloc[:0]))) == {"type": "FeatureCollection", "features": []}
+
+
+class _StubIngestor:
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    async def fetch_forecast(self, lat, lon):
+        return self.dataset
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("API_KEYS", '["k"]')
+    monkeypatch.setenv("PREFETCH_ENABLED", "false")
+    get_settings.cache_clear()
+    from api.main import app
+
+    with TestClient(app) as test_client:
+        app.state.weather_ingestor = _StubIngestor(_dataset())
+        yield test_client
+    get_settings.cache_clear()
+
+
+def test_forecast_endpoint_honours_horizon_and_layout(client):
+    headers = {"x-api-key": "k"}
+    rows = client.post("/forecast", json={"latitude": 6.9, "longitude": 79.8, "horizon_hours": 24}, headers=headers).json()
+    assert len(rows["hourly"]) == 24
+    assert rows["location"] == [6.9, 79.8]
+    assert rows["source"] == "open-meteo"
+
+    body = {"latitude": 6.9, "longitude": 79.8, "horizon_hours": 384, "layout": "columns"}
+    columns = client.post("/forecast", json=body, headers=headers).json()
+    assert set(columns["hourly"]) == {"time", "temperature_c", "precipitation_mm", "windspeed_ms"}
+    assert len(columns["hourly"]["precipitation_mm"]) == 384
+
+    body["layout"] = "table"
+    assert client.post("/forecast", json=body, headers=headers).status_code == 422
+
+
+def _weather_ingestor(requests):
+    def handler(request):
+        requests.append(request)
+        lats = request.url.params["latitude"].split(",")
+        body = [
+            {"hourly": {"time": [1714521600 + hour * 3600 for hour in range(72)], "temperature_2m": [float(lat)] * 72, "precipitation": [0.5] * 72, "windspeed_10m": [2.0] * 72}}
+            for lat in lats
+        ]
+        return httpx.Response(200, json=body if len(body) > 1 else body[0])
+
+    return WeatherIngestor(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def test_forecast_batch_dedupes_cells_and_keys_by_input_index(client):
+    from api.main import app
+
+    requests = []
+    app.state.weather_ingestor = _weather_ingestor(requests)
+    points = [{"latitude": 6.9, "longitude": 79.8}, {"latitude": 7.3, "longitude": 80.6}, {"latitude": 6.9001, "longitude": 79.8001}]
+    response = client.post("/forecast/batch", json={"points": points, "horizon_hours": 24}, headers={"x-api-key": "k"})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert len(requests) == 1
+    assert body["count"] == 3
+    assert body["cells"] == 2
+    assert body["forecasts"]["2"]["location"] == [6.9001, 79.8001]
+    assert body["forecasts"]["2"]["hourly"] == body["forecasts"]["0"]["hourly"]
+    assert len(body["forecasts"]["1"]["hourly"]["temperature_c"]) == 24
+
+
+def test_forecast_batch_streams_ndjson_lines(client):
+    from api.main import app
+
+    app.state.weather_ingestor = _weather_ingestor([])
+    points = [{"latitude": 1.0 + index, "longitude": 2.0} for index in range(5)]
+    response = client.post("/forecast/batch", json={"points": points, "stream": True}, headers={"x-api-key": "k"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3, 4]
+    assert all(len(line["hourly"]["time"]) == 48 for line in lines)
+    assert client.post("/forecast/batch", json={"points": []}, headers={"x-api-key": "k"}).status_code == 422
+
+
+def test_risk_map_streams_the_same_feature_collection(client):
+    headers = {"x-api-key": "k"}
+    cached = client.post("/risk-map", json={"basin_id": "kelani"}, headers=headers).json()
+    streamed = client.post("/risk-map", json={"basin_id": "kelani", "stream": True}, headers=headers)
+
+    assert "etag" not in streamed.headers
+    assert streamed.json()["type"] == "FeatureCollection"
+    assert streamed.json()["features"] == cached["features"]
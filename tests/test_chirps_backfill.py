@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from datetime import date
+
+import aioftp
+import httpx
+import pytest
+
+from ingestion import satellite_ingest
+from ingestion.chirps_backfill import BackfillManifest, ChirpsBackfill
+from shared.config import get_settings
+
+
+def _configure(monkeypatch, tmp_path, base_url):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path / "data"))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path))
+    monkeypatch.setenv("CHIRPS_BASE_URL", base_url)
+    get_settings.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_backfill_bounds_concurrency_and_skips_completed_days(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path, "https://example.com/chirps")
+    requested = []
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        name = request.url.path.rsplit("/", 1)[1]
+        requested.append(name)
+        if name.endswith("01.05.tif"):
+            return httpx.Response(404)
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        body = name.encode() * 10
+        return httpx.Response(200, stream=httpx.ByteStream(body), headers={"Content-Length": str(len(body))})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ingestor = satellite_ingest.SatelliteIngestor(http_client=client)
+
+    report = await ChirpsBackfill(ingestor, workers=2, retry_backoff=0).run(date(2024, 1, 1), date(2024, 1, 8))
+
+    assert peak == 2
+    assert report.downloaded == 7
+    assert list(report.failed) == ["chirps-v2.0.2024.01.05.tif"]
+    manifest = json.loads((ingestor.storage_dir / "manifest.json").read_text())["files"]
+    assert len(manifest) == 7
+    assert manifest["chirps-v2.0.2024.01.01.tif"]["size"] == 260
+
+    # Corrupt one file: only it and the missing day are fetched again.
+    (ingestor.storage_dir / "chirps-v2.0.2024.01.02.tif").write_bytes(b"truncated")
+    requested.clear()
+    report = await ChirpsBackfill(ingestor, workers=2, retry_backoff=0).run(date(2024, 1, 1), date(2024, 1, 8))
+
+    assert sorted(requested) == ["chirps-v2.0.2024.01.02.tif", "chirps-v2.0.2024.01.05.tif"]
+    assert report.skipped == 6
+    assert report.downloaded == 1
+    await ingestor.close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_reuses_ftp_sessions(monkeypatch, tmp_path):
+    remote = tmp_path / "ftp" / "pub"
+    remote.mkdir(parents=True)
+    for day in range(1, 7):
+        (remote / f"chirps-v2.0.2024.01.{day:02d}.tif").write_bytes(bytes([day]) * 4096)
+    server = aioftp.Server([aioftp.User(base_path=tmp_path / "ftp", home_path="/")])
+    await server.start("127.0.0.1", 0)
+    port = server.server.sockets[0].getsockname()[1]
+    _configure(monkeypatch, tmp_path, f"ftp://127.0.0.1:{port}/pub")
+
+    logins = []
+    original_login = aioftp.Client.login
+
+    async def counting_login(self, *args, **kwargs):
+        logins.append(self)
+        return await original_login(self, *args, **kwargs)
+
+    monkeypatch.setattr(aioftp.Client, "login", counting_login)
+    try:
+        ingestor = satellite_ingest.SatelliteIngestor()
+        paths = await ingestor.download_range(date(2024, 1, 1), date(2024, 1, 6))
+    finally:
+        await server.close()
+
+    assert [path.read_bytes()[0] for path in paths] == [1, 2, 3, 4, 5, 6]
+    assert len(logins) <= get_settings().chirps_ftp_sessions
+
+
+def test_manifest_saves_consistently_while_workers_record(tmp_path):
+    products = tmp_path / "products"
+    products.mkdir()
+    paths = []
+    for index in range(200):
+        path = products / f"chirps-{index:03d}.tif"
+        path.write_bytes(b"x" * index)
+        paths.append(path)
+    manifest = BackfillManifest(tmp_path / "manifest.json")
+
+    def record(chunk):
+        for path in chunk:
+            manifest.record(path)
+            manifest.save()
+
+    threads = [threading.Thread(target=record, args=(paths[start::4],)) for start in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manifest.save()
+
+    saved = json.loads((tmp_path / "manifest.json").read_text())["files"]
+    assert len(saved) == 200 and manifest.dirty == 0
+    assert BackfillManifest(tmp_path / "manifest.json").is_complete(paths[42])
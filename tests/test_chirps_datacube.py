@@ -0,0 +1,89 @@
+from datetime import date
+
+import httpx
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from ingestion import satellite_ingest
+from ingestion.chirps_backfill import ChirpsBackfill
+from ingestion.chirps_datacube import ChirpsDatacube
+from shared.config import get_settings
+
+TRANSFORM = from_origin(79.0, 10.0, 0.05, 0.05)
+
+
+def _grid(day: date) -> np.ndarray:
+    rows, cols = np.mgrid[0:40, 0:60]
+    return (rows * 100 + cols + day.toordinal() % 1000).astype(np.float32)
+
+
+def _write_tif(path, day: date) -> None:
+    data = _grid(day)
+    data[0, 0] = -9999.0
+    with rasterio.open(
+        path, "w", driver="GTiff", height=40, width=60, count=1, dtype="float32", crs="EPSG:4326",
+        transform=TRANSFORM, nodata=-9999.0,
+    ) as dst:
+        dst.write(data, 1)
+
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path / "data"))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path))
+    get_settings.cache_clear()
+    return get_settings()
+
+
+def test_bbox_window_across_years_with_gaps(settings, tmp_path):
+    cube = ChirpsDatacube(time_chunk=8, space_chunk=16)
+    for day in (date(2023, 12, 31), date(2024, 1, 2)):
+        path = tmp_path / f"chirps-v2.0.{day:%Y.%m.%d}.tif"
+        _write_tif(path, day)
+        cube.append(path)
+
+    window = cube.read(bbox=(79.0, 9.5, 79.5, 10.0), start=date(2023, 12, 30), end=date(2024, 1, 2))
+
+    assert window.dims == ("time", "latitude", "longitude")
+    assert window.shape == (4, 10, 10)
+    assert np.isnan(window.sel(time="2023-12-30")).all()
+    assert np.isnan(window.sel(time="2024-01-01")).all()
+    expected = _grid(date(2024, 1, 2))[:10, :10]
+    np.testing.assert_allclose(window.sel(time="2024-01-02").values[1:, 1:], expected[1:, 1:])
+    assert np.isnan(window.sel(time="2024-01-02").values[0, 0])
+    assert cube.days() == [date(2023, 12, 31), date(2024, 1, 2)]
+    with rasterio.open(tmp_path / "chirps-v2.0.2024.01.02.tif") as src:
+        assert float(window.latitude[0]) == pytest.approx(src.xy(0, 0)[1])
+
+
+def test_rejects_mismatched_grid(settings):
+    cube = ChirpsDatacube()
+    cube.append_array(date(2024, 3, 1), np.zeros((40, 60)), TRANSFORM)
+    with pytest.raises(ValueError):
+        cube.append_array(date(2024, 3, 2), np.zeros((40, 61)), TRANSFORM)
+
+
+@pytest.mark.asyncio
+async def test_backfill_appends_downloads_to_datacube(settings, tmp_path, monkeypatch):
+    monkeypatch.setenv("CHIRPS_BASE_URL", "https://example.com/chirps")
+    get_settings.cache_clear()
+    source = tmp_path / "source.tif"
+    _write_tif(source, date(2024, 5, 1))
+    payload = source.read_bytes()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=httpx.ByteStream(payload), headers={"Content-Length": str(len(payload))})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ingestor = satellite_ingest.SatelliteIngestor(http_client=client)
+    cube = ChirpsDatacube()
+
+    report = await ChirpsBackfill(ingestor, datacube=cube).run(date(2024, 5, 1), date(2024, 5, 3))
+    rerun = await ChirpsBackfill(ingestor, datacube=cube).run(date(2024, 5, 1), date(2024, 5, 3))
+
+    assert report.cube_appended == 3
+    assert rerun.cube_appended == 0
+    assert cube.days() == [date(2024, 5, 1), date(2024, 5, 2), date(2024, 5, 3)]
+    await ingestor.close()
@@ -0,0 +1,167 @@
+import httpx
+import pytest
+
+from ingestion import weather_ingest
+from ingestion.forecast_cache import ForecastCache
+from shared.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from shared.config import get_settings
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_trips_probes_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_time=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["trips"] == 2
+
+
+def test_abandoned_probe_expires_after_max_timeout():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=10, max_timeout=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()  # probe that is cancelled and never reports back
+    clock.now = 14.0
+    assert not breaker.allow()
+    clock.now = 15.0
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+
+
+def test_timeout_adapts_to_latency():
+    breaker = CircuitBreaker("test", min_timeout=0.5, max_timeout=30)
+    assert breaker.timeout() == 30
+    for _ in range(20):
+        breaker.record_success(0.2)
+    assert 0.5 <= breaker.timeout() < 1.0
+
+
+def test_timeouts_are_estimated_per_kind_and_released_calls_are_neutral():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=10, min_timeout=0.5, max_timeout=30, clock=clock)
+    for _ in range(20):
+        breaker.record_success(0.2, "point")
+        breaker.record_success(6.0, "batch-64")
+    assert breaker.timeout("point") < 1.0
+    assert 6.0 <= breaker.timeout("batch-64") < 10.0
+    assert breaker.timeout("batch-8") == 30
+    assert sorted(breaker.snapshot()["latency"]) == ["batch-64", "point"]
+
+    breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert breaker.snapshot()["failures"] == 1 and breaker.snapshot()["released"] == 1
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_serves_last_cached_forecast(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("WEATHER_PROVIDER", "open-meteo")
+    monkeypatch.setenv("BREAKER_FAILURE_THRESHOLD", "1")
+    get_settings.cache_clear()
+
+    calls = []
+    healthy = True
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if not healthy:
+            raise httpx.ConnectError("provider down")
+        return httpx.Response(
+            200,
+            json={"hourly": {"time": [1704067200], "temperature_2m": [12.0], "precipitation": [0.0], "windspeed_10m": [1.0]}},
+        )
+
+    clock = FakeClock(now=3600.0 * 100)
+    cache = ForecastCache(update_interval=3600.0, clock=clock)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ingestor = weather_ingest.WeatherIngestor(http_client=client, cache=cache)
+
+    await ingestor.fetch_forecast(1.0, 2.0)
+    clock.now += 3600.0
+    healthy = False
+
+    degraded = await ingestor.fetch_forecast(1.0, 2.0)
+    again = await ingestor.fetch_forecast(1.0, 2.0)
+
+    assert len(calls) == 2
+    assert degraded.attrs["stale"] == "true"
+    assert float(again["forecast"].sel(variable="temperature_2m")[0]) == 12.0
+    assert ingestor.breakers["open-meteo"].snapshot()["state"] == OPEN
+    assert ingestor.metrics()["weather_breakers"]["open-meteo"]["rejections"] == 1
+    await ingestor.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [[1, 2], {"hourly": {"time": ["soon"], "temperature_2m": [1.0]}}, {"error": True}],
+    ids=["list-of-numbers", "bad-times", "no-hourly"],
+)
+async def test_malformed_payload_counts_as_failure_and_serves_fallback(monkeypatch, tmp_path, body):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("WEATHER_PROVIDER", "open-meteo")
+    get_settings.cache_clear()
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=body)))
+    ingestor = weather_ingest.WeatherIngestor(http_client=client, cache=ForecastCache())
+
+    dataset = await ingestor.fetch_forecast(1.0, 2.0)
+    points = await ingestor.fetch_points([(1.0, 2.0), (3.0, 4.0)])
+
+    assert dataset.attrs["source"] == "synthetic" and dataset.sizes["time"] > 0
+    assert all(point.attrs["source"] == "synthetic" for point in points)
+    assert ingestor.breakers["open-meteo"].snapshot()["failures"] == 2
+    await ingestor.close()
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_trip_the_breaker(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("WEATHER_PROVIDER", "open-meteo")
+    monkeypatch.setenv("BREAKER_FAILURE_THRESHOLD", "1")
+    get_settings.cache_clear()
+
+    statuses = [400, 429]
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(statuses.pop(0), json={"reason": "bad"})))
+    ingestor = weather_ingest.WeatherIngestor(http_client=client, cache=ForecastCache())
+
+    rejected = await ingestor.fetch_forecast(1.0, 2.0)
+    breaker = ingestor.breakers["open-meteo"]
+    assert rejected.attrs["source"] == "synthetic"
+    assert breaker.state == CLOSED and breaker.snapshot()["released"] == 1
+
+    await ingestor.fetch_forecast(30.0, 40.0)
+    assert breaker.state == OPEN
+    await ingestor.close()
@@ -0,0 +1,93 @@
+import httpx
+import numpy as np
+import pytest
+import xarray as xr
+
+from ingestion import weather_ingest
+from ingestion.forecast_cache import ForecastCache
+from shared.config import get_settings
+
+
+class FakeClock:
+    def __init__(self, now: float = 7200.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _dataset(value: float = 1.0) -> xr.Dataset:
+    return xr.Dataset({"forecast": (("variable", "time"), np.full((1, 2), value))})
+
+
+def test_cache_snaps_points_to_grid_cells():
+    cache = ForecastCache(resolution=0.01, clock=FakeClock())
+    first = cache.key(10.0012, 20.0041, ["precipitation"])
+    second = cache.key(10.0038, 19.9962, ["precipitation"])
+
+    assert first == second
+    cache.put(first, _dataset())
+    assert cache.get(second) is not None
+    assert cache.stats.hits == 1
+
+
+def test_cache_expires_on_next_model_run():
+    clock = FakeClock(now=3600.0 * 5 + 10)
+    cache = ForecastCache(update_interval=3600.0, clock=clock)
+    key = cache.key(1.0, 2.0, ["precipitation"])
+    cache.put(key, _dataset())
+
+    clock.now = 3600.0 * 6 + 1
+    assert cache.get(key) is None
+    assert cache.stats.expirations == 1
+    assert cache.key(1.0, 2.0, ["precipitation"]) != key
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ForecastCache(max_entries=2, clock=FakeClock())
+    keys = [cache.key(float(i), 0.0, ["precipitation"]) for i in range(3)]
+    cache.put(keys[0], _dataset())
+    cache.put(keys[1], _dataset())
+    cache.get(keys[0])
+    cache.put(keys[2], _dataset())
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.snapshot()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_weather_ingestor_serves_cell_from_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("WEATHER_PROVIDER", "open-meteo")
+    get_settings.cache_clear()
+
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "hourly": {
+                    "time": ["2024-01-01T00:00", "2024-01-01T01:00"],
+                    "temperature_2m": [10.0, 11.0],
+                    "precipitation": [0.0, 0.5],
+                    "windspeed_10m": [2.0, 3.0],
+                }
+            },
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ingestor = weather_ingest.WeatherIngestor(http_client=client)
+
+    first = await ingestor.fetch_forecast(10.0012, 20.0041)
+    second = await ingestor.fetch_forecast(10.0038, 19.9962)
+
+    assert len(requests) == 1
+    assert requests[0].url.params["latitude"] == "10.0"
+    assert second.attrs["lat"] == 10.0038
+    assert first.attrs["lat"] == 10.0012
+    assert ingestor.cache.stats.hits == 1
+    await ingestor.close()
@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import xarray as xr
+
+from ingestion.forecast_store import ForecastStore
+
+
+def _batch(points, value, hours=6):
+    times = np.datetime64("2024-01-01T00:00") + np.arange(hours) * np.timedelta64(1, "h")
+    data = np.full((len(points), 2, hours), value, dtype=float)
+    lats, lons = zip(*points)
+    return xr.Dataset(
+        {"forecast": (("location", "variable", "time"), data)},
+        coords={
+            "location": np.arange(len(points)),
+            "variable": ["temperature_2m", "precipitation"],
+            "time": times,
+            "latitude": ("location", list(lats)),
+            "longitude": ("location", list(lons)),
+        },
+        attrs={"source": "test"},
+    )
+
+
+RUN = datetime(2024, 1, 1, 0, tzinfo=timezone.utc)
+
+
+def test_appends_are_new_partitions_and_latest_cell_wins(tmp_path):
+    store = ForecastStore(tmp_path / "store")
+    store.append(_batch([(1.0, 1.0), (2.0, 2.0)], value=1.0), model_run=RUN)
+    store.append(_batch([(2.0, 2.0), (3.0, 3.0)], value=2.0), model_run=RUN)
+
+    assert len(list((tmp_path / "store" / "run=20240101T0000").glob("part-*.nc"))) == 2
+    result = store.read()
+    assert sorted(result["latitude"].values.tolist()) == [1.0, 2.0, 3.0]
+    second = result.isel(location=int(np.flatnonzero(result["latitude"].values == 2.0)[0]))
+    assert float(second["forecast"].max()) == 2.0
+    assert result.attrs["model_run"] == "20240101T0000"
+
+
+def test_windowed_read_by_bbox_and_time(tmp_path):
+    store = ForecastStore(tmp_path / "store")
+    store.append(_batch([(1.0, 1.0), (5.0, 5.0)], value=1.0), model_run=RUN)
+
+    window = store.read(bbox=(0.0, 0.0, 2.0, 2.0), start="2024-01-01T02:00", end="2024-01-01T03:00")
+
+    assert window.sizes["location"] == 1
+    assert window.sizes["time"] == 2
+    assert store.read(bbox=(50.0, 50.0, 60.0, 60.0)) is None
+
+
+def test_prune_keeps_newest_runs(tmp_path):
+    store = ForecastStore(tmp_path / "store")
+    for hour in range(3):
+        store.append(_batch([(1.0, 1.0)], value=hour), model_run=RUN.replace(hour=hour))
+
+    removed = store.prune(keep_runs=1)
+
+    assert len(removed) == 2
+    assert store.runs() == [RUN.replace(hour=2)]
+    assert float(store.read()["forecast"].max()) == 2.0
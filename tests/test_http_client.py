@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+from shared.http_client import InstrumentedTransport, PoolMetrics
+
+
+@pytest.mark.asyncio
+async def test_per_host_limit_caps_concurrency():
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, text="ok")
+
+    metrics = PoolMetrics()
+    transport = InstrumentedTransport(httpx.MockTransport(handler), per_host_limit=2, metrics=metrics)
+    async with httpx.AsyncClient(transport=transport) as client:
+        responses = await asyncio.gather(*(client.get("http://example.test/") for _ in range(6)))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert peak == 2
+    assert metrics.requests == 6
+    assert metrics.in_flight == 0
+    assert metrics.host_waits > 0
+
+
+@pytest.mark.asyncio
+async def test_counts_new_and_reused_connections():
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")
+            if not request:
+                break
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\nok")
+            await writer.drain()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    metrics = PoolMetrics()
+    transport = InstrumentedTransport(httpx.AsyncHTTPTransport(), metrics=metrics)
+    try:
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(3):
+                response = await client.get(f"http://127.0.0.1:{port}/")
+                assert response.text == "ok"
+    finally:
+        server.close()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["new_connections"] == 1
+    assert snapshot["reused_connections"] == 2
+    assert snapshot["in_flight_by_host"] == {}
@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from shared import jsonio
+
+
+def test_dumps_is_compact_and_round_trips():
+    value = {"topic": "sensors/a", "payload": {"level": 1.5, "ok": True, "tags": ["x", None]}}
+    encoded = jsonio.dumps(value)
+
+    assert encoded == json.dumps(value, separators=(",", ":")).encode()
+    assert jsonio.loads(encoded) == value
+    assert jsonio.loads(encoded.decode()) == value
+
+
+def test_dumps_falls_back_for_values_orjson_rejects():
+    assert jsonio.dumps({"v": 10**30}) == b'{"v":1000000000000000000000000000000}'
+    assert jsonio.dumps({"v": object()}, default=lambda value: "opaque") == b'{"v":"opaque"}'
+    with pytest.raises(TypeError):
+        jsonio.dumps({"v": object()})
+    with pytest.raises(ValueError):
+        jsonio.loads(b"{not json")
@@ -0,0 +1,94 @@
+import pytest
+import xarray as xr
+
+from ingestion.prefetch import PrefetchScheduler, build_scheduler
+from shared.config import get_settings
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeIngestor:
+    cache = None
+
+    def __init__(self, fail=(), fallback=()):
+        self.calls = []
+        self.fail = set(fail)
+        self.fallback = set(fallback)
+        self.settings = type("Settings", (), {"forecast_update_interval_minutes": 60})()
+
+    async def fetch_many(self, points):
+        self.calls.append(list(points))
+        if tuple(points[0]) in self.fail:
+            raise RuntimeError("upstream error")
+        return [xr.Dataset(attrs={"source": "synthetic"} if tuple(point) in self.fallback else {"source": "open-meteo"}) for point in points]
+
+
+@pytest.mark.asyncio
+async def test_refresh_runs_highest_priority_first_and_tracks_staleness():
+    clock = FakeClock(now=3600.0 * 10 + 400)
+    ingestor = FakeIngestor(fail={(9.0, 9.0)})
+    scheduler = PrefetchScheduler(ingestor, concurrency=1, jitter=0, clock=clock)
+    scheduler.register_hotspot("low", 1.0, 1.0, priority=0)
+    scheduler.register_basin("basin-a", [(2.0, 2.0), (2.1, 2.1)], priority=5)
+    scheduler.register_hotspot("broken", 9.0, 9.0, priority=1)
+
+    assert scheduler.metrics()["stale_targets"] == 3
+    outcome = await scheduler.refresh_all()
+
+    assert [call[0] for call in ingestor.calls] == [(2.0, 2.0), (9.0, 9.0), (1.0, 1.0)]
+    assert outcome == {"basin-a": True, "broken": False, "low": True}
+    metrics = scheduler.metrics()
+    assert metrics["stale_targets"] == 1
+    assert metrics["failures"] == 1
+
+    clock.now += 3600.0
+    assert scheduler.metrics()["stale_targets"] == 3
+    assert scheduler.metrics()["max_staleness_seconds"] == 3600.0
+
+
+@pytest.mark.asyncio
+async def test_fallback_results_count_as_failures_and_are_retried_with_backoff():
+    clock = FakeClock(now=3600.0 * 10 + 400)
+    ingestor = FakeIngestor(fallback={(2.1, 2.1)})
+    scheduler = PrefetchScheduler(ingestor, jitter=0, retry=30, clock=clock)
+    target = scheduler.register_basin("basin-a", [(2.0, 2.0), (2.1, 2.1)])
+
+    assert await scheduler.refresh_all() == {"basin-a": False}
+    assert target.last_model_run is None
+    assert scheduler.metrics()["errors"] == {"basin-a": "1 of 2 points served from fallback"}
+    assert scheduler.retry_delay() == 30
+    await scheduler.refresh_all()
+    assert scheduler.retry_delay() == 60
+    assert scheduler.metrics()["retrying"] == 1
+
+    ingestor.fallback.clear()
+    clock.now += 60
+    assert await scheduler.refresh_all() == {"basin-a": True}
+    assert target.last_model_run == 36000
+    assert scheduler.retry_delay() is None and scheduler.metrics()["failures"] == 2
+
+
+def test_next_delay_waits_for_publish_window():
+    clock = FakeClock(now=3600.0 * 10 + 100)
+    scheduler = PrefetchScheduler(FakeIngestor(), jitter=0, publish_delay=300, clock=clock)
+
+    assert scheduler.next_delay() == 200
+    clock.now = 3600.0 * 10 + 400
+    assert scheduler.next_delay() == 3500
+
+
+def test_build_scheduler_registers_configured_hotspots(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("PREFETCH_HOTSPOTS", "[[6.9271, 79.8612], [7.2906, 80.6337]]")
+    get_settings.cache_clear()
+
+    scheduler = build_scheduler(FakeIngestor())
+
+    assert [target.points for target in scheduler.targets] == [[(6.9271, 79.8612)], [(7.2906, 80.6337)]]
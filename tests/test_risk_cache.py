@@ -0,0 +1,202 @@
+import gzip
+import json
+import threading
+
+import geopandas as gpd
+import pytest
+from fastapi.testclient import TestClient
+from shapely.geometry import box
+
+from layers.mapping import RiskLayerConfig
+from layers.risk_cache import RiskInputs, RiskProduct, RiskProductCache, content_hash
+from layers.vector_tiles import lonlat_to_tile
+from shared.config import get_settings
+
+
+def _inputs(probabilities=(0.3, 0.6, 0.8)):
+    hazard = gpd.GeoDataFrame(
+        {"flood_probability": list(probabilities), "geometry": [box(i, i, i + 0.1, i + 0.1) for i in range(3)]},
+        crs="EPSG:4326",
+    )
+    vulnerability = gpd.GeoDataFrame(
+        {"population_density": [100, 450, 1000], "geometry": [box(i, i, i + 0.1, i + 0.1) for i in range(3)]},
+        crs="EPSG:4326",
+    )
+    return RiskInputs(hazard, [vulnerability], RiskLayerConfig(["flood_probability"], ["population_density"]))
+
+
+def _render(basin_id, risk):
+    return json.dumps({"basin": basin_id, "probability": list(risk["flood_probability"]), "levels": [str(level) for level in risk["risk_level"]]}).encode()
+
+
+def test_content_hash_tracks_values_geometry_and_config():
+    base = content_hash(_inputs())
+    assert content_hash(_inputs()) == base
+    assert content_hash(_inputs((0.3, 0.6, 0.9))) != base
+
+    moved = _inputs()
+    moved.hazard.loc[0, "geometry"] = box(0, 0, 0.2, 0.2)
+    assert content_hash(moved) != base
+    reweighted = _inputs()
+    reweighted.config = RiskLayerConfig(["flood_probability"], [])
+    assert content_hash(reweighted) != base
+
+
+def test_products_build_once_and_rebuild_only_when_inputs_change():
+    current = {"inputs": _inputs()}
+    cache = RiskProductCache(
+        [RiskProduct("map", lambda basin: current["inputs"], _render), RiskProduct("summary", lambda basin: current["inputs"], _render)]
+    )
+
+    first = cache.get("kelani", "map")
+    assert cache.get("kelani", "map") is first
+    assert cache.peek("kelani", "summary") is None
+    cache.get("kelani", "summary")
+    assert cache.stats.risk_builds == 1
+    assert gzip.decompress(first.gzip_body) == first.body
+
+    assert cache.refresh("kelani") == []
+    assert cache.stats.unchanged_refreshes == 2
+
+    current["inputs"] = _inputs((0.9, 0.1, 0.5))
+    assert sorted(cache.refresh()) == [("kelani", "map"), ("kelani", "summary")]
+    updated = cache.peek("kelani", "map")
+    assert updated.version != first.version
+    assert updated.etag != first.etag
+    assert cache.metrics()["risk_builds"] == 2
+
+
+def _settle(cache):
+    for thread in list(cache._rechecking.values()):
+        thread.join(timeout=5)
+
+
+def test_stale_bodies_are_served_while_inputs_are_rechecked_in_the_background():
+    current = {"inputs": _inputs(), "now": 0.0}
+    cache = RiskProductCache([RiskProduct("map", lambda basin: current["inputs"], _render)], recheck_seconds=30, clock=lambda: current["now"])
+
+    first = cache.get("kelani", "map")
+    current["inputs"] = _inputs((0.9, 0.1, 0.5))
+    assert cache.peek("kelani", "map") is first
+    assert cache.stats.rechecks == 0
+    current["now"] = 31.0
+    assert cache.peek("kelani", "map") is first
+    _settle(cache)
+    updated = cache.peek("kelani", "map")
+    assert updated.version != first.version and updated.etag != first.etag
+    assert cache.stats.rechecks == 1
+
+    current["now"] = 62.0
+    assert cache.get("kelani", "map") is updated
+    _settle(cache)
+    assert cache.get("kelani", "map") is updated
+    assert cache.stats.rechecks == 2 and cache.stats.builds == 2
+
+    cache.invalidate("kelani")
+    rebuilt = cache.get("kelani", "map")
+    assert (rebuilt.etag, rebuilt.body) == (updated.etag, updated.body)
+
+
+def test_a_slow_basin_does_not_block_other_basins():
+    release = threading.Event()
+    started = threading.Event()
+
+    def loader(basin_id):
+        if basin_id == "slow":
+            started.set()
+            release.wait(timeout=5)
+        return _inputs()
+
+    cache = RiskProductCache([RiskProduct("map", loader, _render)], recheck_seconds=0)
+    slow = threading.Thread(target=cache.get, args=("slow", "map"))
+    slow.start()
+    assert started.wait(timeout=5)
+
+    fast = cache.get("fast", "map")
+    assert json.loads(fast.body)["basin"] == "fast"
+    assert cache.get("fast", "map") is fast  # stale, re-checked in the background
+    _, risk = cache.risk_map("fast", "map")
+    assert len(risk) == 3
+    assert slow.is_alive()
+    release.set()
+    slow.join(timeout=5)
+    _settle(cache)
+    assert json.loads(cache.get("slow", "map").body)["basin"] == "slow"
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("API_KEYS", '["k"]')
+    monkeypatch.setenv("PREFETCH_ENABLED", "false")
+    get_settings.cache_clear()
+    from api.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+    get_settings.cache_clear()
+
+
+def test_risk_map_etag_304_and_gzip(client):
+    headers = {"x-api-key": "k", "accept-encoding": "identity"}
+    first = client.get("/risk-map", params={"basin_id": "kelani"}, headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()["features"]) == 3
+    assert "generated_at" not in first.json()
+    etag = first.headers["etag"]
+
+    repeat = client.get("/risk-map", params={"basin_id": "kelani"}, headers={**headers, "if-none-match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == etag
+
+    posted = client.post("/risk-map", json={"basin_id": "kelani"}, headers={**headers, "if-none-match": etag})
+    assert posted.status_code == 200
+    assert posted.content == first.content
+    assert "etag" not in posted.headers and posted.headers["cache-control"] == "no-store"
+
+    client.app.state.risk_cache.invalidate("kelani")
+    rebuilt = client.get("/risk-map", params={"basin_id": "kelani"}, headers=headers)
+    assert (rebuilt.headers["etag"], rebuilt.content) == (etag, first.content)
+
+    zipped = client.get("/adaptation", params={"basin_id": "kelani"}, headers={"x-api-key": "k", "accept-encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"].endswith('-gzip"')
+    assert len(zipped.json()["recommendations"]) == 3
+    revalidated = client.get(
+        "/adaptation", params={"basin_id": "kelani"}, headers={"x-api-key": "k", "if-none-match": f'W/{zipped.headers["etag"]}'}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_api_serves_new_risk_products_when_inputs_change(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("API_KEYS", '["k"]')
+    monkeypatch.setenv("PREFETCH_ENABLED", "false")
+    monkeypatch.setenv("RISK_CACHE_RECHECK_SECONDS", "0")
+    get_settings.cache_clear()
+    import api.main as api_main
+
+    current = {"inputs": _inputs()}
+    monkeypatch.setattr(api_main, "_risk_map_inputs", lambda basin_id: current["inputs"])
+    headers = {"x-api-key": "k", "accept-encoding": "identity"}
+    x, y = lonlat_to_tile(1.05, 1.05, 6)
+    with TestClient(api_main.app) as client:
+        first = client.get("/risk-map", params={"basin_id": "kelani"}, headers=headers)
+        etag = first.headers["etag"]
+        assert client.get("/risk-map", params={"basin_id": "kelani"}, headers={**headers, "if-none-match": etag}).status_code == 304
+        tile_etag = client.get(f"/tiles/risk/kelani/6/{x}/{y}.mvt", headers=headers).headers["etag"]
+        _settle(api_main.app.state.risk_cache)
+
+        current["inputs"] = _inputs((0.9, 0.1, 0.5))
+        client.get("/risk-map", params={"basin_id": "kelani"}, headers={**headers, "if-none-match": etag})
+        client.get(f"/tiles/risk/kelani/6/{x}/{y}.mvt", headers=headers)
+        _settle(api_main.app.state.risk_cache)
+        updated = client.get("/risk-map", params={"basin_id": "kelani"}, headers={**headers, "if-none-match": etag})
+        assert updated.status_code == 200
+        assert updated.headers["etag"] != etag
+        assert [feature["properties"]["flood_probability"] for feature in updated.json()["features"]] == [0.9, 0.1, 0.5]
+        assert client.get(f"/tiles/risk/kelani/6/{x}/{y}.mvt", headers=headers).headers["etag"] != tile_etag
+    get_settings.cache_clear()
@@ -1,6 +1,8 @@
-import asyncio
+import gzip
 from datetime import date
 
+import aioftp
+import httpx
 import pytest
 
 from ingestion import satellite_ingest
@@ -28,3 +30,109 @@ async def test_satellite_ingestor_http(monkeypatch, tmp_path):
     await ingestor.download_daily_chirps(date(2024, 1, 1))
 
     assert calls == ["chirps-v2.0.2024.01.01.tif"]
+
+
+def _ranged_handler(payload: bytes, requests: list, headers=None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.headers.get("range"))
+        header = request.headers.get("range")
+        if header:
+            start = int(header.split("=")[1].rstrip("-"))
+            return _streamed(
+                206, payload[start:], {"Content-Range": f"bytes {start}-{len(payload) - 1}/{len(payload)}", **(headers or {})}
+            )
+        return _streamed(200, payload, headers or {})
+
+    return handler
+
+
+def _streamed(status: int, body: bytes, headers: dict) -> httpx.Response:
+    # A body passed as ``content=`` is read up front; a stream is left for the client, as over the network.
+    return httpx.Response(status, stream=httpx.ByteStream(body), headers={"Content-Length": str(len(body)), **headers})
+
+
+@pytest.mark.asyncio
+async def test_http_download_resumes_partial_file(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path))
+    monkeypatch.setenv("CHIRPS_BASE_URL", "https://example.com/chirps")
+    get_settings.cache_clear()
+
+    payload = bytes(range(256)) * 64
+    requests = []
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_ranged_handler(payload, requests)))
+    ingestor = satellite_ingest.SatelliteIngestor(http_client=client)
+    name = "chirps-v2.0.2024.01.01.tif"
+    (ingestor.storage_dir / f"{name}.part").write_bytes(payload[:1000])
+
+    path = await ingestor.download_daily_chirps(date(2024, 1, 1))
+
+    assert requests == ["bytes=1000-"]
+    assert path.read_bytes() == payload
+    assert not (ingestor.storage_dir / f"{name}.part").exists()
+    await ingestor.close()
+
+
+@pytest.mark.asyncio
+async def test_http_download_gunzips_products(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path))
+    monkeypatch.setenv("CHIRPS_BASE_URL", "https://example.com/chirps")
+    get_settings.cache_clear()
+
+    raw = b"GeoTIFF" * 5000
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_ranged_handler(gzip.compress(raw), [])))
+    ingestor = satellite_ingest.SatelliteIngestor(http_client=client)
+
+    path = await ingestor.download_daily_chirps(date(2024, 1, 2), fmt="tif.gz")
+
+    assert path.name == "chirps-v2.0.2024.01.02.tif"
+    assert path.read_bytes() == raw
+    assert sorted(p.name for p in ingestor.storage_dir.iterdir()) == [path.name]
+    await ingestor.close()
+
+
+@pytest.mark.asyncio
+async def test_http_resume_keeps_content_encoded_bytes_as_sent(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path))
+    monkeypatch.setenv("CHIRPS_BASE_URL", "https://example.com/chirps")
+    get_settings.cache_clear()
+
+    raw = bytes(range(256)) * 200
+    compressed = gzip.compress(raw)
+    requests = []
+    handler = _ranged_handler(compressed, requests, headers={"Content-Encoding": "gzip"})
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ingestor = satellite_ingest.SatelliteIngestor(http_client=client)
+    (ingestor.storage_dir / "chirps-v2.0.2024.01.04.tif.gz.part").write_bytes(compressed[:100])
+
+    path = await ingestor.download_daily_chirps(date(2024, 1, 4), fmt="tif.gz")
+
+    assert requests == ["bytes=100-"]
+    assert path.read_bytes() == raw
+    await ingestor.close()
+
+
+@pytest.mark.asyncio
+async def test_ftp_download_resumes_with_rest(monkeypatch, tmp_path):
+    remote = tmp_path / "ftp" / "pub"
+    remote.mkdir(parents=True)
+    payload = bytes(range(256)) * 1024
+    (remote / "chirps-v2.0.2024.01.03.tif").write_bytes(payload)
+    server = aioftp.Server([aioftp.User(base_path=tmp_path / "ftp", home_path="/")])
+    await server.start("127.0.0.1", 0)
+    port = server.server.sockets[0].getsockname()[1]
+
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path / "data"))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path))
+    monkeypatch.setenv("CHIRPS_BASE_URL", f"ftp://127.0.0.1:{port}/pub")
+    get_settings.cache_clear()
+    try:
+        ingestor = satellite_ingest.SatelliteIngestor()
+        (ingestor.storage_dir / "chirps-v2.0.2024.01.03.tif.part").write_bytes(payload[:5000])
+        path = await ingestor.download_daily_chirps(date(2024, 1, 3))
+    finally:
+        await server.close()
+
+    assert path.read_bytes() == payload
@@ -0,0 +1,130 @@
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+
+from ingestion.sensor_aggregates import AggregatorState, RollingAggregator
+from ingestion.sensor_mqtt import SensorMessage
+
+T0 = 1_700_000_000.0 - 1_700_000_000.0 % 3600
+
+
+class FakeClock:
+    def __init__(self, now: float = T0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _message(sensor, minute, **payload):
+    received = datetime.fromtimestamp(T0 + minute * 60, tz=timezone.utc)
+    return SensorMessage(topic=f"sensors/{sensor}", payload=payload, received_at=received)
+
+
+def test_windows_give_sum_min_max_mean_and_rate():
+    aggregator = RollingAggregator(fields=("water_level", "rainfall"), window_seconds=3600, bucket_seconds=60, clock=FakeClock(T0 + 59 * 60))
+    for minute in range(60):
+        aggregator(_message("river-1", minute, water_level=float(minute), rainfall=0.5))
+    aggregator(_message("river-2", 59, rainfall=2.0))
+
+    now = T0 + 59 * 60 + 30
+    hour = aggregator.snapshot(now=now)
+    quarter = aggregator.snapshot(window_seconds=900, now=now)
+
+    assert hour.values.shape == (2, 2, 6)
+    assert hour.get("river-1", "rainfall", "sum") == 30.0
+    assert hour.get("river-1", "rainfall", "rate") == 30.0 / 3600
+    assert quarter.get("river-1", "water_level", "max") == 59.0
+    assert quarter.get("river-1", "water_level", "min") == 45.0
+    assert quarter.get("river-1", "water_level", "mean") == 52.0
+    assert quarter.get("river-2", "rainfall", "count") == 1
+    assert math.isnan(quarter.get("river-2", "water_level", "max"))
+
+
+def test_expired_buckets_are_excluded_and_late_readings_dropped():
+    clock = FakeClock()
+    aggregator = RollingAggregator(fields=("rainfall",), window_seconds=600, bucket_seconds=60, clock=clock)
+    aggregator(_message("gauge", 0, rainfall=5.0))
+    clock.now = T0 + 12 * 60
+    aggregator(_message("gauge", 12, rainfall=1.0))
+    aggregator(_message("gauge", 2, rainfall=9.0))
+
+    snapshot = aggregator.snapshot(now=T0 + 12 * 60)
+    assert snapshot.get("gauge", "rainfall", "sum") == 1.0
+    assert aggregator.dropped_late == 1
+    assert aggregator.snapshot(now=T0 + 40 * 60).get("gauge", "rainfall", "count") == 0
+
+
+def test_payload_timestamp_wins_over_receive_time():
+    aggregator = RollingAggregator(fields=("rainfall",), window_seconds=300, bucket_seconds=60, clock=FakeClock(T0 + 60))
+    observed = datetime.fromtimestamp(T0, tz=timezone.utc).isoformat()
+    aggregator(_message("gauge", 30, rainfall=1.0, timestamp=observed))
+
+    assert aggregator.snapshot(now=T0 + 60).get("gauge", "rainfall", "count") == 1
+
+
+def test_capacity_grows_and_memory_per_sensor_is_fixed():
+    aggregator = RollingAggregator(fields=("water_level", "rainfall"), capacity=2, clock=FakeClock())
+    assert aggregator.bytes_per_sensor == 60 * (8 + 2 * 28)
+    for index in range(5):
+        aggregator.update(f"s{index}", T0, [float(index), None])
+
+    snapshot = aggregator.snapshot(now=T0)
+    assert aggregator.capacity == 8
+    assert snapshot.sensors == [f"s{index}" for index in range(5)]
+    np.testing.assert_allclose(snapshot.values[:, 0, 3], [0, 1, 2, 3, 4])
+    assert aggregator.metrics()["allocated_bytes"] == 8 * aggregator.bytes_per_sensor
+
+
+def test_batch_update_matches_one_at_a_time():
+    messages = [_message(f"s{index % 4}", (index * 7) % 90, rainfall=float(index), water_level=index % 5 or None) for index in range(200)]
+    sequential = RollingAggregator(fields=("water_level", "rainfall"), window_seconds=7200, clock=FakeClock(T0 + 89 * 60))
+    batched = RollingAggregator(fields=("water_level", "rainfall"), window_seconds=7200, clock=FakeClock(T0 + 89 * 60))
+    for message in messages:
+        sequential(message)
+    batched.observe_many(messages)
+
+    now = T0 + 89 * 60
+    expected = sequential.snapshot(now=now)
+    actual = batched.snapshot(now=now)
+    assert actual.sensors == expected.sensors
+    np.testing.assert_allclose(actual.values, expected.values)
+
+
+def test_out_of_range_timestamps_are_rejected_without_poisoning_slots():
+    clock = FakeClock(T0 + 30 * 60)
+    aggregator = RollingAggregator(fields=("rainfall",), window_seconds=600, bucket_seconds=60, future_tolerance=120, clock=clock)
+    aggregator.update("gauge", (T0 + 30 * 60) * 1000, [1.0])  # milliseconds sent by mistake
+    aggregator.update("gauge", T0, [1.0])  # older than the window
+    aggregator.observe_many([_message("gauge", 60, rainfall=1.0), _message("gauge", 31, rainfall=1.0)])
+    for minute in range(30, 40):
+        clock.now = T0 + minute * 60
+        aggregator.update("gauge", clock.now, [1.0])
+
+    assert aggregator.metrics()["dropped_out_of_range"] == 3
+    assert aggregator.dropped_late == 0
+    assert aggregator.snapshot(now=T0 + 39 * 60).get("gauge", "rainfall", "sum") == 11.0
+
+
+def test_absorbing_worker_states_equals_one_aggregator_seeing_everything(tmp_path):
+    clock = FakeClock(T0 + 89 * 60)
+    messages = [_message(f"s{index % 3}", (index * 11) % 90, rainfall=float(index), water_level=float(index % 7)) for index in range(120)]
+    whole = RollingAggregator(fields=("water_level", "rainfall"), window_seconds=7200, clock=clock)
+    workers = [RollingAggregator(fields=("water_level", "rainfall"), window_seconds=7200, clock=clock) for _ in range(3)]
+    for index, message in enumerate(messages):
+        whole(message)
+        workers[index % 3](message)
+
+    workers[1].state().save(tmp_path / "published.npz")
+    merged = workers[0].merged([AggregatorState.load(tmp_path / "published.npz"), workers[2].state()])
+
+    now = T0 + 89 * 60
+    expected = whole.snapshot(window_seconds=1800, now=now)
+    actual = merged.snapshot(window_seconds=1800, now=now)
+    order = [actual.sensors.index(sensor) for sensor in expected.sensors]
+    np.testing.assert_allclose(actual.values[order], expected.values)
+    assert actual.as_dict(["s1"])["s1"]["rainfall"]["sum"] == expected.get("s1", "rainfall", "sum")
+    empty = RollingAggregator(fields=("water_level", "rainfall"), clock=clock)
+    empty.update("s9", T0 + 89 * 60, [1.0, None])
+    assert empty.snapshot().as_dict()["s9"]["rainfall"]["max"] is None
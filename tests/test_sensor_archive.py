@@ -0,0 +1,66 @@
+import gzip
+import json
+from datetime import datetime
+
+from ingestion.sensor_archive import SensorArchiveWriter
+from ingestion.sensor_mqtt import SensorMessage
+
+
+def _message(index: int) -> SensorMessage:
+    return SensorMessage(topic=f"sensors/s{index % 3}", payload={"value": index}, received_at=datetime(2024, 1, 1, 0, 0, index % 60))
+
+
+def _records(paths) -> list:
+    records = []
+    for path in paths:
+        if not path.exists():
+            continue
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt") as handle:
+            records.extend(json.loads(line) for line in handle)
+    return records
+
+
+def test_writer_thread_group_commits_and_rotates(tmp_path):
+    writer = SensorArchiveWriter(tmp_path, batch_size=50, flush_interval=0.05, segment_max_bytes=4000, compress=True)
+    writer.start()
+    for index in range(500):
+        writer.write(_message(index))
+    writer.stop()
+
+    segments = writer.segments()
+    assert segments and all(path.name.endswith(".ndjson.gz") for path in segments)
+    values = [record["payload"]["value"] for record in _records(segments + [writer.active_path])]
+    assert values == list(range(500))
+    metrics = writer.metrics()
+    assert metrics["messages"] == 500
+    assert metrics["batches"] < 500
+    assert metrics["pending"] == 0
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_per_message_files_are_opt_in(tmp_path):
+    writer = SensorArchiveWriter(tmp_path, per_message_files=True)
+    writer.write(_message(1))
+
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    assert _records([writer.active_path])[0]["topic"] == "sensors/s1"
+
+
+def test_unencodable_payloads_do_not_stop_the_writer_thread(tmp_path):
+    circular = {}
+    circular["self"] = circular
+    writer = SensorArchiveWriter(tmp_path, batch_size=1, flush_interval=0.01)
+    writer.start()
+    writer.write(SensorMessage(topic="sensors/big", payload={"v": 10**30}, received_at=datetime(2024, 1, 1)))
+    writer.write(SensorMessage(topic="sensors/loop", payload=circular, received_at=datetime(2024, 1, 1)))
+    writer.write(_message(7))
+    assert writer.running
+    writer.stop()
+
+    records = _records([writer.active_path])
+    assert [record["topic"] for record in records] == ["sensors/big", "sensors/s1"]
+    assert records[0]["payload"]["v"] == 10**30
+    assert writer.metrics()["errors"] == 1
+    assert writer.metrics()["messages"] == 2
+    assert not writer.metrics()["running"]
@@ -0,0 +1,141 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ingestion.sensor_batch import BatchTooLarge, SensorBatchIngestor, parse_readings
+from shared.config import get_settings
+
+
+@pytest.fixture
+def settings_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("API_KEYS", '["gateway-key"]')
+    monkeypatch.setenv("PREFETCH_ENABLED", "false")
+    get_settings.cache_clear()
+    yield tmp_path
+    get_settings.cache_clear()
+
+
+def test_parse_accepts_array_and_ndjson_and_reports_bad_readings():
+    readings = [{"topic": "sensors/a", "payload": {"rainfall": 1.0}}, {"topic": "sensors/b", "payload": {"rainfall": 2.0}}]
+    messages, result = parse_readings(json.dumps(readings).encode())
+    assert [message.topic for message in messages] == ["sensors/a", "sensors/b"]
+
+    body = b"\n".join([json.dumps(readings[0]).encode(), b"{not json", b'{"topic": "sensors/c", "payload": 3}', b""])
+    messages, result = parse_readings(body)
+    assert result.accepted == 1
+    assert result.rejected == 2
+    assert result.errors == ["1: invalid JSON", "2: payload must be an object"]
+
+    with pytest.raises(BatchTooLarge):
+        parse_readings(json.dumps(readings).encode(), max_readings=1)
+
+
+def test_batch_ingestor_feeds_archive_and_aggregator(settings_env):
+    from ingestion.sensor_aggregates import RollingAggregator
+
+    aggregator = RollingAggregator(fields=("rainfall",))
+    ingestor = SensorBatchIngestor(aggregator=aggregator)
+    body = b"\n".join(json.dumps({"topic": f"sensors/s{index % 3}", "payload": {"rainfall": 1.0}}).encode() for index in range(30))
+
+    assert ingestor.ingest(body).accepted == 30
+    ingestor.stop()
+
+    lines = (settings_env / "processed" / "sensors" / "http" / "sensor_messages.ndjson").read_bytes().splitlines()
+    assert len(lines) == 30
+    snapshot = aggregator.snapshot()
+    assert sorted(snapshot.sensors) == ["s0", "s1", "s2"]
+    assert snapshot.values[:, 0, 1].sum() == 30.0
+
+
+def test_concurrent_batches_are_counted_and_compacted_from_the_http_dir(settings_env):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from ingestion.sensor_history import SensorHistory
+
+    ingestor = SensorBatchIngestor()
+    body = b"\n".join(json.dumps({"topic": f"sensors/s{index % 3}", "payload": {"rainfall": 1.0}}).encode() for index in range(10))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: ingestor.ingest(body + b"\n{bad"), range(40)))
+    ingestor.archive.rotate()
+    ingestor.stop()
+
+    assert {key: ingestor.metrics()[key] for key in ("batches", "accepted", "rejected")} == {"batches": 40, "accepted": 400, "rejected": 40}
+    history = SensorHistory()
+    assert history.compact() == 400
+    assert all(segment.startswith("http/") for segment in history.compacted_segments())
+
+
+def test_batch_endpoint_returns_202_and_rejects_oversized(settings_env, monkeypatch):
+    monkeypatch.setenv("SENSOR_BATCH_MAX_READINGS", "100")
+    get_settings.cache_clear()
+    from api.main import app
+
+    body = "\n".join(json.dumps({"topic": "sensors/river-1", "payload": {"water_level": float(index)}}) for index in range(50))
+    with TestClient(app) as client:
+        headers = {"x-api-key": "gateway-key", "content-type": "application/x-ndjson"}
+        response = client.post("/sensor/batch", content=body, headers=headers)
+        assert response.status_code == 202
+        assert response.json() == {"accepted": 50, "rejected": 0, "errors": []}
+
+        too_many = json.dumps([{"topic": "sensors/x", "payload": {}}] * 101)
+        assert client.post("/sensor/batch", content=too_many, headers=headers).status_code == 413
+        assert client.post("/sensor/batch", content="[1, ", headers=headers).status_code == 400
+        assert app.state.sensor_aggregator.metrics()["sensors"] == 1
+
+
+def test_batch_endpoint_caps_body_bytes_before_parsing(settings_env, monkeypatch):
+    monkeypatch.setenv("SENSOR_BATCH_MAX_BYTES", "1000")
+    get_settings.cache_clear()
+    from api.main import app
+
+    body = "\n".join(json.dumps({"topic": "sensors/river-1", "payload": {"water_level": 1.0}}) for _ in range(40)).encode()
+    headers = {"x-api-key": "gateway-key", "content-type": "application/x-ndjson"}
+    with TestClient(app) as client:
+        assert client.post("/sensor/batch", content=body, headers=headers).status_code == 413
+        chunked = client.post("/sensor/batch", content=iter([body[:600], body[600:]]), headers=headers)
+        assert chunked.status_code == 413
+        assert client.post("/sensor/batch", content=body[:500].rsplit(b"\n", 1)[0], headers=headers).status_code == 202
+
+
+def test_out_of_range_integer_does_not_stop_later_archiving(settings_env):
+    from api.main import app
+
+    headers = {"x-api-key": "gateway-key"}
+    with TestClient(app) as client:
+        assert client.post("/sensor", json={"topic": "sensors/big", "payload": {"v": 10**30}}, headers=headers).status_code == 202
+        readings = [{"topic": "sensors/river-1", "payload": {"water_level": float(index)}} for index in range(5)]
+        assert client.post("/sensor/batch", json=readings, headers=headers).json()["accepted"] == 5
+        assert client.post("/sensor", json={"topic": "sensors/river-2", "payload": {"v": 1}}, headers=headers).status_code == 202
+
+    lines = (settings_env / "processed" / "sensors" / "http" / "sensor_messages.ndjson").read_bytes().splitlines()
+    topics = [json.loads(line)["topic"] for line in lines]
+    assert topics.count("sensors/river-1") == 5 and "sensors/river-2" in topics
+
+
+def test_aggregates_endpoint_merges_http_readings_with_published_worker_aggregates(settings_env):
+    import time
+
+    from api.main import app
+    from ingestion.sensor_aggregates import RollingAggregator, state_path
+
+    worker = RollingAggregator.from_settings()
+    worker.update("river-1", time.time(), [7.5, None])
+    worker.update("river-2", time.time(), [1.0, 4.0])
+    worker.state().save(state_path())
+
+    headers = {"x-api-key": "gateway-key"}
+    readings = [{"topic": "sensors/river-1", "payload": {"water_level": level}} for level in (2.0, 3.0)]
+    with TestClient(app) as client:
+        assert client.post("/sensor/batch", json=readings, headers=headers).status_code == 202
+        response = client.get("/sensor/aggregates", params={"window_seconds": 900, "sensor": ["river-1"]}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["window_seconds"] == 900
+    assert list(body["sensors"]) == ["river-1"]
+    assert body["sensors"]["river-1"]["water_level"]["max"] == 7.5
+    assert body["sensors"]["river-1"]["water_level"]["count"] == 3
+    assert body["sensors"]["river-1"]["rainfall"]["mean"] is None
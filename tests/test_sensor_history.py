@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+from ingestion.sensor_archive import SensorArchiveWriter
+from ingestion.sensor_history import SensorHistory
+from ingestion.sensor_mqtt import SensorMessage
+
+
+def _archive(directory, start: datetime, count: int, compress: bool = False) -> SensorArchiveWriter:
+    writer = SensorArchiveWriter(directory, compress=compress)
+    for index in range(count):
+        sensor = f"station-{index % 3}"
+        payload = {"sensor_id": sensor, "water_level": index * 0.5, "status": "ok", "nested": {"a": 1}}
+        if index % 3 == 2:
+            payload = {"rainfall": 1.0}
+        writer.write(SensorMessage(topic=f"sensors/{sensor}/reading", payload=payload, received_at=start + timedelta(hours=index)))
+    writer.rotate()
+    return writer
+
+
+def test_compaction_partitions_and_types_columns(tmp_path):
+    archive_dir = tmp_path / "sensors"
+    _archive(archive_dir, datetime(2024, 1, 1), 48)
+    _archive(archive_dir, datetime(2024, 1, 3), 24, compress=True)
+    history = SensorHistory(root=tmp_path / "history", archive_dir=archive_dir)
+
+    assert history.compact() == 72
+    assert history.compact() == 0
+    assert len(history.compacted_segments()) == 2
+
+    schema = history.schema()
+    assert str(schema.field("water_level").type) == "double"
+    assert str(schema.field("rainfall").type) == "double"
+    assert str(schema.field("status").type) == "string"
+    assert sorted(path.name for path in (tmp_path / "history").glob("date=*")) == [
+        "date=2024-01-01",
+        "date=2024-01-02",
+        "date=2024-01-03",
+    ]
+
+
+def test_query_prunes_by_sensor_time_and_columns(tmp_path):
+    archive_dir = tmp_path / "sensors"
+    _archive(archive_dir, datetime(2024, 1, 1), 72)
+    history = SensorHistory(root=tmp_path / "history", archive_dir=archive_dir)
+    history.compact()
+
+    frame = history.query(
+        sensors=["station-0"],
+        start=datetime(2024, 1, 2, 0),
+        end=datetime(2024, 1, 2, 23, 59),
+        columns=["water_level"],
+    )
+
+    assert list(frame.columns) == ["sensor_id", "received_at", "water_level"]
+    assert len(frame) == 8
+    assert set(frame["sensor_id"]) == {"station-0"}
+    assert frame["received_at"].is_monotonic_increasing
+    assert frame["water_level"].iloc[0] == 12.0
+
+    rain = history.query(sensors=["station-2"], columns=["rainfall"])
+    assert len(rain) == 24
+    assert rain["rainfall"].eq(1.0).all()
+
+
+def test_interrupted_compaction_keeps_the_schema_of_written_partitions(tmp_path, monkeypatch):
+    archive_dir = tmp_path / "sensors"
+    _archive(archive_dir, datetime(2024, 1, 1), 6)
+    writer = SensorArchiveWriter(archive_dir)
+    writer.write(SensorMessage(topic="sensors/station-0/reading", payload={"turbidity": 4.5}, received_at=datetime(2024, 1, 2)))
+    writer.rotate()
+    history = SensorHistory(root=tmp_path / "history", archive_dir=archive_dir)
+
+    marked = []
+    original = history._mark_compacted
+
+    def crash_on_second(segment):
+        if marked:
+            raise RuntimeError("crash")
+        marked.append(segment)
+        original(segment)
+
+    monkeypatch.setattr(history, "_mark_compacted", crash_on_second)
+    try:
+        history.compact()
+    except RuntimeError:
+        pass
+    assert "turbidity" in history.schema().names
+
+    frame = SensorHistory(root=tmp_path / "history", archive_dir=archive_dir).query(columns=["turbidity", "salinity"])
+    assert frame["turbidity"].dropna().tolist() == [4.5]
+    assert list(frame.columns) == ["sensor_id", "received_at", "turbidity", "salinity"]
+    assert frame["salinity"].isna().all()
+
+
+def test_small_files_within_a_partition_are_merged(tmp_path):
+    archive_dir = tmp_path / "sensors"
+    history = SensorHistory(root=tmp_path / "history", archive_dir=archive_dir, merge_files=3)
+    for day in range(4):
+        _archive(archive_dir, datetime(2024, 1, 1, day), 3)
+        history.compact()
+
+    partition = tmp_path / "history" / "date=2024-01-01" / "sensor=station-0"
+    names = sorted(path.name for path in partition.glob("*.parquet"))
+    assert len(names) == 2 and names[0].startswith("part-merged-")
+    assert not history._state().get("merges")
+    frame = history.query(sensors=["station-0"], columns=["water_level"])
+    assert len(frame) == 4
+    assert frame["received_at"].is_monotonic_increasing
+
+
+def test_segments_of_every_writer_directory_are_compacted_once(tmp_path):
+    archive_dir = tmp_path / "sensors"
+    for directory in ("worker-0", "worker-1"):
+        _archive(archive_dir / directory, datetime(2024, 1, 1), 6)
+    first, second = sorted((archive_dir / "worker-0").glob("*.ndjson")), sorted((archive_dir / "worker-1").glob("*.ndjson"))
+    second[0].rename(second[0].with_name(first[0].name))  # writers name segments independently
+    history = SensorHistory(root=tmp_path / "history", archive_dir=archive_dir)
+
+    assert history.compact() == 12
+    assert history.compacted_segments() == sorted(f"{directory}/{first[0].name}" for directory in ("worker-0", "worker-1"))
+    assert history.compact() == 0
+    assert len(history.query(sensors=["station-0"])) == 4
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+import pytest
+
+from ingestion.sensor_queue import BLOCK, DROP_NEWEST, DROP_OLDEST, BoundedMessageQueue
+
+
+def test_drop_policies_bound_depth_and_count_drops():
+    oldest = BoundedMessageQueue(maxsize=3, policy=DROP_OLDEST)
+    newest = BoundedMessageQueue(maxsize=3, policy=DROP_NEWEST)
+    for item in range(5):
+        oldest.put(item)
+        newest.put(item)
+
+    assert oldest.poll_batch(10) == [2, 3, 4]
+    assert newest.poll_batch(10) == [0, 1, 2]
+    assert oldest.metrics()["dropped_oldest"] == 2
+    assert newest.metrics()["dropped_newest"] == 2
+    assert newest.metrics()["max_depth"] == 3
+
+
+def test_block_policy_waits_for_consumer_then_times_out():
+    queue = BoundedMessageQueue(maxsize=1, policy=BLOCK, block_timeout=0.05)
+    queue.put("a")
+    threading.Timer(0.01, queue.get_nowait).start()
+
+    assert queue.put("b") is True
+    assert queue.put("c") is False
+    assert queue.metrics()["block_timeouts"] == 1
+    assert queue.poll_batch(5) == ["b"]
+
+
+def test_poll_batch_waits_for_first_item():
+    queue = BoundedMessageQueue()
+    threading.Timer(0.02, queue.put, args=("reading",)).start()
+
+    assert queue.poll_batch(10, timeout=1.0) == ["reading"]
+    assert queue.poll_batch(10, timeout=0.01) == []
+
+
+@pytest.mark.asyncio
+async def test_async_batches():
+    queue = BoundedMessageQueue()
+    for item in range(7):
+        queue.put(item)
+
+    received = []
+    async for batch in queue.batches(max_items=3, timeout=0.01):
+        received.append(batch)
+        if sum(map(len, received)) == 7:
+            break
+
+    assert received == [[0, 1, 2], [3, 4, 5], [6]]
+
+    loop = asyncio.get_running_loop()
+    loop.call_later(0.02, queue.put, "late")
+    iterator = queue.batches(timeout=1.0).__aiter__()
+    assert await iterator.__anext__() == ["late"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_consumer_leaves_items_queued():
+    queue = BoundedMessageQueue()
+    iterator = queue.batches(timeout=0.3).__aiter__()
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(iterator.__anext__(), 0.05)
+    queue.put("m1")
+    await asyncio.sleep(0.4)  # the abandoned wait wakes up and must not take "m1"
+
+    assert queue.qsize() == 1
+    assert queue.stats.dequeued == 0
+    assert await queue.batches().__aiter__().__anext__() == ["m1"]
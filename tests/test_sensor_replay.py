@@ -0,0 +1,108 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from ingestion.sensor_archive import SensorArchiveWriter
+from ingestion.sensor_history import SensorHistory
+from ingestion.sensor_mqtt import SensorMessage
+from ingestion.sensor_replay import STAMP_FIELD, DirectTarget, HttpTarget, LatencyRecorder, SensorReplay, read_records
+from shared.config import get_settings
+
+START = datetime(2024, 6, 1, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def settings_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
+def _record_archive(directory, count, spacing_seconds=0.01):
+    writer = SensorArchiveWriter(directory)
+    for index in range(count):
+        payload = {"sensor_id": f"s{index % 2}", "water_level": float(index)}
+        writer.write(SensorMessage(topic=f"sensors/s{index % 2}", payload=payload, received_at=START + timedelta(seconds=index * spacing_seconds)))
+    writer.rotate()
+    writer.write(SensorMessage(topic="sensors/s0", payload={"water_level": -1.0}, received_at=START - timedelta(seconds=1)))
+    writer.flush()
+
+
+def test_reads_segments_active_file_and_compacted_history_in_order(tmp_path):
+    archive = tmp_path / "recorded"
+    _record_archive(archive, 20)
+
+    records = read_records(archive)
+    assert len(records) == 21
+    assert records[0].payload == {"water_level": -1.0}
+    assert [record.recorded_at for record in records] == sorted(record.recorded_at for record in records)
+    assert len(read_records(archive, limit=5)) == 5
+
+    history = SensorHistory(root=tmp_path / "history", archive_dir=archive)
+    history.compact()
+    compacted = read_records(tmp_path / "history")
+    assert len(compacted) == 20
+    assert compacted[3].payload["water_level"] == 3.0
+
+
+def test_reads_the_per_writer_directories(tmp_path):
+    archive = tmp_path / "sensors"
+    _record_archive(archive / "worker-0", 4)
+    _record_archive(archive / "http", 6)
+
+    records = read_records(archive)
+    assert len(records) == 12
+    assert [record.recorded_at for record in records] == sorted(record.recorded_at for record in records)
+
+
+def test_direct_replay_reports_throughput_and_latency(tmp_path):
+    archive = tmp_path / "recorded"
+    _record_archive(archive, 200)
+    recorder = LatencyRecorder()
+    target = DirectTarget(recorder, persist_dir=tmp_path / "replayed")
+
+    report = SensorReplay(read_records(archive), target, speed=0).run(recorder)
+
+    assert report.sent == report.received == 201
+    assert report.throughput > 0
+    assert set(report.latency_ms) == {"p50", "p90", "p99", "max", "mean"}
+    assert report.target_metrics["received"] == 201
+    lines = (tmp_path / "replayed" / "sensor_messages.ndjson").read_bytes().splitlines()
+    assert STAMP_FIELD in json.loads(lines[0])["payload"]
+
+
+def test_paced_replay_follows_recorded_timing(tmp_path):
+    archive = tmp_path / "recorded"
+    _record_archive(archive, 11, spacing_seconds=0.1)
+    records = read_records(archive)[1:]
+    recorder = LatencyRecorder()
+
+    started = time.monotonic()
+    SensorReplay(records, DirectTarget(recorder, persist_dir=tmp_path / "replayed"), speed=4).run(recorder)
+    assert 0.2 <= time.monotonic() - started < 1.0
+
+
+def test_http_replay_posts_ndjson_batches(tmp_path):
+    archive = tmp_path / "recorded"
+    _record_archive(archive, 30)
+    bodies = []
+
+    def handler(request):
+        lines = request.content.splitlines()
+        bodies.append(lines)
+        assert request.headers["x-api-key"] == "k"
+        return httpx.Response(202, json={"accepted": len(lines), "rejected": 0, "errors": []})
+
+    recorder = LatencyRecorder()
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    target = HttpTarget(recorder, "http://api/sensor/batch", api_key="k", client=client)
+    report = SensorReplay(read_records(archive), target, speed=0, batch_size=10).run(recorder)
+
+    assert [len(lines) for lines in bodies] == [10, 10, 10, 1]
+    assert report.received == 31
+    assert report.errors == 0
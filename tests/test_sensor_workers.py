@@ -0,0 +1,142 @@
+import itertools
+import json
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from ingestion.sensor_aggregates import AggregatorState
+from ingestion.sensor_workers import SensorWorkerSupervisor, merge_metrics, shared_topic
+from shared.config import get_settings
+
+
+class FakeBroker:
+    """In-process stand-in that round-robins ``$share/<group>/...`` subscribers."""
+
+    def __init__(self):
+        self.groups = {}
+        self.lock = threading.Lock()
+        self.cursor = itertools.count()
+
+    def subscribe(self, client, topic):
+        assert topic.startswith("$share/")
+        _, group, _ = topic.split("/", 2)
+        with self.lock:
+            members = self.groups.setdefault(group, [])
+            members.append(client)
+
+    def publish(self, topic, payload):
+        with self.lock:
+            members = self.groups["workers"]
+            index = next(self.cursor) % len(members)
+            client = members[index]
+        message = mqtt.MQTTMessage(topic=topic.encode())
+        message.payload = json.dumps(payload).encode()
+        client.on_message(client, None, message)
+
+
+class FakeClient:
+    def __init__(self, broker, **_kwargs):
+        self.broker = broker
+
+    def username_pw_set(self, *_args, **_kwargs):
+        pass
+
+    def reconnect_delay_set(self, *_args, **_kwargs):
+        pass
+
+    def connect(self, *_args, **_kwargs):
+        self.on_connect(self, None, {}, 0)
+
+    def subscribe(self, topic, qos=0):
+        self.broker.subscribe(self, topic)
+
+    def loop(self, timeout=1.0):
+        time.sleep(0.01)
+
+    def disconnect(self):
+        pass
+
+
+def test_shared_subscription_spreads_messages_across_workers(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    get_settings.cache_clear()
+    broker = FakeBroker()
+    batches = []
+    supervisor = SensorWorkerSupervisor(
+        workers=3,
+        group="workers",
+        persist_root=tmp_path / "sensors",
+        mode="thread",
+        client_factory=lambda **kwargs: FakeClient(broker, **kwargs),
+        on_batch=batches.append,
+        metrics_interval=0.05,
+    )
+    supervisor.start()
+    deadline = time.monotonic() + 2
+    while sum(len(members) for members in broker.groups.values()) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for index in range(30):
+        broker.publish(f"sensors/s{index % 2}", {"water_level": float(index)})
+    supervisor.stop()
+
+    metrics = supervisor.metrics()
+    assert metrics["subscription"] == shared_topic("workers", "sensors/#")
+    assert metrics["totals"]["received"] == 30
+    assert metrics["totals"]["archive"]["messages"] == 30
+    assert sorted(snapshot["received"] for snapshot in metrics["per_worker"].values()) == [10, 10, 10]
+    assert sum(len(batch) for batch in batches) == 30
+    for index in range(3):
+        lines = (tmp_path / "sensors" / f"worker-{index}" / "sensor_messages.ndjson").read_text().splitlines()
+        assert len(lines) == 10
+
+    snapshot = supervisor.snapshot(window_seconds=900)
+    assert snapshot.get("s0", "water_level", "count") == 15
+    assert snapshot.get("s0", "water_level", "max") == 28.0
+    assert snapshot.get("s1", "water_level", "max") == 29.0
+    published = AggregatorState.load(supervisor.publish_aggregates(tmp_path / "aggregates.npz"))
+    assert sorted(published.sensors) == ["s0", "s1"]
+
+
+def test_merge_metrics_sums_counters_and_keeps_maxima():
+    merged = merge_metrics(
+        {
+            0: {"received": 2, "archive": {"messages": 2, "max_batch": 5, "running": True}, "queue": {"depth": 1, "policy": "block"}},
+            1: {"received": 3, "archive": {"messages": 3, "max_batch": 9}, "queue": {"depth": 2}},
+        }
+    )
+
+    assert merged["received"] == 5
+    assert merged["archive"] == {"messages": 5, "max_batch": 9}
+    assert merged["queue"] == {"depth": 3}
+
+
+def test_restarted_worker_keeps_the_counters_of_the_one_it_replaced(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    get_settings.cache_clear()
+    broker = FakeBroker()
+    supervisor = SensorWorkerSupervisor(
+        workers=1,
+        group="workers",
+        persist_root=tmp_path / "sensors",
+        mode="thread",
+        client_factory=lambda **kwargs: FakeClient(broker, **kwargs),
+        metrics_interval=0.05,
+    )
+    supervisor._handles[0] = threading.Thread(target=lambda: None)  # a worker that has died
+    supervisor._metrics_queue.put((0, 1234, {"received": 7, "invalid": 1, "archive": {"messages": 7, "pending": 3}, "queue": {"depth": 2}}, None))
+
+    assert supervisor.supervise() == [0]
+    deadline = time.monotonic() + 2
+    while not broker.groups and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for index in range(2):
+        broker.publish(f"sensors/s{index}", {"value": index})
+    supervisor.stop()
+
+    totals = supervisor.metrics()["totals"]
+    assert (totals["received"], totals["invalid"]) == (9, 1)
+    assert totals["archive"]["messages"] == 9
+    assert totals["archive"]["pending"] == 0 and totals["queue"]["depth"] == 0
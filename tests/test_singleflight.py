@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from shared.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "value"
+
+    waiters = [asyncio.create_task(flight.do("key", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["value"] * 5
+    assert calls == 1
+    assert flight.stats.coalesced == 4
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return 42
+
+    leader = asyncio.create_task(flight.do("key", fetch))
+    follower = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == 42
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_release_key():
+    flight = SingleFlight()
+    attempts = 0
+
+    async def failing():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(flight.do("key", failing), flight.do("key", failing), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert attempts == 1
+    with pytest.raises(RuntimeError):
+        await flight.do("key", failing)
+    assert attempts == 2
+    assert flight.stats.failures == 2
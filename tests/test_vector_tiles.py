@@ -0,0 +1,122 @@
+import geopandas as gpd
+import mapbox_vector_tile
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from fastapi.testclient import TestClient
+from shapely.geometry import Polygon, box
+
+from layers.mapping import RiskLayerConfig
+from layers.risk_cache import RiskInputs, RiskProduct, RiskProductCache
+from layers.vector_tiles import RiskTileCache, encode_layer, lonlat_to_tile, tile_bounds
+from shared.config import get_settings
+
+
+def _decode(tile):
+    """Per layer, features as (id, properties, exterior rings in y-down tile coordinates)."""
+
+    layers = {}
+    for name, layer in mapbox_vector_tile.decode(tile, default_options={"y_coord_down": True}).items():
+        features = []
+        for feature in layer["features"]:
+            geometry = shapely.geometry.shape(feature["geometry"])
+            rings = [[tuple(map(int, point)) for point in part.exterior.coords[:-1]] for part in getattr(geometry, "geoms", [geometry])]
+            features.append((feature["id"], feature["properties"], rings))
+        layers[name] = features
+    return layers
+
+
+def test_encoded_polygons_round_trip_through_the_reference_decoder():
+    donut = Polygon([(100, 100), (900, 100), (900, 900), (100, 900)], [[(300, 300), (300, 600), (600, 600), (600, 300)]])
+    split = shapely.MultiPolygon([box(1000, 1000, 1100, 1100), box(2000, 2000, 2200, 2100)])
+    attributes = pd.DataFrame(
+        {"risk_level": ["high", None], "exposure_index": [0.75, 0.5], "population_density": np.array([120, 4], dtype=np.int64)}
+    )
+
+    tile = encode_layer("risk", np.array([donut, split]), attributes, ids=np.array([7, 9]))
+    layer = mapbox_vector_tile.decode(tile, default_options={"y_coord_down": True})["risk"]
+
+    assert layer["extent"] == 4096
+    first, second = layer["features"]
+    assert (first["id"], second["id"]) == (7, 9)
+    assert first["properties"] == {"risk_level": "high", "exposure_index": 0.75, "population_density": 120}
+    assert second["properties"] == {"exposure_index": 0.5, "population_density": 4}
+    assert shapely.geometry.shape(first["geometry"]).equals(donut)
+    assert shapely.geometry.shape(second["geometry"]).equals(split)
+    assert encode_layer("risk", np.array([]), attributes.iloc[:0]) == b""
+
+
+def test_tile_cache_serves_from_disk_and_drops_tiles_of_old_versions(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    get_settings.cache_clear()
+    probabilities = {"values": [0.2, 0.5, 0.9]}
+
+    def loader(basin_id):
+        boxes = [box(80.0 + i * 0.01, 7.0, 80.01 + i * 0.01, 7.01) for i in range(3)]
+        hazard = gpd.GeoDataFrame({"flood_probability": probabilities["values"], "geometry": boxes}, crs="EPSG:4326")
+        vulnerability = gpd.GeoDataFrame({"population_density": [100, 200, 300], "geometry": boxes}, crs="EPSG:4326")
+        return RiskInputs(hazard, [vulnerability], RiskLayerConfig(["flood_probability"], ["population_density"]))
+
+    risk_cache = RiskProductCache([RiskProduct("risk-map", loader, lambda basin, risk: b"{}")])
+    tiles = RiskTileCache(risk_cache, root=tmp_path / "tiles", max_zoom=14)
+    z, (x, y) = 12, lonlat_to_tile(80.015, 7.005, 12)
+
+    first = tiles.get("kelani", z, x, y)
+    features = _decode(first.body)["risk"]
+    _, risk = risk_cache.risk_map("kelani", "risk-map")
+    visible = risk[risk.geometry.area > 1e-9]  # overlay slivers collapse on the tile grid
+    assert sorted(feature_id for feature_id, _, _ in features) == list(np.flatnonzero(risk.geometry.area > 1e-9))
+    assert [props["risk_level"] for _, props, _ in sorted(features, key=lambda feature: feature[0])] == list(visible["risk_level"].astype(str))
+    assert all(0 <= px <= 4096 and 0 <= py <= 4096 for _, _, rings in features for px, py in rings[0])
+    assert tiles.get("kelani", z, x, y).body == first.body
+    assert tiles.metrics()["hits"] == 1 and tiles.metrics()["builds"] == 1
+    assert risk_cache.metrics()["builds"] == 0  # tiles never render the GeoJSON body
+    assert tiles.get("kelani", z, x + 1, y).body == b""
+    assert tiles.get("kelani", 14, 0, 0).body == b""
+    assert tiles.metrics()["builds"] == 1 and tiles.metrics()["empty"] == 2
+    assert len(list((tmp_path / "tiles" / "kelani").glob("*/*/*/*.mvt"))) == 1
+
+    probabilities["values"] = [0.9, 0.5, 0.2]
+    risk_cache.refresh("kelani")
+    updated = tiles.get("kelani", z, x, y)
+    assert updated.etag != first.etag
+    assert [path.name for path in (tmp_path / "tiles" / "kelani").iterdir()] == [updated.key]
+    assert tiles.stats.invalidations == 1
+    with pytest.raises(ValueError):
+        tiles.get("kelani", 15, 0, 0)
+    get_settings.cache_clear()
+
+
+def test_tile_bounds_cover_the_mercator_world():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-20037508.34, -20037508.34, 20037508.34, 20037508.34))
+    assert lonlat_to_tile(0.0, 0.0, 1) == (1, 1)
+    assert lonlat_to_tile(-180.0, 89.0, 3) == (0, 0)
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("API_KEYS", '["k"]')
+    monkeypatch.setenv("PREFETCH_ENABLED", "false")
+    get_settings.cache_clear()
+    from api.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+    get_settings.cache_clear()
+
+
+def test_risk_tile_endpoint(client):
+    headers = {"x-api-key": "k"}
+    x, y = lonlat_to_tile(1.05, 1.05, 6)
+    response = client.get(f"/tiles/risk/kelani/6/{x}/{y}.mvt", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    assert len(_decode(response.content)["risk"]) == 3
+
+    revalidated = client.get(f"/tiles/risk/kelani/6/{x}/{y}.mvt", headers={**headers, "if-none-match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert client.get("/tiles/risk/kelani/6/0/0.mvt", headers=headers).status_code == 204
+    assert client.get("/tiles/risk/kelani/2/4/0.mvt", headers=headers).status_code == 404
@@ -1,11 +1,13 @@
 import asyncio
 from datetime import datetime
 
+import httpx
 import numpy as np
 import pytest
 import xarray as xr
 
 from ingestion import weather_ingest
+from shared import jsonio
 from shared.config import get_settings
 
 
@@ -45,3 +47,142 @@ async def test_weather_ingestor_ecmwf(monkeypatch, tmp_path):
 
     assert "temperature_2m" in dataset.coords["variable"].values
     assert dataset.attrs["source"] == "ecmwf-era5"
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_packs_points_into_batched_requests(monkeypatch, tmp_path):
+    monkeypatch.setenv("WEATHER_PROVIDER", "open-meteo")
+    monkeypatch.setenv("OPEN_METEO_BATCH_SIZE", "2")
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    get_settings.cache_clear()
+
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        lats = request.url.params["latitude"].split(",")
+        body = [
+            {
+                "latitude": float(lat),
+                "hourly": {
+                    "time": ["2024-01-01T00:00", "2024-01-01T01:00"],
+                    "temperature_2m": [float(lat), float(lat)],
+                    "precipitation": [0.0, None],
+                    "windspeed_10m": [1.0, 2.0],
+                },
+            }
+            for lat in lats
+        ]
+        return httpx.Response(200, json=body if len(body) > 1 else body[0])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ingestor = weather_ingest.WeatherIngestor(http_client=client)
+    points = [(1.0, 1.0), (2.0, 2.0), (3.0, 3.0), (1.001, 1.0)]
+
+    dataset = await ingestor.fetch_many(points)
+
+    assert len(requests) == 2
+    assert dataset["forecast"].dims == ("location", "variable", "time")
+    assert list(dataset["latitude"].values) == [1.0, 2.0, 3.0, 1.001]
+    temperature = dataset["forecast"].sel(variable="temperature_2m").isel(time=0).values
+    assert list(temperature) == [1.0, 2.0, 3.0, 1.0]
+    assert np.isnan(dataset["forecast"].sel(variable="precipitation").values[:, 1]).all()
+    await ingestor.close()
+
+
+@pytest.mark.asyncio
+async def test_open_meteo_requests_cover_the_longest_horizon(monkeypatch, tmp_path):
+    monkeypatch.setenv("WEATHER_PROVIDER", "open-meteo")
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    get_settings.cache_clear()
+
+    params = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params.append(dict(request.url.params))
+        hours = 24 * int(request.url.params.get("forecast_days", 7))
+        hourly = {"time": [1704067200 + 3600 * hour for hour in range(hours)], "temperature_2m": [1.0] * hours}
+        body = [{"hourly": hourly} for _ in request.url.params["latitude"].split(",")]
+        return httpx.Response(200, json=body if len(body) > 1 else body[0])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ingestor = weather_ingest.WeatherIngestor(http_client=client)
+
+    single = await ingestor.fetch_forecast(1.0, 2.0)
+    batch = await ingestor.fetch_many([(5.0, 5.0), (6.0, 6.0)])
+
+    assert [entry["forecast_days"] for entry in params] == ["16", "16"]
+
+    await ingestor._fetch_open_meteo_batch([(7.123456, 123.45678), (7.5, -0.1234567)])
+    assert (params[-1]["latitude"], params[-1]["longitude"]) == ("7.123456,7.5", "123.45678,-0.1234567")
+    assert single.sizes["time"] == 384 and batch.sizes["time"] == 384
+    assert ingestor.cache.key(1.0, 2.0, ingestor.variables, ingestor.forecast_days).forecast_days == 16
+    await ingestor.close()
+
+
+def test_payload_decoder_handles_unixtime_and_nulls(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    get_settings.cache_clear()
+
+    ingestor = weather_ingest.WeatherIngestor(variables=["temperature_2m", "precipitation"])
+    payload = jsonio.loads(
+        b'{"hourly": {"time": [1704067200, 1704070800], "temperature_2m": [1.5, null], "precipitation": [0.1, 0.2]}}'
+    )
+
+    dataset = ingestor._dataset_from_payload(payload)
+
+    assert dataset["time"].values[1] == np.datetime64("2024-01-01T01:00")
+    assert dataset["forecast"].dims == ("variable", "time")
+    assert np.isnan(dataset["forecast"].sel(variable="temperature_2m").values[1])
+
+
+class DummyAreaCDSClient:
+    retrievals = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def retrieve(self, _dataset, request, target):
+        DummyAreaCDSClient.retrievals.append(request["area"])
+        north, west, south, east = request["area"]
+        lat = np.arange(np.ceil(north), np.floor(south) - 1, -1.0)
+        lon = np.arange(np.floor(west), np.ceil(east) + 1, 1.0)
+        time = np.array([np.datetime64("2024-01-01T00:00"), np.datetime64("2024-01-01T01:00")])
+        grid = np.broadcast_to(lat[None, :, None] + lon[None, None, :] / 10, (2, lat.size, lon.size))
+        data = xr.Dataset(
+            {
+                "t2m": (("time", "latitude", "longitude"), 273.15 + grid),
+                "tp": (("time", "latitude", "longitude"), np.zeros_like(grid)),
+            },
+            coords={"time": time, "latitude": lat, "longitude": lon},
+        )
+        data.to_netcdf(target)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method", ["nearest", "bilinear"])
+async def test_ecmwf_bulk_area_downloads_once_per_area(monkeypatch, tmp_path, method):
+    monkeypatch.setenv("WEATHER_PROVIDER", "ecmwf")
+    monkeypatch.setenv("ECMWF_KEY", "uid:secret")
+    monkeypatch.setenv("ECMWF_INTERPOLATION", method)
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("LOGS_DIR", str(tmp_path / "logs"))
+    get_settings.cache_clear()
+    DummyAreaCDSClient.retrievals = []
+
+    monkeypatch.setattr(weather_ingest, "cdsapi", type("CDS", (), {"Client": DummyAreaCDSClient}))
+    points = [(1.0, 2.0), (3.0, 5.0), (2.5, 4.0)]
+
+    dataset = await weather_ingest.WeatherIngestor(cache=None).fetch_many(points)
+    again = await weather_ingest.WeatherIngestor(cache=None).fetch_many(points)
+
+    assert len(DummyAreaCDSClient.retrievals) == 1
+    temperature = dataset["forecast"].sel(variable="temperature_2m").isel(time=0).values
+    assert temperature[0] == pytest.approx(1.2)
+    assert temperature[1] == pytest.approx(3.5)
+    expected = 2.9 if method == "bilinear" else temperature[2]
+    assert temperature[2] == pytest.approx(expected)
+    np.testing.assert_allclose(again["forecast"].values, dataset["forecast"].values)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+from shapely.geometry import box
+
+from models.virtual_gauge import VirtualGauge
+from shared.zonal_stats import ZonalStatsEngine, coverage_weights
+
+LATS = np.array([2.5, 1.5, 0.5])
+LONS = np.array([0.5, 1.5, 2.5])
+
+
+def test_fractional_cell_coverage():
+    weights = coverage_weights([box(0.5, 0.5, 1.5, 1.5), box(0, 0, 3, 3)], LATS, LONS, area_weighted=False)
+
+    dense = weights.toarray().reshape(2, 3, 3)
+    np.testing.assert_allclose(dense[0], [[0, 0, 0], [0.25, 0.25, 0], [0.25, 0.25, 0]])
+    np.testing.assert_allclose(dense[1], np.ones((3, 3)))
+
+
+def test_areal_mean_matches_masked_mean_and_skips_nan(tmp_path):
+    rng = np.random.default_rng(0)
+    lats = np.linspace(10, 5, 26)
+    lons = np.linspace(80, 85, 26)
+    values = rng.random((4, 26, 26))
+    values[1, 3, 3] = np.nan
+    rain = xr.DataArray(
+        values,
+        dims=("time", "latitude", "longitude"),
+        coords={"time": pd.date_range("2024-01-01", periods=4), "latitude": lats, "longitude": lons},
+    )
+    step = 0.2
+    catchments = [box(80 - step / 2, 9.4 - step / 2, 81 + step / 2, 10 + step / 2), box(83.9, 5.9, 85.1, 7.1)]
+    engine = ZonalStatsEngine(cache_dir=tmp_path, area_weighted=False)
+
+    result = engine.areal_mean(rain, catchments)
+    engine.areal_mean(rain, catchments)
+
+    for zone, geometry in enumerate(catchments):
+        min_x, min_y, max_x, max_y = geometry.bounds
+        mask = (rain.latitude >= min_y) & (rain.latitude <= max_y) & (rain.longitude >= min_x) & (rain.longitude <= max_x)
+        expected = rain.where(mask).mean(dim=("latitude", "longitude"))
+        np.testing.assert_allclose(result.isel(zone=zone).values, expected.values)
+    assert result.dims == ("time", "zone")
+    assert engine.builds == 1
+    reloaded = ZonalStatsEngine(cache_dir=tmp_path, area_weighted=False)
+    reloaded.weights(catchments, lats, lons)
+    assert reloaded.builds == 0
+
+
+def test_virtual_gauge_estimates_many_catchments():
+    rain = xr.DataArray(
+        np.full((2, 3, 3), 4.0),
+        dims=("time", "latitude", "longitude"),
+        coords={"time": pd.date_range("2024-01-01", periods=2), "latitude": LATS, "longitude": LONS},
+    )
+    gauge = VirtualGauge()
+    gauge.calibration.slope = 2.0
+
+    discharge = gauge.estimate_catchment_discharge(rain, [box(0, 0, 1, 1), box(1, 1, 3, 3)])
+
+    assert discharge.shape == (2, 2)
+    np.testing.assert_allclose(discharge.to_numpy(), 8.0)
+    cached = dict(gauge.engine._cache)
+    gauge.estimate_catchment_discharge(rain, [box(0, 0, 1, 1), box(1, 1, 3, 3)])
+    assert len(cached) == 1 and gauge.engine._cache == cached  # second call reused the gauge's weights